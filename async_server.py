@@ -0,0 +1,369 @@
+"""asyncio entry point for the building management server.
+
+Connections are HTTP/1.1 and kept alive between requests, and pipelined requests
+are answered in order. Files under /uploads/ and static files are streamed
+directly from the event loop with loop.sendfile, so no file is read into memory
+whole, and /events streams are held open by the loop rather than by a thread.
+Every other route runs through BuildingManagementHandler on a worker thread: the
+request head and body are read off the socket first (bodies larger than
+SPOOL_MAX_BYTES spill to a temporary file), the handler runs against those
+buffers, and its buffered response is written back to the client.
+
+    python async_server.py --port 8000 --threads 8
+"""
+import argparse
+import asyncio
+import email.utils
+import http.client
+import io
+import logging
+import os
+import posixpath
+import stat
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from building_management_server import (BuildingManagementHandler, EVENT_HEARTBEAT_SECONDS, MAX_UPLOAD_BYTES,
+                                        change_feed, document_cache, observe_request, plan_file_response,
+                                        prepare_server, resolve_upload_path, route_label, setup_logging,
+                                        start_pruner)
+from logging_setup import PROFILES, default_profile
+from tracing import tracer
+from retention import DEFAULT_POLICY
+from change_feed import HEARTBEAT, format_event
+
+logger = logging.getLogger(__name__)
+
+MAX_HEAD_BYTES = 64 * 1024
+SPOOL_MAX_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Idle time allowed between requests on a kept-alive connection
+KEEPALIVE_TIMEOUT = 15
+# Matches BuildingManagementHandler.timeout for clients that stall mid-request
+REQUEST_TIMEOUT = BuildingManagementHandler.timeout
+# GET paths BuildingManagementHandler answers itself instead of serving a file
+HANDLER_GET_PATHS = {'/list_json_files', '/totals', '/events', '/metrics', '/diff', '/converted_source.json'}
+
+
+def resolve_static_path(method, target):
+    """File in the working directory a GET or HEAD would be served from, as translate_path maps it.
+
+    Returns None for routes the handler answers itself.
+    """
+    if target in ('', '/'):
+        target = '/building_management.html'
+    path = urllib.parse.urlsplit(target).path
+    if method == 'GET' and (path in HANDLER_GET_PATHS or path.startswith('/load_json/')):
+        return None
+    parts = [part for part in posixpath.normpath(urllib.parse.unquote(path)).split('/')
+             if part and not os.path.dirname(part) and part not in (os.curdir, os.pardir)]
+    return os.path.join(os.getcwd(), *parts)
+
+
+class BufferedRequestHandler(BuildingManagementHandler):
+    """Runs one request that has already been read off the socket.
+
+    rfile holds the raw request (request line, headers and body) and the response
+    is collected in wfile for the event loop to send.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, request_stream, client_address, server):
+        self.request_stream = request_stream
+        super().__init__(None, client_address, server)
+
+    def setup(self):
+        self.connection = None
+        self.rfile = self.request_stream
+        self.wfile = io.BytesIO()
+
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+
+    def handle_expect_100(self):
+        # The event loop has already answered Expect: 100-continue before reading the body
+        return True
+
+    def finish(self):
+        # Leave wfile open so the response can be read back
+        pass
+
+
+def has_framed_body(response):
+    """Whether a buffered response can be followed by another on the same connection"""
+    head, _, _ = response.partition(b'\r\n\r\n')
+    status_line, _, header_block = head.partition(b'\r\n')
+    parts = status_line.split(None, 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        return False
+    status = int(parts[1])
+    if status < 200 or status in (204, 304):
+        return True
+    return b'\r\ncontent-length:' in b'\r\n' + header_block.lower()
+
+
+class AsyncBuildingServer:
+    """asyncio HTTP/1.1 server for the building management routes"""
+    def __init__(self, host='', port=8000, max_workers=None):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='async-worker')
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host or None, self.port,
+                                                 limit=MAX_HEAD_BYTES)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        client_address = writer.get_extra_info('peername') or ('', 0)
+        try:
+            while await self.handle_request(reader, writer, client_address):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            logger.error(f"Error handling connection from {client_address[0]}: {str(e)}", exc_info=True)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def handle_request(self, reader, writer, client_address):
+        """Serve one request; return True if the connection should stay open"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+        except asyncio.IncompleteReadError:
+            return False
+        except asyncio.LimitOverrunError:
+            await self.send_simple(writer, 431, "Request header fields too large")
+            return False
+
+        # Tolerate stray blank lines between pipelined requests
+        head = head.lstrip(b'\r\n')
+        if not head:
+            return True
+        request_line, _, header_block = head.partition(b'\r\n')
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            await self.send_simple(writer, 400, "Bad request syntax")
+            return False
+        method, target, version = parts
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            await self.send_simple(writer, 411, "Chunked request bodies are not supported")
+            return False
+        try:
+            length = int(headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self.send_simple(writer, 400, "Invalid Content-Length")
+            return False
+        if length > MAX_UPLOAD_BYTES:
+            await self.send_simple(writer, 413, f"Request body exceeds {MAX_UPLOAD_BYTES} bytes")
+            return False
+        if length and headers.get('Expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('Connection', '').lower() != 'close'
+        if method == 'GET' and target == '/events':
+            await self.discard_body(reader, length)
+            started = time.perf_counter()
+            try:
+                await self.serve_events(writer)
+            finally:
+                observe_request('/events', method, 200, time.perf_counter() - started)
+            return False
+        if method in ('GET', 'HEAD'):
+            if target.startswith('/uploads/'):
+                file_path = resolve_upload_path(target)
+            else:
+                # Anything that is not a regular file (directories, missing files) goes to the handler
+                file_path = resolve_static_path(method, target)
+                loop = asyncio.get_running_loop()
+                if file_path and not await loop.run_in_executor(self.executor, os.path.isfile, file_path):
+                    file_path = None
+            if file_path or target.startswith('/uploads/'):
+                await self.discard_body(reader, length)
+                started = time.perf_counter()
+                status, sent = await self.serve_file(writer, method, target, file_path, headers)
+                observe_request(route_label(method, target), method, status, time.perf_counter() - started,
+                                bytes_out=sent)
+                return keep_alive
+
+        request_stream = await self.read_request(reader, head, length)
+        loop = asyncio.get_running_loop()
+        try:
+            response, handler_keep_alive = await loop.run_in_executor(
+                self.executor, self.run_handler, request_stream, client_address)
+        finally:
+            request_stream.close()
+        writer.write(response)
+        await writer.drain()
+        return keep_alive and handler_keep_alive and has_framed_body(response)
+
+    async def read_request(self, reader, head, length):
+        """Copy the request head and body into a buffer for the handler, spilling large bodies to disk"""
+        loop = asyncio.get_running_loop()
+        request_stream = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        request_stream.write(head)
+        remaining = length
+        try:
+            while remaining > 0:
+                chunk = await asyncio.wait_for(reader.read(min(CHUNK_SIZE, remaining)), REQUEST_TIMEOUT)
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b'', remaining)
+                remaining -= len(chunk)
+                if length > SPOOL_MAX_BYTES:
+                    await loop.run_in_executor(self.executor, request_stream.write, chunk)
+                else:
+                    request_stream.write(chunk)
+        except BaseException:
+            request_stream.close()
+            raise
+        request_stream.seek(0)
+        return request_stream
+
+    async def discard_body(self, reader, length):
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.wait_for(reader.read(min(CHUNK_SIZE, remaining)), REQUEST_TIMEOUT)
+            if not chunk:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(chunk)
+
+    def run_handler(self, request_stream, client_address):
+        """Run BuildingManagementHandler on a worker thread; return (response bytes, keep alive)"""
+        handler = BufferedRequestHandler(request_stream, client_address, self)
+        return handler.wfile.getvalue(), not handler.close_connection
+
+    async def serve_file(self, writer, method, target, file_path, request_headers):
+        """Stream a file with loop.sendfile; return (status, body bytes)"""
+        loop = asyncio.get_running_loop()
+        try:
+            f = await loop.run_in_executor(self.executor, open, file_path, 'rb') if file_path else None
+        except OSError:
+            f = None
+        if f is None:
+            await self.send_simple(writer, 404, "File not found")
+            return 404, 0
+
+        with f:
+            st = await loop.run_in_executor(self.executor, os.fstat, f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                await self.send_simple(writer, 404, "File not found")
+                return 404, 0
+            status, headers, start, length = plan_file_response(request_headers, st, file_path)
+            writer.write(self.format_head(status, headers))
+            await writer.drain()
+            if method == 'GET' and length:
+                # Zero-copy where the platform supports it; otherwise asyncio reads the file in a thread
+                await loop.sendfile(writer.transport, f, start, length)
+        logger.debug('"%s %s" %s', method, target, status)
+        return status, length if method == 'GET' else 0
+
+    async def serve_events(self, writer):
+        """Stream document changes as Server-Sent Events without tying up a worker thread"""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscription = change_feed.subscribe(lambda: loop.call_soon_threadsafe(wakeup.set))
+        try:
+            entry = await loop.run_in_executor(self.executor, document_cache.get_entry, 'converted_source.json')
+            writer.write(self.format_head(200, {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'Connection': 'close',
+                'Access-Control-Allow-Origin': '*',
+            }))
+            writer.write(format_event({'event': 'version', 'data': {'version': entry.version}}))
+            await writer.drain()
+            while True:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                events = subscription.drain()
+                if events is None:
+                    break
+                writer.write(b''.join(format_event(event) for event in events) if events else HEARTBEAT)
+                await writer.drain()
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    async def send_simple(self, writer, status, message):
+        """Send a short plain-text response"""
+        body = message.encode('utf-8')
+        writer.write(self.format_head(status, {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Length': str(len(body)),
+            'Access-Control-Allow-Origin': '*',
+        }) + body)
+        await writer.drain()
+
+    @staticmethod
+    def format_head(status, headers):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                 f"Server: {BufferedRequestHandler.server_version}",
+                 f"Date: {email.utils.formatdate(usegmt=True)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def run_async_server(port=8000, threads=None, retention=DEFAULT_POLICY, sharded=False, log_profile=None,
+                     trace=None, trace_sample=1.0):
+    if log_profile:
+        setup_logging(log_profile)
+    if trace:
+        tracer.configure(trace, trace_sample)
+    prepare_server(sharded)
+    start_pruner(retention)
+    server = AsyncBuildingServer('', port, threads)
+    logger.info(f"Serving with asyncio and a pool of {server.max_workers} worker threads")
+    print(f"Server running at http://localhost:{port}")
+    print("Please load a JSON file through the web interface if no version was found")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Building management server (asyncio, HTTP/1.1 keep-alive)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Worker threads for request handlers and file I/O')
+    parser.add_argument('--retention', default=DEFAULT_POLICY,
+                        help="Backup retention, e.g. 'last=20,hourly=24,daily=30,max_mb=512', or 'off'")
+    parser.add_argument('--sharded', action='store_true',
+                        help='Store the document as one file per room and section plus a manifest')
+    parser.add_argument('--log-profile', choices=sorted(PROFILES), default=default_profile(),
+                        help='Logging levels and rotation (default from RENOVATION_LOG_PROFILE)')
+    parser.add_argument('--trace', metavar='TRACE_JSON',
+                        help='Write per-request timing spans to a Chrome trace file (chrome://tracing or Perfetto)')
+    parser.add_argument('--trace-sample', type=float, default=1.0, help='Fraction of requests to trace')
+    args = parser.parse_args()
+    run_async_server(port=args.port, threads=args.threads, retention=args.retention, sharded=args.sharded,
+                     log_profile=args.log_profile, trace=args.trace, trace_sample=args.trace_sample)
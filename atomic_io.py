@@ -0,0 +1,57 @@
+"""Crash-safe file writes shared by the CLI and the server.
+
+Data is written to a temporary file in the target's directory, fsynced, and moved
+over the target with os.replace, after which the directory itself is fsynced so
+the rename survives a power loss. Readers therefore see either the old file or
+the new one, never a partially written file.
+"""
+import json
+import os
+import tempfile
+from typing import Any
+
+
+def fsync_directory(directory: str):
+    """Flush a directory entry to disk; a no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: str, content: bytes, sync: bool = True):
+    """Atomically replace path with content."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        # mkstemp creates files readable only by the owner; keep the usual permissions
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    if sync:
+        fsync_directory(directory)
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 2, sync: bool = True):
+    """Serialize data as JSON and atomically replace path with it."""
+    atomic_write_bytes(path, json.dumps(data, indent=indent).encode('utf-8'), sync=sync)
@@ -0,0 +1 @@
+"""Benchmark and load-test tools for the renovation manager and building management server."""
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Seeded generator for synthetic renovation documents shaped like schema.json.
+
+The same seed and sizes always produce the same document, so benchmark runs
+on different machines or commits measure identical inputs. Rooms get deep
+lighting, fixtures and appliances sections and a long projects list, and the
+contractor groups can be made arbitrarily large.
+
+    python -m benchmarks.generator --rooms 1000 --seed 1 -o big_source.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+ROOM_KINDS = ('kitchen', 'bathroom', 'bedroom', 'living_room', 'office', 'hallway')
+LIGHTING = ('ceiling_fixtures', 'vanity_lights', 'ambient_lighting', 'pendants', 'under_cabinet', 'sconces')
+FIXTURES = ('sink', 'faucet', 'toilet', 'shower', 'bathtub', 'mirror', 'towel_rail', 'outlets')
+APPLIANCES = ('refrigerator', 'stove', 'dishwasher', 'microwave', 'washer', 'dryer', 'range_hood')
+CONTRACTOR_GROUPS = ('electricians', 'plumbers', 'painters', 'carpenters', 'tilers', 'cabinet_installers')
+VENDORS = ('Home Depot', 'IKEA', 'Ace Hardware', 'Benjamin Moore Store', 'Local Supplier', '')
+PRIORITIES = ('high', 'medium', 'low')
+WORDS = ('brushed', 'nickel', 'matte', 'oak', 'white', 'install', 'replace', 'upgrade', 'remove', 'tile',
+         'cabinet', 'storage', 'layout', 'power', 'quote', 'delivery', 'warranty', 'finish', 'trim', 'seal')
+
+
+class DocumentGenerator:
+    def __init__(self, seed: int = 0, projects_per_room: int = 20, items_per_section: int = 4,
+                 contractors_per_group: int = 10):
+        self.rng = random.Random(seed)
+        self.projects_per_room = projects_per_room
+        self.items_per_section = items_per_section
+        self.contractors_per_group = contractors_per_group
+        self.start = datetime(2025, 1, 1)
+
+    def text(self, words: int) -> str:
+        return ' '.join(self.rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    def cost(self, high: float = 2000.0) -> float:
+        # About a fifth of items are unpriced, as in real documents
+        return 0 if self.rng.random() < 0.2 else round(self.rng.uniform(5, high), 2)
+
+    def attachments(self, stem: str) -> List[str]:
+        return [f"{stem}_{i}.{self.rng.choice(('pdf', 'jpg', 'png'))}" for i in range(self.rng.randint(0, 3))]
+
+    def item(self, name: str) -> Dict[str, Any]:
+        return {
+            'items': [self.text(3) for _ in range(self.rng.randint(0, self.items_per_section))],
+            'cost': self.cost(),
+            'notes': self.text(6),
+            'vendor': self.rng.choice(VENDORS),
+            'attachments': self.attachments(name),
+        }
+
+    def section(self, names) -> Dict[str, Any]:
+        count = self.rng.randint(max(1, len(names) // 2), len(names))
+        return {name: self.item(name) for name in self.rng.sample(names, count)}
+
+    def project(self, room_name: str, index: int) -> Dict[str, Any]:
+        return {
+            'title': f"{room_name} project {index}",
+            'description': self.text(12),
+            'budget': round(self.rng.uniform(50, 5000), 2),
+            'priority': self.rng.choice(PRIORITIES),
+            'created_at': (self.start + timedelta(minutes=self.rng.randint(0, 525600))).isoformat(),
+            'status': self.rng.choice(('planned', 'in_progress', 'completed')),
+            'attachments': self.attachments('project'),
+        }
+
+    def room(self, room_name: str) -> Dict[str, Any]:
+        return {
+            'priority': self.rng.choice(PRIORITIES),
+            'budget': {'amount': round(self.rng.uniform(500, 20000), 2), 'notes': self.text(8),
+                       'attachments': self.attachments('budget')},
+            'square_footage': {'value': self.rng.randint(20, 400), 'cost': 0, 'notes': self.text(4),
+                               'vendor': '', 'attachments': []},
+            'lighting': self.section(LIGHTING),
+            'fixtures': self.section(FIXTURES),
+            'appliances': self.section(APPLIANCES),
+            'painting': {
+                'walls': dict(self.item('walls'), color=self.text(2), finish=self.rng.choice(('matte', 'eggshell'))),
+                'ceiling': dict(self.item('ceiling'), color='Pure White', finish='matte'),
+            },
+            'projects': [self.project(room_name, i) for i in range(self.projects_per_room)],
+        }
+
+    def contractor(self, group: str, index: int) -> Dict[str, Any]:
+        contractor = {
+            'name': f"{group.rstrip('s').replace('_', ' ').title()} {index}",
+            'company': f"{self.text(1)} {self.rng.choice(('LLC', 'Co', 'Services'))}",
+            'license_number': f"LIC-{self.rng.randint(10000, 99999)}",
+            'insurance': self.rng.choice(('Yes', 'Pending', '')),
+            'contact': {'phone': f"+971-50-{self.rng.randint(1000000, 9999999)}",
+                        'email': f"{group}{index}@example.com", 'address': self.text(4)},
+        }
+        if self.rng.random() < 0.7:
+            contractor['pay_rate_by_hour'] = round(self.rng.uniform(20, 150), 2)
+        else:
+            contractor['cost'] = self.cost(10000)
+        return contractor
+
+    def document(self, rooms: int) -> Dict[str, Any]:
+        room_names = [f"{ROOM_KINDS[i % len(ROOM_KINDS)]}_{i}" for i in range(rooms)]
+        contractors = {'general_contractor': dict(self.contractor('general_contractor', 1),
+                                                  cost=round(self.rng.uniform(5000, 50000), 2))}
+        for group in CONTRACTOR_GROUPS:
+            contractors[group] = {f"{group.rstrip('s')}{i}": self.contractor(group, i)
+                                  for i in range(1, self.contractors_per_group + 1)}
+        room_data = {name: self.room(name) for name in room_names}
+        return {
+            'project_name': f"Synthetic project ({rooms} rooms)",
+            'last_updated': '2025-01-01',
+            'status': 'planning',
+            'rooms': room_data,
+            'general_considerations': {
+                'building_management': {
+                    'property_manager': {'name': 'Property Manager', 'phone': '+971-4-0000000',
+                                         'email': 'manager@example.com', 'office_hours': '9-5',
+                                         'emergency_contact': '+971-4-1111111'},
+                    'renovation_rules': {'working_hours': '8am-6pm', 'elevator_usage': self.text(6),
+                                         'debris_removal': self.text(6), 'noise_restrictions': self.text(6),
+                                         'insurance_requirements': self.text(6), 'attachments': []},
+                },
+                'contractor_information': contractors,
+                'timeline': {'start_date': '2025-02-01', 'estimated_duration': f"{max(1, rooms // 2)} weeks",
+                             'phase_breakdown': [self.text(6) for _ in range(min(rooms, 50))],
+                             'notes': self.text(6), 'attachments': []},
+                'budget': {'total': round(sum(room['budget']['amount'] for room in room_data.values()), 2),
+                           'room_allocations': {name: room['budget']['amount'] for name, room in room_data.items()},
+                           'contingency': 3500, 'notes': self.text(5), 'attachments': []},
+            },
+        }
+
+
+def generate_document(rooms: int, seed: int = 0, projects_per_room: int = 20, items_per_section: int = 4,
+                      contractors_per_group: int = 10) -> Dict[str, Any]:
+    """Build a synthetic document with the given number of rooms."""
+    generator = DocumentGenerator(seed, projects_per_room, items_per_section, contractors_per_group)
+    return generator.document(rooms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic renovation document')
+    parser.add_argument('--rooms', type=int, default=100, help='Number of rooms')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--projects', type=int, default=20, help='Projects per room')
+    parser.add_argument('--contractors', type=int, default=10, help='Contractors per group')
+    parser.add_argument('-o', '--output', default='synthetic_source.json', help='File to write')
+    args = parser.parse_args()
+    data = generate_document(args.rooms, args.seed, args.projects, contractors_per_group=args.contractors)
+    with open(args.output, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"Wrote {args.rooms} rooms to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Benchmark history and regression detection for benchmarks.suite results.
+
+Runs are kept as timestamped JSON files in a store directory (benchmark_history/
+by default), each tagged with the git commit it was measured on. A run is
+compared with a baseline benchmark by benchmark: the change in mean time gets a
+Welch confidence interval from the repeated samples, so a change only counts as
+a regression or improvement when the interval excludes zero and the change is
+larger than the threshold. compare exits with status 1 if anything regressed.
+
+    python -m benchmarks.suite --json results.json
+    python -m benchmarks.history record results.json --label before-cache
+    python -m benchmarks.history compare results.json --baseline before-cache --threshold 5
+    python -m benchmarks.history list
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.load_test import REPO_ROOT
+
+DEFAULT_STORE = os.path.join(REPO_ROOT, 'benchmark_history')
+
+BenchmarkKey = Tuple[str, int]
+
+
+# Exact Student t quantiles for df 1 to 30 at the usual one-sided levels (two-sided
+# 80, 90, 95, 98 and 99% intervals). Few repeats put comparisons at low df, where
+# the expansion in t_quantile is furthest off.
+T_TABLE = {
+    0.9: (
+        3.0777, 1.8856, 1.6377, 1.5332, 1.4759, 1.4398, 1.4149, 1.3968, 1.3830, 1.3722,
+        1.3634, 1.3562, 1.3502, 1.3450, 1.3406, 1.3368, 1.3334, 1.3304, 1.3277, 1.3253,
+        1.3232, 1.3212, 1.3195, 1.3178, 1.3163, 1.3150, 1.3137, 1.3125, 1.3114, 1.3104),
+    0.95: (
+        6.3138, 2.9200, 2.3534, 2.1318, 2.0150, 1.9432, 1.8946, 1.8595, 1.8331, 1.8125,
+        1.7959, 1.7823, 1.7709, 1.7613, 1.7531, 1.7459, 1.7396, 1.7341, 1.7291, 1.7247,
+        1.7207, 1.7171, 1.7139, 1.7109, 1.7081, 1.7056, 1.7033, 1.7011, 1.6991, 1.6973),
+    0.975: (
+        12.7062, 4.3027, 3.1824, 2.7764, 2.5706, 2.4469, 2.3646, 2.3060, 2.2622, 2.2281,
+        2.2010, 2.1788, 2.1604, 2.1448, 2.1314, 2.1199, 2.1098, 2.1009, 2.0930, 2.0860,
+        2.0796, 2.0739, 2.0687, 2.0639, 2.0595, 2.0555, 2.0518, 2.0484, 2.0452, 2.0423),
+    0.99: (
+        31.8205, 6.9646, 4.5407, 3.7469, 3.3649, 3.1427, 2.9980, 2.8965, 2.8214, 2.7638,
+        2.7181, 2.6810, 2.6503, 2.6245, 2.6025, 2.5835, 2.5669, 2.5524, 2.5395, 2.5280,
+        2.5176, 2.5083, 2.4999, 2.4922, 2.4851, 2.4786, 2.4727, 2.4671, 2.4620, 2.4573),
+    0.995: (
+        63.6567, 9.9248, 5.8409, 4.6041, 4.0321, 3.7074, 3.4995, 3.3554, 3.2498, 3.1693,
+        3.1058, 3.0545, 3.0123, 2.9768, 2.9467, 2.9208, 2.8982, 2.8784, 2.8609, 2.8453,
+        2.8314, 2.8188, 2.8073, 2.7969, 2.7874, 2.7787, 2.7707, 2.7633, 2.7564, 2.7500),
+}
+T_TABLE_MAX_DF = 30
+
+
+def t_quantile(p: float, df: float) -> float:
+    """Student t quantile: from T_TABLE up to df 30, else Hill's expansion of the normal quantile."""
+    key = round(max(p, 1 - p), 6)
+    if key in T_TABLE and df <= T_TABLE_MAX_DF:
+        sign = 1 if p >= 0.5 else -1
+        column = T_TABLE[key]
+        df = max(df, 1.0)
+        low, high = math.floor(df), math.ceil(df)
+        if low == high:
+            return sign * column[low - 1]
+        # Welch df is fractional; quantiles are close to linear in 1/df
+        weight = (1 / low - 1 / df) / (1 / low - 1 / high)
+        return sign * (column[low - 1] + weight * (column[high - 1] - column[low - 1]))
+    z = statistics.NormalDist().inv_cdf(p)
+    if math.isinf(df):
+        return z
+    terms = (
+        (z ** 3 + z) / 4,
+        (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96,
+        (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384,
+        (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160,
+    )
+    return z + sum(term / df ** (i + 1) for i, term in enumerate(terms))
+
+
+@dataclass
+class Comparison:
+    name: str
+    rooms: int
+    baseline_mean: float
+    current_mean: float
+    # Relative change of the mean and its confidence interval, in percent
+    change: float
+    low: float
+    high: float
+    status: str
+
+    @property
+    def key(self) -> BenchmarkKey:
+        return self.name, self.rooms
+
+
+def compare_samples(baseline: List[float], current: List[float], confidence: float) -> Tuple[float, float, float]:
+    """Percent change in mean from baseline to current, with a Welch interval around it."""
+    base_mean = statistics.fmean(baseline)
+    current_mean = statistics.fmean(current)
+    change = (current_mean - base_mean) / base_mean * 100
+    if len(baseline) < 2 or len(current) < 2:
+        # A single sample gives no idea of the noise, so the interval is just the estimate
+        return change, change, change
+    base_var = statistics.variance(baseline) / len(baseline)
+    current_var = statistics.variance(current) / len(current)
+    stderr = math.sqrt(base_var + current_var)
+    if stderr == 0:
+        return change, change, change
+    # Welch-Satterthwaite degrees of freedom
+    df = (base_var + current_var) ** 2 / (base_var ** 2 / (len(baseline) - 1) +
+                                          current_var ** 2 / (len(current) - 1))
+    margin = t_quantile(0.5 + confidence / 2, df) * stderr / base_mean * 100
+    return change, change - margin, change + margin
+
+
+def classify(change: float, low: float, high: float, threshold: float) -> str:
+    if low > 0 and change > threshold:
+        return 'regression'
+    if high < 0 and change < -threshold:
+        return 'improvement'
+    return 'unchanged'
+
+
+def compare_runs(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 5.0,
+                 confidence: float = 0.95) -> Tuple[List[Comparison], List[BenchmarkKey], List[BenchmarkKey]]:
+    """Compare every benchmark in both runs; also return the keys only in current and only in baseline."""
+    base_rows = {(row['name'], row['rooms']): row for row in baseline['results']}
+    current_rows = {(row['name'], row['rooms']): row for row in current['results']}
+    comparisons = []
+    for key, row in current_rows.items():
+        base = base_rows.get(key)
+        if base is None or not base['samples'] or not row['samples'] or base['mean'] <= 0:
+            continue
+        change, low, high = compare_samples(base['samples'], row['samples'], confidence)
+        comparisons.append(Comparison(key[0], key[1], base['mean'], row['mean'], change, low, high,
+                                      classify(change, low, high, threshold)))
+    added = [key for key in current_rows if key not in base_rows]
+    missing = [key for key in base_rows if key not in current_rows]
+    return comparisons, added, missing
+
+
+# The store
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def list_runs(store: str) -> List[str]:
+    """Stored run files, oldest first."""
+    if not os.path.isdir(store):
+        return []
+    return sorted(os.path.join(store, name) for name in os.listdir(store) if name.endswith('.json'))
+
+
+def record_run(run: Dict[str, Any], store: str = DEFAULT_STORE, label: Optional[str] = None) -> str:
+    """Keep a suite run in the store under a timestamped name and return its path."""
+    os.makedirs(store, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = f"{timestamp}_{label}" if label else timestamp
+    if '/' in name or '\\' in name:
+        raise ValueError(f"Invalid label: {label}")
+    path = os.path.join(store, f"{name}.json")
+    run = dict(run, recorded_at=datetime.now().isoformat(timespec='seconds'), label=label,
+               commit=run.get('commit') or git_commit())
+    with open(path, 'w') as f:
+        json.dump(run, f, indent=2)
+    return path
+
+
+def resolve_run(ref: str, store: str = DEFAULT_STORE) -> str:
+    """Path of a run given as a file, 'latest', 'previous', or a stored name, label or commit.
+
+    A ref that only matches the start of stored names is rejected rather than guessed at.
+    """
+    if os.path.isfile(ref):
+        return ref
+    runs = list_runs(store)
+    if ref in ('latest', 'previous'):
+        index = -1 if ref == 'latest' else -2
+        if len(runs) < -index:
+            raise FileNotFoundError(f"Not enough runs in {store} for '{ref}'")
+        return runs[index]
+    exact, labelled, prefixed = [], [], []
+    for path in runs:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem == ref:
+            exact.append(path)
+        elif stem.endswith(f"_{ref}") or load_run(path).get('commit') == ref:
+            labelled.append(path)
+        elif stem.startswith(ref):
+            prefixed.append(path)
+    if exact or labelled:
+        # The newest run wins when a label or commit was recorded more than once
+        return (exact or labelled)[-1]
+    if prefixed:
+        names = ', '.join(os.path.basename(path) for path in prefixed[-3:])
+        raise ValueError(f"'{ref}' only matches the start of stored run names ({names}); "
+                         f"give a full name, label or commit")
+    raise FileNotFoundError(f"No benchmark run matching '{ref}' in {store}")
+
+
+def load_run(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+# Reporting
+
+def print_comparison(comparisons: List[Comparison], added: List[BenchmarkKey], missing: List[BenchmarkKey],
+                     confidence: float):
+    order = {'regression': 0, 'improvement': 1, 'unchanged': 2}
+    ci = f"{confidence * 100:g}% CI"
+    print(f"{'benchmark':<26} {'rooms':>6} {'base ms':>11} {'new ms':>11} {'change':>9} {ci:>19}  status")
+    for c in sorted(comparisons, key=lambda c: (order[c.status], -abs(c.change))):
+        interval = f"[{c.low:+.1f}%, {c.high:+.1f}%]"
+        print(f"{c.name:<26} {c.rooms:>6} {c.baseline_mean * 1000:>11.3f} {c.current_mean * 1000:>11.3f} "
+              f"{c.change:>+8.1f}% {interval:>19}  {c.status}")
+    for name, rooms in added:
+        print(f"{name:<26} {rooms:>6} {'-':>11} {'':>11} {'':>9} {'':>19}  new")
+    for name, rooms in missing:
+        print(f"{name:<26} {rooms:>6} {'':>11} {'-':>11} {'':>9} {'':>19}  missing")
+    counts = {status: sum(1 for c in comparisons if c.status == status) for status in order}
+    print(f"\n{counts['regression']} regressions, {counts['improvement']} improvements, "
+          f"{counts['unchanged']} unchanged")
+
+
+def describe(path: str, run: Dict[str, Any]) -> str:
+    return f"{os.path.basename(path)} (commit {run.get('commit') or 'unknown'}, {run.get('created_at', '?')})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark history and regression detection')
+    parser.add_argument('--store', default=DEFAULT_STORE, help='Directory holding stored runs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help='Keep a suite results file in the store')
+    record.add_argument('results', help='JSON written by benchmarks.suite --json')
+    record.add_argument('--label', help='Name to find the run by later, e.g. a branch')
+
+    commands.add_parser('list', help='List stored runs')
+
+    compare = commands.add_parser('compare', help='Compare a run against a baseline')
+    compare.add_argument('current', nargs='?', default='latest',
+                         help="Results file or stored run (default: latest)")
+    compare.add_argument('--baseline', default=None,
+                         help="Stored run or file to compare against (default: the run before current)")
+    compare.add_argument('--threshold', type=float, default=5.0,
+                         help='Percent slowdown that fails the comparison (default: 5)')
+    compare.add_argument('--confidence', type=float, default=0.95, help='Confidence level (default: 0.95)')
+    compare.add_argument('--json', dest='json_out', help='Write the comparison to this JSON file')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        path = record_run(load_run(args.results), args.store, args.label)
+        print(f"Recorded {args.results} as {path}")
+        return 0
+
+    if args.command == 'list':
+        for path in list_runs(args.store):
+            run = load_run(path)
+            print(f"{os.path.basename(path):<40} commit {run.get('commit') or '-':<10} "
+                  f"{len(run.get('results', [])):>4} benchmarks, repeat {run.get('repeat', '?')}")
+        return 0
+
+    if not 0 < args.confidence < 1:
+        print("--confidence must be between 0 and 1", file=sys.stderr)
+        return 2
+    try:
+        current_path = resolve_run(args.current, args.store)
+        if args.baseline:
+            baseline_path = resolve_run(args.baseline, args.store)
+        else:
+            # The stored run just before current; for a file outside the store, the latest stored run
+            runs = [os.path.abspath(path) for path in list_runs(args.store)]
+            current_abs = os.path.abspath(current_path)
+            earlier = runs[:runs.index(current_abs)] if current_abs in runs else runs
+            if not earlier:
+                raise FileNotFoundError(f"No baseline run in {args.store}; pass --baseline")
+            baseline_path = earlier[-1]
+    except (FileNotFoundError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    baseline, current = load_run(baseline_path), load_run(current_path)
+    print(f"Baseline: {describe(baseline_path, baseline)}")
+    print(f"Current:  {describe(current_path, current)}\n")
+    comparisons, added, missing = compare_runs(baseline, current, args.threshold, args.confidence)
+    print_comparison(comparisons, added, missing, args.confidence)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'baseline': baseline_path, 'current': current_path, 'threshold': args.threshold,
+                       'confidence': args.confidence, 'comparisons': [asdict(c) for c in comparisons],
+                       'new': [list(key) for key in added], 'missing': [list(key) for key in missing]},
+                      f, indent=2)
+    return 1 if any(c.status == 'regression' for c in comparisons) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
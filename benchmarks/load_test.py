@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Load-test harness for building_management_server.py.
+
+Starts the server in a subprocess against a scratch copy of converted_source.json,
+drives GET /converted_source.json from several client processes to measure read
+throughput, then fires concurrent /add_project and /save_rooms requests and checks
+that none of the writes were lost.
+
+    python -m benchmarks.load_test --threads 0,4,16 --clients 1,2,4,8
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(REPO_ROOT, 'building_management_server.py')
+
+
+def free_port() -> int:
+    """Ask the OS for an unused TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout: float = 10.0):
+    """Block until the server accepts connections."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start within {timeout}s")
+
+
+def start_server(workdir: str, port: int, threads: int) -> subprocess.Popen:
+    """Launch the server in workdir and wait for it to come up."""
+    proc = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--port', str(port), '--threads', str(threads)],
+        cwd=workdir,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_server(port)
+    return proc
+
+
+def request(port: int, method: str, path: str, payload=None, headers=None):
+    """Issue one request and return (status, body); payload is sent as JSON unless it is bytes."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        if isinstance(payload, bytes):
+            body = payload
+        else:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        if headers is None:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def read_worker(port: int, duration: float):
+    """Hammer GET /converted_source.json for duration seconds; return count and latencies."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            status, _ = request(port, 'GET', '/converted_source.json')
+            if status != 200:
+                errors += 1
+        except OSError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_read_phase(port: int, clients: int, duration: float):
+    """Measure read throughput with the given number of client processes."""
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(read_worker, port, duration) for _ in range(clients)]
+        results = [f.result() for f in futures]
+    latencies = [lat for lats, _ in results for lat in lats]
+    errors = sum(err for _, err in results)
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run_write_phase(port: int, writes: int, concurrency: int):
+    """Fire concurrent writes and verify that every one of them landed."""
+    status, body = request(port, 'GET', '/converted_source.json')
+    rooms = list(json.loads(body)['rooms'].keys())
+    run_id = f"loadtest-{time.time_ns()}"
+
+    def add_project(i):
+        room_name = rooms[i % len(rooms)]
+        return request(port, 'POST', '/add_project', {
+            'title': f"{run_id}-{i}",
+            'description': 'load test',
+            'budget': 1,
+            'priority': 'low',
+            'room_name': room_name,
+        })[0]
+
+    def save_rooms(i):
+        room_name = rooms[i % len(rooms)]
+        return request(port, 'POST', '/save_rooms', {
+            room_name: {'priority': 'medium', 'budget': {'amount': 1000 + i, 'notes': run_id}},
+        })[0]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Interleave both writers so they contend for the same document
+        futures = [pool.submit(add_project, i) for i in range(writes)]
+        futures += [pool.submit(save_rooms, i) for i in range(writes)]
+        statuses = [f.result() for f in futures]
+
+    status, body = request(port, 'GET', '/converted_source.json')
+    data = json.loads(body)
+    landed = sum(
+        1
+        for room in data['rooms'].values()
+        for project in room.get('projects', [])
+        if project.get('title', '').startswith(f"{run_id}-")
+    )
+    return {
+        'writes': writes,
+        'failed_requests': sum(1 for s in statuses if s != 200),
+        'projects_landed': landed,
+        'lost_writes': writes - landed,
+    }
+
+
+def parse_int_list(value: str):
+    """Parse a comma-separated list of integers."""
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test for the building management server')
+    parser.add_argument('--threads', type=parse_int_list, default=[0, os.cpu_count() or 1, 16],
+                        help='Comma-separated server worker counts to test (0 = single-threaded)')
+    parser.add_argument('--clients', type=parse_int_list, default=[1, 2, 4, 8],
+                        help='Comma-separated client process counts for the read phase')
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per read measurement')
+    parser.add_argument('--writes', type=int, default=50, help='Concurrent /add_project requests per run')
+    parser.add_argument('--source', default=os.path.join(REPO_ROOT, 'converted_source.json'),
+                        help='Document to serve')
+    parser.add_argument('--json', dest='json_out', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for threads in args.threads:
+        workdir = tempfile.mkdtemp(prefix='reno_load_')
+        shutil.copy(args.source, os.path.join(workdir, 'converted_source.json'))
+        port = free_port()
+        proc = start_server(workdir, port, threads)
+        try:
+            label = 'single-threaded' if threads == 0 else f"{threads} workers"
+            print(f"\nServer: {label}")
+            print("-" * 60)
+            print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+            reads = []
+            for clients in args.clients:
+                row = run_read_phase(port, clients, args.duration)
+                reads.append(row)
+                print(f"{clients:>8} {row['requests_per_sec']:>10.1f} {row['p50_ms']:>10.2f} "
+                      f"{row['p99_ms']:>10.2f} {row['errors']:>8}")
+            writes = run_write_phase(port, args.writes, max(args.clients))
+            print(f"Writes: {writes['projects_landed']}/{writes['writes']} projects landed, "
+                  f"{writes['lost_writes']} lost, {writes['failed_requests']} failed requests")
+            results.append({'threads': threads, 'reads': reads, 'writes': writes})
+        finally:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+    lost = sum(r['writes']['lost_writes'] for r in results)
+    return 1 if lost else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Compare the threaded server with the asyncio server.
+
+Each server runs in a subprocess against a scratch copy of converted_source.json.
+Client processes reuse one HTTP/1.1 connection each and cycle through the requests
+a page load makes, so the asyncio server's keep-alive is measured against the
+threaded server's connection-per-request. Reports requests/sec and p50/p99 latency.
+
+    python -m benchmarks.server_bench --clients 1,4,16 --duration 5
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.load_test import REPO_ROOT, SERVER_SCRIPT, free_port, parse_int_list, percentile, wait_for_server
+
+ASYNC_SERVER_SCRIPT = os.path.join(REPO_ROOT, 'async_server.py')
+SERVERS = {
+    'threaded': SERVER_SCRIPT,
+    'asyncio': ASYNC_SERVER_SCRIPT,
+}
+DEFAULT_PATHS = '/converted_source.json,/totals,/list_json_files,/building_management.html'
+
+
+def start_server(script: str, workdir: str, port: int, threads: int) -> subprocess.Popen:
+    """Launch a server script in workdir and wait for it to come up."""
+    command = [sys.executable, script, '--port', str(port)]
+    if threads:
+        command += ['--threads', str(threads)]
+    proc = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_server(port)
+    return proc
+
+
+def client_worker(port: int, paths, duration: float):
+    """Request paths round-robin over one reused connection; return latencies, errors and connects."""
+    latencies = []
+    errors = 0
+    connects = 0
+    conn = None
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if conn is None or conn.sock is None:
+                conn = conn or http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                conn.connect()
+                connects += 1
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+            if response.will_close:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            if conn is not None:
+                conn.close()
+        latencies.append(time.perf_counter() - start)
+    if conn is not None:
+        conn.close()
+    return latencies, errors, connects
+
+
+def run_clients(port: int, clients: int, paths, duration: float):
+    with ProcessPoolExecutor(max_workers=clients) as pool:
+        futures = [pool.submit(client_worker, port, paths, duration) for _ in range(clients)]
+        results = [f.result() for f in futures]
+    latencies = [lat for lats, _, _ in results for lat in lats]
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': sum(err for _, err, _ in results),
+        'connections': sum(conns for _, _, conns in results),
+        'requests_per_sec': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded vs asyncio server benchmark')
+    parser.add_argument('--servers', default=','.join(SERVERS),
+                        help='Comma-separated servers to test (threaded, asyncio)')
+    parser.add_argument('--clients', type=parse_int_list, default=[1, 4, 16],
+                        help='Comma-separated client process counts')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Server worker threads (0 = each server\'s default pool size)')
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per measurement')
+    parser.add_argument('--paths', default=DEFAULT_PATHS, help='Comma-separated paths to request in turn')
+    parser.add_argument('--source', default=os.path.join(REPO_ROOT, 'converted_source.json'),
+                        help='Document to serve')
+    parser.add_argument('--json', dest='json_out', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    paths = [p for p in args.paths.split(',') if p]
+    results = []
+    for name in [s for s in args.servers.split(',') if s]:
+        workdir = tempfile.mkdtemp(prefix='reno_bench_')
+        shutil.copy(args.source, os.path.join(workdir, 'converted_source.json'))
+        shutil.copy(os.path.join(REPO_ROOT, 'building_management.html'), workdir)
+        port = free_port()
+        proc = start_server(SERVERS[name], workdir, port, args.threads)
+        try:
+            print(f"\nServer: {name}")
+            print("-" * 70)
+            print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'conns':>8} {'errors':>8}")
+            rows = []
+            for clients in args.clients:
+                row = run_clients(port, clients, paths, args.duration)
+                rows.append(row)
+                print(f"{clients:>8} {row['requests_per_sec']:>10.1f} {row['p50_ms']:>10.2f} "
+                      f"{row['p99_ms']:>10.2f} {row['connections']:>8} {row['errors']:>8}")
+            results.append({'server': name, 'runs': rows})
+        finally:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'paths': paths, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+    return 1 if any(row['errors'] for r in results for row in r['runs']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Benchmark suite over synthetic documents of increasing size.
+
+For each room count a seeded document is generated (see benchmarks.generator)
+and the following are timed, each repeated so runs can be compared with
+benchmarks that report noise:
+
+    manager.*   load (single file, lazy and sharded), save, path lookups, set,
+                delete and format_value
+    report.*    cost aggregation, the markdown, json and csv renderers, and
+                generate_cost_report in each format
+    http.*      every route of the server, over loopback against a server subprocess
+
+Every sample is one repeat and holds seconds per operation; lookups and HTTP
+requests average over several operations per sample. An /events stream stays
+open until the server next writes to it, so http.events times how long a change
+takes to reach one open stream rather than opening a stream per request. Results are written as
+JSON with all samples kept; --record also keeps the run in the benchmark
+history so later runs can be checked against it with benchmarks.history.
+
+    python -m benchmarks.suite --rooms 10,100,1000 --repeat 5 --json results.json
+    python -m benchmarks.suite --rooms 100 --record --label main
+"""
+import argparse
+import gc
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.generator import generate_document
+from benchmarks.history import record_run
+from benchmarks.load_test import REPO_ROOT, free_port, parse_int_list, request
+from benchmarks.server_bench import SERVERS, start_server
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def measure(func: Callable[[], Any], repeat: int, number: int = 1,
+            setup: Optional[Callable[[], Any]] = None) -> List[float]:
+    """Seconds per call of func, one sample per repeat; setup runs untimed before each sample."""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def summarize(name: str, rooms: int, samples: List[float]) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'rooms': rooms,
+        'unit': 'seconds',
+        'samples': samples,
+        'mean': statistics.fmean(samples),
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def leaf_paths(node: Any, prefix=()) -> List[list]:
+    """Paths to every scalar in a document."""
+    if isinstance(node, dict):
+        return [path for key, value in node.items() for path in leaf_paths(value, prefix + (key,))]
+    if isinstance(node, list):
+        return [path for i, value in enumerate(node) for path in leaf_paths(value, prefix + (str(i),))]
+    return [list(prefix)]
+
+
+def bench_manager(data: Dict[str, Any], workdir: str, rooms: int, args) -> List[Dict[str, Any]]:
+    """Time the CLI's document operations in-process."""
+    # Imported here so main's log file is created in the scratch directory
+    from main import RenovationManager
+    from sharded_store import ShardedDocument
+
+    source = os.path.join(workdir, 'new_source.json')
+    with open(source, 'w') as f:
+        json.dump(data, f, indent=2)
+    rng = random.Random(args.seed)
+    paths = rng.choices(leaf_paths(data), k=args.lookups)
+    room_names = list(data['rooms'])
+    results = []
+
+    def add(name, samples):
+        results.append(summarize(name, rooms, samples))
+
+    add('manager.load', measure(lambda: RenovationManager(source), args.repeat))
+    manager = RenovationManager(source)
+    add('manager.save', measure(manager.save_json, args.repeat))
+    add('manager.format_value', measure(lambda: manager.format_value(data), args.repeat))
+
+    def lookups(target):
+        return lambda: [target.get_nested_value(path) for path in paths]
+
+    add('manager.get', [s / len(paths) for s in measure(lookups(manager), args.repeat)])
+    indexed = RenovationManager(source, indexed=True)
+    add('manager.get_indexed', [s / len(paths) for s in measure(lookups(indexed), args.repeat)])
+    lazy_paths = paths[:max(1, len(paths) // 10)]
+    add('manager.get_lazy', [s / len(lazy_paths) for s in measure(
+        lambda: [RenovationManager(source, lazy=True).get_nested_value(path) for path in lazy_paths],
+        args.repeat)])
+
+    # Each edit without a journal is a full save, as it is for the interactive CLI
+    budget_path = ['rooms', room_names[-1], 'budget', 'amount']
+    add('manager.set', measure(lambda: manager.set_nested_value(budget_path, round(rng.uniform(1, 9999), 2)),
+                               args.repeat))
+    note_path = ['rooms', room_names[-1], 'benchmark_note']
+    add('manager.delete', measure(lambda: manager.delete_nested_value(note_path), args.repeat,
+                                  setup=lambda: manager.set_nested_value(note_path, 'note')))
+    journaled = RenovationManager(source, journal=True)
+    add('manager.set_journal', measure(
+        lambda: journaled.set_nested_value(budget_path, round(rng.uniform(1, 9999), 2)), args.repeat))
+    journaled.close()
+
+    sharded_source = os.path.join(workdir, 'sharded', 'new_source.json')
+    os.makedirs(os.path.dirname(sharded_source))
+    ShardedDocument(sharded_source).create(data)
+    add('manager.load_sharded', measure(lambda: RenovationManager(sharded_source), args.repeat))
+    sharded = RenovationManager(sharded_source)
+    add('manager.set_sharded', measure(
+        lambda: sharded.set_nested_value(budget_path, round(rng.uniform(1, 9999), 2)), args.repeat))
+    return results
+
+
+def bench_reports(data: Dict[str, Any], workdir: str, rooms: int, args) -> List[Dict[str, Any]]:
+    from cost_engine import RENDERERS, aggregate_costs
+    from main import RenovationManager, generate_cost_report
+
+    results = [summarize('report.aggregate', rooms, measure(lambda: aggregate_costs(data), args.repeat))]
+    report = aggregate_costs(data)
+    for report_format, render in RENDERERS.items():
+        results.append(summarize(f"report.{report_format}", rooms,
+                                 measure(lambda: render(report), args.repeat)))
+
+    # Drop the cached report before each sample, so it is timed as the first report after an edit
+    manager = RenovationManager(os.path.join(workdir, 'new_source.json'))
+    for report_format in RENDERERS:
+        results.append(summarize(f"report.generate_{report_format}", rooms, measure(
+            lambda: generate_cost_report(manager, report_format=report_format), args.repeat,
+            setup=lambda: setattr(manager, '_cost_report', None))))
+    return results
+
+
+UPLOAD_BOUNDARY = 'benchmark-suite-boundary'
+UPLOAD_HEADERS = {'Content-Type': f"multipart/form-data; boundary={UPLOAD_BOUNDARY}"}
+
+
+def upload_body(room_name: str, size: int = 64 * 1024) -> bytes:
+    """A multipart form with the room name and one text file of size bytes."""
+    return b''.join([
+        f"--{UPLOAD_BOUNDARY}\r\nContent-Disposition: form-data; name=\"room_name\"\r\n\r\n"
+        f"{room_name}\r\n".encode('utf-8'),
+        f"--{UPLOAD_BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"bench.txt\"\r\n"
+        f"Content-Type: text/plain\r\n\r\n".encode('utf-8'),
+        b'x' * size,
+        f"\r\n--{UPLOAD_BOUNDARY}--\r\n".encode('utf-8'),
+    ])
+
+
+def http_routes(data: Dict[str, Any]) -> List[tuple]:
+    """(name, method, path, payload, headers) for each route, with payloads that fit the document.
+
+    Paths may refer to {version}, a stored version, and {upload}, an uploaded file.
+    """
+    room_name = next(iter(data['rooms']))
+    room = data['rooms'][room_name]
+    return [
+        ('http.get_index', 'GET', '/', None, None),
+        ('http.head_index', 'HEAD', '/', None, None),
+        ('http.get_document', 'GET', '/converted_source.json', None, None),
+        ('http.get_totals', 'GET', '/totals', None, None),
+        ('http.list_versions', 'GET', '/list_json_files', None, None),
+        ('http.list_versions_page', 'GET', '/list_json_files?limit=50', None, None),
+        ('http.diff_current', 'GET', '/diff?from={version}&to=current', None, None),
+        ('http.get_upload', 'GET', '/uploads/{upload}', None, None),
+        ('http.metrics', 'GET', '/metrics', None, None),
+        ('http.upload', 'POST', '/upload', upload_body(room_name), UPLOAD_HEADERS),
+        ('http.save_rooms', 'POST', '/save_rooms', {room_name: {
+            'priority': room['priority'], 'budget': room['budget'],
+            'square_footage': {'value': room['square_footage']['value']}}}, None),
+        ('http.save_building', 'POST', '/save',
+         data['general_considerations']['building_management'], None),
+        ('http.add_project', 'POST', '/add_project', {
+            'room_name': room_name, 'title': 'Benchmark project', 'description': 'Added by the suite',
+            'budget': 100, 'priority': 'low'}, None),
+        ('http.patch_document', 'PATCH', '/converted_source.json', [
+            {'op': 'replace', 'path': f"/rooms/{room_name}/priority", 'value': room['priority']}], None),
+        # Restores the stored version as the current document, so it runs after the edits
+        ('http.load_version', 'GET', '/load_json/{version}', None, None),
+    ]
+
+
+def read_event(response) -> bytes:
+    """The next event from an open /events response, skipping keep-alive comments."""
+    while True:
+        lines = []
+        while True:
+            line = response.fp.readline()
+            if not line:
+                raise ConnectionError("Event stream closed")
+            if line in (b'\n', b'\r\n'):
+                break
+            lines.append(line)
+        if lines and not all(line.startswith(b':') for line in lines):
+            return b''.join(lines)
+
+
+def bench_events(port: int, data: Dict[str, Any], rooms: int, args) -> Optional[Dict[str, Any]]:
+    """Time from a POST /save_rooms to its change event arriving on an open /events stream."""
+    room_name = next(iter(data['rooms']))
+    room = data['rooms'][room_name]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request('GET', '/events')
+        response = conn.getresponse()
+        if response.status != 200:
+            print(f"  http.events: GET /events returned {response.status}, skipped")
+            return None
+        read_event(response)  # The current version, sent as the stream opens
+        priorities = iter(['low', 'high'] * (args.repeat * args.requests + 1))
+
+        def change():
+            # The priority alternates so every save is a change that produces an event
+            request(port, 'POST', '/save_rooms', {room_name: {
+                'priority': next(priorities), 'budget': room['budget'],
+                'square_footage': {'value': room['square_footage']['value']}}})
+            read_event(response)
+
+        return summarize('http.events', rooms, measure(change, args.repeat, args.requests))
+    finally:
+        conn.close()
+
+
+def bench_http(data: Dict[str, Any], workdir: str, rooms: int, args) -> List[Dict[str, Any]]:
+    """Time each route against a server subprocess serving the document."""
+    serve_dir = os.path.join(workdir, 'server')
+    os.makedirs(serve_dir)
+    with open(os.path.join(serve_dir, 'converted_source.json'), 'w') as f:
+        json.dump(data, f, indent=2)
+    shutil.copy(os.path.join(REPO_ROOT, 'building_management.html'), serve_dir)
+    port = free_port()
+    proc = start_server(SERVERS[args.server], serve_dir, port, 0)
+    results = []
+    try:
+        # A save and an upload first, so there is a stored version and a file to fetch
+        routes = http_routes(data)
+        save_rooms = next(route for route in routes if route[0] == 'http.save_rooms')
+        request(port, save_rooms[1], save_rooms[2], save_rooms[3])
+        status, body = request(port, 'GET', '/list_json_files')
+        version = json.loads(body)[0] if status == 200 and json.loads(body) else 'current'
+        upload = next(route for route in routes if route[0] == 'http.upload')
+        status, body = request(port, upload[1], upload[2], upload[3], upload[4])
+        uploaded = f"{next(iter(data['rooms']))}/{json.loads(body)['metadata']['filename']}" if status == 200 else ''
+
+        for name, method, path, payload, headers in routes:
+            path = path.format(version=version, upload=uploaded)
+            status, _ = request(port, method, path, payload, headers)  # Warm the server's caches
+            if status >= 400:
+                print(f"  {name}: {method} {path} returned {status}, skipped")
+                continue
+            samples = measure(lambda: request(port, method, path, payload, headers), args.repeat, args.requests)
+            results.append(summarize(name, rooms, samples))
+        events = bench_events(port, data, rooms, args)
+        if events is not None:
+            results.append(events)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'benchmark':<26} {'rooms':>6} {'mean ms':>11} {'median ms':>11} {'stdev ms':>10}")
+    for row in results:
+        print(f"{row['name']:<26} {row['rooms']:>6} {row['mean'] * 1000:>11.3f} "
+              f"{row['median'] * 1000:>11.3f} {row['stdev'] * 1000:>10.3f}")
+
+
+def run_suite(args) -> Dict[str, Any]:
+    results = []
+    original_dir = os.getcwd()
+    for rooms in args.rooms:
+        workdir = tempfile.mkdtemp(prefix='reno_suite_')
+        try:
+            os.chdir(workdir)
+            start = time.perf_counter()
+            data = generate_document(rooms, seed=args.seed, projects_per_room=args.projects,
+                                     contractors_per_group=args.contractors)
+            print(f"\n{rooms} rooms: generated in {time.perf_counter() - start:.2f}s, "
+                  f"{len(json.dumps(data)) / 1e6:.1f} MB")
+            rows = bench_manager(data, workdir, rooms, args) + bench_reports(data, workdir, rooms, args)
+            if not args.no_http:
+                rows += bench_http(data, workdir, rooms, args)
+            print_results(rows)
+            results.extend(rows)
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'server': None if args.no_http else args.server,
+        'results': results,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Benchmark suite over synthetic renovation documents')
+    parser.add_argument('--rooms', type=parse_int_list, default=[10, 100, 1000],
+                        help='Comma-separated room counts to generate')
+    parser.add_argument('--repeat', type=int, default=5, help='Samples per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='Generator and lookup seed')
+    parser.add_argument('--projects', type=int, default=20, help='Projects per room')
+    parser.add_argument('--contractors', type=int, default=10, help='Contractors per group')
+    parser.add_argument('--lookups', type=int, default=1000, help='Path lookups per sample')
+    parser.add_argument('--requests', type=int, default=10, help='HTTP requests per sample')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='threaded', help='Server to benchmark')
+    parser.add_argument('--no-http', action='store_true', help='Skip the HTTP benchmarks')
+    parser.add_argument('--json', dest='json_out', help='Write results to this JSON file')
+    parser.add_argument('--record', action='store_true',
+                        help='Also keep the run in the benchmark history (see benchmarks.history)')
+    parser.add_argument('--label', help='Label for the recorded run')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.repeat < 1:
+        print("--repeat must be at least 1", file=sys.stderr)
+        return 2
+    if args.json_out:
+        args.json_out = os.path.abspath(args.json_out)
+    run = run_suite(args)
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+    if args.record:
+        print(f"Recorded run as {record_run(run, label=args.label)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,6 @@
 from http.server import HTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import json
 from pathlib import Path
 import os
@@ -8,44 +10,148 @@ import shutil
 import uuid
 import mimetypes
 import traceback
+import threading
+import hashlib
+import zlib
+import socket
+import stat
+import email.utils
+import time
+import urllib.parse
 
-# Configure logging with more detailed formatting
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('server.log', encoding='utf-8')
-    ]
-)
+from atomic_io import atomic_write_json
+from logging_setup import PROFILES, configure_logging, default_profile
+from version_store import VersionStore, BACKUP_KIND
+from version_diff import Ref, TreeDiffer
+from sharded_store import ShardedDocument
+from retention import DEFAULT_POLICY, BackgroundPruner, RetentionPolicy, backup_pattern, prune_files
+from multipart_upload import MultipartError, parse_multipart_stream
+from cost_engine import CostTotals
+from change_feed import HEARTBEAT, ChangeFeed, format_event
+from json_patch import PatchError, PatchTestFailed, apply_patch, changed_paths
+from metrics import REGISTRY
+from tracing import tracer
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+def setup_logging(profile=None):
+    """Log to server.log and the console, with JSON operations also in json_operations.log"""
+    configure_logging('server.log', profile, fmt=LOG_FORMAT, extra_files={'json_operations': 'json_operations.log'})
+
+# Records are queued and written by a background thread, never by request threads
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Add file handler for JSON-specific operations
+# Logger for JSON-specific operations
 json_logger = logging.getLogger('json_operations')
-json_logger.setLevel(logging.DEBUG)
-json_handler = logging.FileHandler('json_operations.log', encoding='utf-8')
-json_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'))
-json_logger.addHandler(json_handler)
+access_logger = logging.getLogger('access')
+
+# Upload limits; bodies are streamed to disk so these bound disk use, not memory
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+MAX_UPLOAD_FILE_BYTES = 100 * 1024 * 1024
+UPLOAD_TEMP_DIR = os.path.join('uploads', '.incoming')
+
+# Idle interval after which /events streams send a keep-alive comment
+EVENT_HEARTBEAT_SECONDS = 15
+# Retry-After sent when every /events slot is taken
+EVENT_RETRY_AFTER_SECONDS = 30
+
+# How often the background pruner applies the retention policy
+PRUNE_INTERVAL_SECONDS = 300
+
+# Largest page /list_json_files will return
+MAX_PAGE_SIZE = 500
+
+# Routes reported under their own name in metrics; anything else is grouped
+METRIC_ROUTES = {'/', '/list_json_files', '/totals', '/events', '/diff', '/metrics', '/converted_source.json',
+                 '/upload', '/add_project', '/save', '/save_rooms'}
+
+http_requests = REGISTRY.counter('renovation_http_requests_total', 'HTTP requests by route, method and status',
+                                 ['route', 'method', 'status'])
+http_latency = REGISTRY.histogram('renovation_http_request_seconds', 'Time from request line to response',
+                                  ['route', 'method'])
+http_bytes_in = REGISTRY.counter('renovation_http_request_bytes_total', 'Request body bytes received', ['route'])
+http_bytes_out = REGISTRY.counter('renovation_http_response_bytes_total', 'Response body bytes sent', ['route'])
+stage_seconds = REGISTRY.histogram('renovation_stage_seconds',
+                                   'Time spent loading, saving, backing up and validating documents', ['stage'])
+
+def route_label(method, path):
+    """Bounded route name for metrics"""
+    path = urllib.parse.urlsplit(path).path
+    if path in METRIC_ROUTES:
+        return path
+    for prefix in ('/uploads/', '/load_json/'):
+        if path.startswith(prefix):
+            return prefix + '*'
+    return 'static' if method in ('GET', 'HEAD') else 'other'
+
+def observe_request(route, method, status, seconds, bytes_in=0, bytes_out=0):
+    """Record one served request"""
+    http_requests.inc(route=route, method=method, status=str(status))
+    http_latency.observe(seconds, route=route, method=method)
+    if bytes_in:
+        http_bytes_in.inc(bytes_in, route=route)
+    if bytes_out:
+        http_bytes_out.inc(bytes_out, route=route)
+
+# Deduplicated store holding saved versions and pre-save backups
+version_store = VersionStore('versions')
 
 def get_latest_version():
-    """Get the latest version file from the versions directory"""
-    versions_dir = 'versions'
-    if not os.path.exists(versions_dir):
-        os.makedirs(versions_dir)
-        logger.info(f"Created versions directory: {versions_dir}")
+    """Get the name of the latest saved version from the version store"""
+    entry = version_store.latest()
+    if not entry:
         return None
-    
-    version_files = [f for f in os.listdir(versions_dir) if f.endswith('.json')]
-    if not version_files:
-        return None
-    
-    latest_version = sorted(version_files)[-1]
-    return os.path.join(versions_dir, latest_version)
+    return entry['name']
+
+@tracer.traced()
+def commit_version(data, timestamp):
+    """Store data as a new version, recording its author and cost totals in the manifest"""
+    totals = CostTotals.from_document(data)
+    summary = {
+        'project_total': totals.project_total,
+        'room_total': totals.room_total,
+        'contractor_total': totals.contractor_total,
+    }
+    return version_store.commit(data, timestamp=timestamp, author=data.get('last_modified_by'), summary=summary)
 
+def manifest_record(entry):
+    """Public view of a version manifest entry"""
+    return {
+        'name': entry['name'],
+        'kind': entry['kind'],
+        'timestamp': entry.get('timestamp'),
+        'hash': entry['root'],
+        'size': entry.get('size'),
+        'author': entry.get('author'),
+        'summary': entry.get('summary'),
+        'parent': entry.get('parent'),
+    }
+
+# One ShardedDocument per path, so concurrent saves share its manifest lock
+sharded_documents = {}
+sharded_documents_lock = threading.Lock()
+
+def sharded_document(filepath):
+    """The sharded layout of filepath if it has been converted to one, else None"""
+    key = os.path.abspath(filepath)
+    with sharded_documents_lock:
+        shards = sharded_documents.get(key)
+        if shards is None:
+            shards = sharded_documents[key] = ShardedDocument(filepath)
+    return shards if shards.exists() else None
+
+@stage_seconds.time(stage='load_json_file')
+@tracer.traced()
 def load_json_file(filepath, backup_recovery=True):
     """Load and parse a JSON file with error handling and backup recovery"""
     json_logger.info(f"Attempting to load JSON file: {filepath}")
     try:
+        shards = sharded_document(filepath)
+        if shards is not None:
+            data = shards.load()
+            json_logger.info(f"Successfully loaded JSON from the shards of {filepath}")
+            return data
         with open(filepath, 'r', encoding='utf-8') as f:
             try:
                 data = json.load(f)
@@ -54,12 +160,11 @@ def load_json_file(filepath, backup_recovery=True):
             except json.JSONDecodeError as e:
                 json_logger.error(f"JSON decode error in {filepath}: {str(e)}", exc_info=True)
                 if backup_recovery:
-                    # Attempt to recover from backup
-                    backup_files = sorted([f for f in os.listdir() if f.startswith(f"{os.path.basename(filepath)}.") and f.endswith('.bak')])
-                    if backup_files:
-                        latest_backup = backup_files[-1]
-                        json_logger.warning(f"Attempting to recover from backup: {latest_backup}")
-                        return load_json_file(latest_backup, backup_recovery=False)
+                    # Attempt to recover from the newest backup in the version store
+                    backup = version_store.latest(kind=BACKUP_KIND, prefix=f"{os.path.basename(filepath)}.")
+                    if backup:
+                        json_logger.warning(f"Attempting to recover from backup: {backup['name']}")
+                        return version_store.load(backup['name'])
                 raise
     except FileNotFoundError:
         json_logger.error(f"File not found: {filepath}", exc_info=True)
@@ -68,28 +173,200 @@ def load_json_file(filepath, backup_recovery=True):
         json_logger.error(f"Unexpected error loading {filepath}: {str(e)}", exc_info=True)
         raise
 
-def save_json_file(filepath, data, indent=2):
-    """Save JSON data to file with error handling"""
+@stage_seconds.time(stage='save_json_file')
+@tracer.traced()
+def save_json_file(filepath, data, indent=2, touched=None):
+    """Save JSON data to file with error handling
+    
+    touched lists the paths the caller edited; a sharded document then only
+    rewrites those rooms and sections and merges them into its current manifest.
+    """
     json_logger.info(f"Attempting to save JSON file: {filepath}")
     try:
+        shards = sharded_document(filepath)
+        previous = document_cache.peek(filepath)
+        
         # Create backup before saving
-        if os.path.exists(filepath):
-            create_backup(filepath)
+        if shards is not None or os.path.exists(filepath):
+            # The cached copy is what is on disk unless the file changed behind our back
+            current = None
+            if previous is not None and previous.stat_key == DocumentCache._stat_key(filepath):
+                current = previous.data
+            create_backup(filepath, current)
         
         # Only create directories if filepath includes a directory path
         directory = os.path.dirname(filepath)
         if directory:
             os.makedirs(directory, exist_ok=True)
         
-        # Save the file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=indent)
-        json_logger.info(f"Successfully saved JSON to {filepath}")
+        if shards is not None:
+            # Only rooms and sections that changed are rewritten
+            written = shards.save(data, touched)
+            json_logger.info(f"Successfully saved JSON to {filepath} ({len(written)} shards written)")
+        else:
+            # Write to a temporary file and rename it over the target so readers never see a torn file
+            atomic_write_json(filepath, data, indent=indent)
+            json_logger.info(f"Successfully saved JSON to {filepath}")
+        
+        # Keep the in-memory copy in step with what we just wrote
+        entry = document_cache.update(filepath, data)
+        
+        # Push the change to /events subscribers; the diff is only computed when someone listens
+        if (previous is not None and entry is not None and change_feed.has_subscribers()
+                and os.path.basename(filepath) == 'converted_source.json'):
+            change_feed.publish_change(previous.version, entry.version, previous.data, entry.data)
         return True
     except Exception as e:
         json_logger.error(f"Error saving JSON to {filepath}: {str(e)}", exc_info=True)
         return False
 
+class CachedDocument:
+    """A parsed document together with its serialized response body"""
+    def __init__(self, body, stat_key, data=None):
+        self.body = body
+        self.stat_key = stat_key
+        self.version = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{self.version}"'
+        self._data = data
+        self._gzip_body = None
+        self._totals = None
+
+    @property
+    def totals(self):
+        """Cost totals for this document version, computed once and served from memory"""
+        if self._totals is None:
+            totals = CostTotals.from_document(self.data).as_dict()
+            totals['version'] = self.version
+            self._totals = totals
+        return self._totals
+
+    @property
+    def gzip_body(self):
+        """Gzip-compressed body, built once per document version"""
+        if self._gzip_body is None:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+            self._gzip_body = compressor.compress(self.body) + compressor.flush()
+        return self._gzip_body
+
+    @property
+    def data(self):
+        """Parsed tree, shared between readers and never mutated in place"""
+        if self._data is None:
+            self._data = json.loads(self.body)
+        return self._data
+
+class DocumentCache:
+    """Process-wide cache of parsed JSON documents validated against file mtime/size/inode"""
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _stat_key(filepath):
+        # A sharded document's manifest is rewritten on every save
+        shards = sharded_document(filepath)
+        st = os.stat(shards.manifest_file if shards is not None else filepath)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get_entry(self, filepath):
+        """Return the cached entry for filepath, reloading it if the file changed on disk"""
+        key = os.path.abspath(filepath)
+        stat_key = self._stat_key(filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stat_key == stat_key:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        
+        data = load_json_file(filepath)
+        entry = CachedDocument(json.dumps(data).encode('utf-8'), stat_key, data)
+        with self._lock:
+            self._entries[key] = entry
+        json_logger.debug("Cached %s (%d bytes)", filepath, len(entry.body))
+        return entry
+
+    def get_body(self, filepath):
+        """Return the pre-serialized JSON body for filepath"""
+        return self.get_entry(filepath).body
+
+    def load(self, filepath):
+        """Return a private, mutable copy of the document at filepath"""
+        # Parsing the cached body is cheaper than copy.deepcopy of the tree
+        return json.loads(self.get_entry(filepath).body)
+
+    def peek(self, filepath):
+        """Return the cached entry for filepath without checking the file, or None"""
+        with self._lock:
+            return self._entries.get(os.path.abspath(filepath))
+
+    def update(self, filepath, data):
+        """Refresh a tracked entry after the server has written filepath; returns the new entry"""
+        key = os.path.abspath(filepath)
+        with self._lock:
+            if key not in self._entries:
+                return None
+        try:
+            entry = CachedDocument(json.dumps(data).encode('utf-8'), self._stat_key(filepath))
+        except OSError:
+            self.invalidate(filepath)
+            return None
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, filepath=None):
+        """Drop one cached entry, or all of them when no path is given"""
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(filepath), None)
+
+document_cache = DocumentCache()
+
+REGISTRY.gauge('renovation_document_cache_hits', 'Document cache lookups served from memory',
+               lambda: document_cache.hits)
+REGISTRY.gauge('renovation_document_cache_misses', 'Document cache lookups that parsed the file',
+               lambda: document_cache.misses)
+REGISTRY.gauge('renovation_document_cache_hit_ratio', 'Share of document cache lookups served from memory',
+               lambda: document_cache.hits / max(1, document_cache.hits + document_cache.misses))
+
+# Change notifications for /events subscribers
+change_feed = ChangeFeed()
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match or If-Match header value against a strong ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+def accepts_gzip(accept_encoding):
+    """Return True when an Accept-Encoding header allows a gzip response"""
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding.strip().lower() not in ('gzip', 'x-gzip', '*'):
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+# Single-writer lock: every load-modify-save of converted_source.json runs under it
+# so concurrent /save_rooms and /add_project requests cannot drop each other's updates
+document_write_lock = threading.RLock()
+
 def ensure_directory(directory):
     """Ensure a directory exists, create if it doesn't"""
     if not os.path.exists(directory):
@@ -106,10 +383,101 @@ def get_file_type(filename):
             return 'document'
     return 'other'
 
-def save_uploaded_file(file_data, room_name):
-    """Save an uploaded file and return its metadata"""
+def resolve_upload_path(url_path):
+    """Map a /uploads/... URL onto a file inside the uploads directory, or None if it escapes it"""
+    relative = urllib.parse.unquote(urllib.parse.urlsplit(url_path).path)[len('/uploads/'):]
+    if any(part.startswith('.') for part in relative.split('/')):
+        return None
+    root = os.path.realpath('uploads')
+    full_path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, full_path]) != root:
+        return None
+    return full_path
+
+def parse_byte_range(range_header, size):
+    """Parse a single 'bytes=' Range header into an inclusive (start, end) pair.
+    
+    Returns None when the header should be ignored (bad syntax, other units or
+    multiple ranges) and raises ValueError when the range cannot be satisfied.
+    """
+    units, _, spec = range_header.partition('=')
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(f"Range start {start} beyond end of {size}-byte file")
+    end = int(last) if last else size - 1
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+def not_modified_since(request_headers, mtime):
+    """Check If-Modified-Since against a file modification time"""
+    header = request_headers.get('If-Modified-Since')
+    if not header or request_headers.get('If-None-Match'):
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    return int(mtime) <= since.timestamp()
+
+def plan_file_response(request_headers, st, file_path):
+    """Work out the status, headers and byte span for sending a regular file.
+    
+    Honours If-Modified-Since, Range and If-Range. Returns (status, headers, start,
+    length) where length is the number of body bytes to send.
+    """
+    size = st.st_size
+    last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+    if not_modified_since(request_headers, st.st_mtime):
+        return 304, {'Last-Modified': last_modified}, 0, 0
+    
+    start, end, status = 0, size - 1, 200
+    range_header = request_headers.get('Range')
+    if_range = request_headers.get('If-Range')
+    if range_header and (not if_range or if_range == last_modified):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return 416, {'Content-Range': f"bytes */{size}", 'Content-Length': '0'}, 0, 0
+        if byte_range:
+            start, end = byte_range
+            status = 206
+    length = max(0, end - start + 1)
+    
+    headers = {
+        'Content-type': mimetypes.guess_type(file_path)[0] or 'application/octet-stream',
+        'Content-Length': str(length),
+        'Last-Modified': last_modified,
+        'Accept-Ranges': 'bytes',
+        'Access-Control-Allow-Origin': '*',
+    }
+    if status == 206:
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return status, headers, start, length
+
+def is_safe_room_name(room_name):
+    """Reject room names that would escape the uploads directory"""
+    return bool(room_name) and not room_name.startswith('.') and '/' not in room_name and '\\' not in room_name
+
+def save_uploaded_file(upload, room_name):
+    """Move a streamed upload into the room's uploads directory and return its metadata"""
     # Generate unique filename
-    original_filename = file_data['filename']
+    original_filename = upload.filename
     ext = os.path.splitext(original_filename)[1]
     unique_filename = f"{uuid.uuid4()}{ext}"
     
@@ -118,34 +486,53 @@ def save_uploaded_file(file_data, room_name):
     uploads_dir = os.path.join('uploads', room_name)
     ensure_directory(uploads_dir)
     
-    # Save file
+    # The data is already on disk in the same filesystem, so this is a rename, not a copy
     filepath = os.path.join(uploads_dir, unique_filename)
-    with open(filepath, 'wb') as f:
-        f.write(file_data['file'])
+    os.replace(upload.temp_path, filepath)
     
     # Create metadata
     metadata = {
         "filename": unique_filename,
         "original_filename": original_filename,
         "type": file_type,
+        "size": upload.size,
+        "sha256": upload.sha256,
         "uploaded_at": datetime.now().isoformat(),
         "description": ""
     }
     
     return metadata
 
-def create_backup(filename):
-    """Create a timestamped backup of the file"""
+@stage_seconds.time(stage='create_backup')
+@tracer.traced()
+def create_backup(filename, data=None):
+    """Create a timestamped backup of the file; data, if given, is its current parsed content"""
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     backup_name = f"{filename}.{timestamp}.bak"
     try:
-        shutil.copy2(filename, backup_name)
+        shards = sharded_document(filename)
+        if data is None and shards is not None:
+            data = shards.load()
+        elif data is None:
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                # Not valid JSON, so it cannot go into the version store; keep a plain copy
+                shutil.copy2(filename, backup_name)
+                logger.info(f"Created backup: {backup_name}")
+                return True
+        
+        # Backups share unchanged subtrees with saved versions, so this usually only adds an index line
+        version_store.commit(data, name=os.path.basename(backup_name), kind=BACKUP_KIND, timestamp=timestamp)
         logger.info(f"Created backup: {backup_name}")
         return True
     except Exception as e:
         logger.error(f"Failed to create backup: {str(e)}")
         return False
 
+@stage_seconds.time(stage='validate')
+@tracer.traced()
 def validate_save_data(data, path):
     """Validate the data being saved"""
     json_logger.info(f"Validating data for path: {path}")
@@ -175,22 +562,71 @@ def validate_save_data(data, path):
         return False, str(e)
 
 class BuildingManagementHandler(SimpleHTTPRequestHandler):
-    def send_json_response(self, data, status=200):
-        """Helper method to send JSON responses"""
+    # Drop clients that stall mid-request instead of tying up a worker forever
+    timeout = 60
+
+    def parse_request(self):
+        # Timing starts once a request line has arrived, not while a kept-alive connection idles
+        self._started = time.perf_counter()
+        self._status = None
+        self._bytes_out = 0
+        if not super().parse_request():
+            return False
+        self._route = route_label(self.command, self.path)
+        return True
+
+    def handle_one_request(self):
+        self._route = None
+        with tracer.request('request') as trace:
+            super().handle_one_request()
+            if trace is not None and self._route is not None:
+                trace.name = f"{self.command} {self._route}"
+                trace.args.update(path=self.path, status=self._status or 0)
+        if self._route is not None:
+            try:
+                bytes_in = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                bytes_in = 0
+            observe_request(self._route, self.command, self._status or 0, time.perf_counter() - self._started,
+                            bytes_in, self._bytes_out)
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        # HEAD, 204 and 304 responses announce a length but send no body
+        if (keyword.lower() == 'content-length' and self.command != 'HEAD'
+                and self._status not in (204, 304)):
+            self._bytes_out = int(value)
+        super().send_header(keyword, value)
+
+    def log_message(self, format, *args):
+        # Access lines go through the logging queue rather than straight to stderr
+        if access_logger.isEnabledFor(logging.INFO):
+            access_logger.info("%s - %s", self.address_string(), format % args)
+
+    def send_json_response(self, data, status=200, body=None, headers=None):
+        """Helper method to send JSON responses; body may be passed pre-serialized"""
         try:
+            if body is None:
+                body = json.dumps(data).encode('utf-8')
+            
             self.send_response(status)
             self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
             self.send_header('Access-Control-Allow-Origin', '*')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
             self.end_headers()
             
-            # Convert data to JSON and send in chunks
-            json_data = json.dumps(data)
+            # Send in chunks
             chunk_size = 8192  # 8KB chunks
+            view = memoryview(body)
             
-            for i in range(0, len(json_data), chunk_size):
-                chunk = json_data[i:i + chunk_size]
+            for i in range(0, len(body), chunk_size):
                 try:
-                    self.wfile.write(chunk.encode())
+                    self.wfile.write(view[i:i + chunk_size])
                 except (ConnectionAbortedError, BrokenPipeError) as e:
                     logger.error(f"Connection error while sending response: {str(e)}")
                     break
@@ -199,91 +635,195 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
             logger.error(f"Error sending JSON response: {str(e)}\n{traceback.format_exc()}")
             raise
 
-    def parse_multipart(self):
-        """Parse multipart form data"""
-        content_type = self.headers.get('Content-Type')
-        if not content_type:
-            return None
+    def send_cached_document(self, entry):
+        """Send a cached document honouring If-None-Match and Accept-Encoding"""
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': 'no-cache',
+            'Vary': 'Accept-Encoding',
+            'Access-Control-Expose-Headers': 'ETag',
+        }
+        if etag_matches(self.headers.get('If-None-Match'), entry.etag):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            return
         
+        body = entry.body
+        if accepts_gzip(self.headers.get('Accept-Encoding')):
+            body = entry.gzip_body
+            headers['Content-Encoding'] = 'gzip'
+        self.send_json_response(None, body=body, headers=headers)
+
+    def send_file(self, file_path, head_only=False):
+        """Send a file with Range, HEAD and If-Modified-Since support, using sendfile for the body"""
         try:
-            boundary = content_type.split('=')[1].encode()
-            remainbytes = int(self.headers['Content-Length'])
-            line = self.rfile.readline()
-            remainbytes -= len(line)
-            
-            if not boundary in line:
-                return None
+            f = open(file_path, 'rb')
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        
+        with f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode):
+                self.send_error(404, "File not found")
+                return
+            status, headers, start, length = plan_file_response(self.headers, st, file_path)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
             
-            form = {}
-            while remainbytes > 0:
-                line = self.rfile.readline()
-                remainbytes -= len(line)
-                
-                if boundary in line:
+            if head_only or not length:
+                return
+            try:
+                self.send_file_body(f, start, length)
+            except (ConnectionAbortedError, ConnectionResetError, BrokenPipeError) as e:
+                logger.error(f"Connection error while sending {file_path}: {str(e)}")
+
+    def send_file_body(self, f, offset, count):
+        """Copy count bytes of f starting at offset to the client without going through the Python heap"""
+        self.wfile.flush()
+        if isinstance(self.connection, socket.socket):
+            # socket.sendfile uses os.sendfile where the platform has it and falls back to send()
+            self.connection.sendfile(f, offset, count)
+            return
+        f.seek(offset)
+        while count > 0:
+            chunk = f.read(min(64 * 1024, count))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            count -= len(chunk)
+
+    def serve_upload(self, head_only=False):
+        """Serve a file from the uploads directory"""
+        file_path = resolve_upload_path(self.path)
+        if not file_path or not os.path.isfile(file_path):
+            self.send_error(404, "File not found")
+            return
+        self.send_file(file_path, head_only)
+
+    def serve_static(self, head_only=False):
+        """Serve a static file from the working directory, leaving directories to SimpleHTTPRequestHandler"""
+        file_path = self.translate_path(self.path)
+        if os.path.isfile(file_path):
+            self.send_file(file_path, head_only)
+        elif head_only:
+            super().do_HEAD()
+        else:
+            super().do_GET()
+
+    def serve_events(self):
+        """Stream document changes to the client as Server-Sent Events"""
+        if not isinstance(self.server, ThreadPoolHTTPServer):
+            # A stream would hold the only thread of a single-threaded server
+            self.send_error(503, "Event stream requires the threaded server")
+            return
+        
+        # Each stream parks a pool worker, so leave enough workers free for ordinary requests
+        if not self.server.stream_slots.acquire(blocking=False):
+            self.send_json_response({
+                "status": "error",
+                "message": "Too many open event streams"
+            }, status=503, headers={'Retry-After': str(EVENT_RETRY_AFTER_SECONDS)})
+            return
+        
+        subscription = change_feed.subscribe()
+        self.close_connection = True
+        try:
+            entry = document_cache.get_entry('converted_source.json')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            # Tell the client which version is current so it can tell whether its copy is stale
+            self.wfile.write(format_event({'event': 'version', 'data': {'version': entry.version}}))
+            while True:
+                events = subscription.wait(EVENT_HEARTBEAT_SECONDS)
+                if events is None:
                     break
-                
-                # Parse headers
-                line = line.decode()
-                if 'Content-Disposition' in line:
-                    # Get field name and filename if present
-                    key = line.split('name="')[1].split('"')[0]
-                    if 'filename="' in line:
-                        # File upload
-                        filename = line.split('filename="')[1].split('"')[0]
-                        # Skip content type line
-                        line = self.rfile.readline()
-                        remainbytes -= len(line)
-                        # Skip blank line
-                        line = self.rfile.readline()
-                        remainbytes -= len(line)
-                        # Read file content
-                        form[key] = {
-                            'filename': filename,
-                            'file': self.rfile.read(remainbytes)
-                        }
-                        break
-                    else:
-                        # Regular form field
-                        # Skip blank line
-                        line = self.rfile.readline()
-                        remainbytes -= len(line)
-                        # Read value
-                        line = self.rfile.readline()
-                        remainbytes -= len(line)
-                        form[key] = line.decode().strip()
-            
-            return form
-        except Exception as e:
-            logger.error(f"Error parsing multipart data: {str(e)}\n{traceback.format_exc()}")
-            return None
+                self.wfile.write(b''.join(format_event(event) for event in events) if events else HEARTBEAT)
+        except OSError as e:
+            logger.info(f"Event stream closed: {str(e)}")
+        finally:
+            change_feed.unsubscribe(subscription)
+            self.server.stream_slots.release()
+
+    def serve_metrics(self):
+        """Metrics in Prometheus text format, or as JSON with ?format=json or Accept: application/json"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        if query.get('format', [''])[0] == 'json' or 'application/json' in self.headers.get('Accept', ''):
+            self.send_json_response(REGISTRY.as_dict())
+            return
+        body = REGISTRY.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def parse_multipart(self):
+        """Parse multipart form data, streaming file parts to temporary files"""
+        content_length = self.headers.get('Content-Length')
+        try:
+            content_length = int(content_length) if content_length is not None else None
+        except ValueError:
+            raise MultipartError("Invalid Content-Length")
+        return parse_multipart_stream(
+            self.rfile,
+            self.headers.get('Content-Type'),
+            content_length,
+            UPLOAD_TEMP_DIR,
+            max_total_size=MAX_UPLOAD_BYTES,
+            max_file_size=MAX_UPLOAD_FILE_BYTES,
+        )
 
     def do_POST(self):
         logger.info(f"Received POST request to {self.path}")
         
         try:
             if self.path == '/upload':
-                form = self.parse_multipart()
-                if not form:
-                    self.send_error(400, "Invalid form data")
-                    return
-                
-                room_name = form.get('room_name')
-                if not room_name:
-                    self.send_error(400, "Room name is required")
-                    return
-                
-                file_data = form.get('file')
-                if not file_data:
-                    self.send_error(400, "No file uploaded")
+                try:
+                    form, files = self.parse_multipart()
+                except MultipartError as e:
+                    logger.error(f"Error parsing multipart data: {str(e)}")
+                    self.send_error(e.status, str(e))
                     return
                 
-                # Save file and get metadata
-                metadata = save_uploaded_file(file_data, room_name)
+                try:
+                    # Browsers send an empty, unnamed part for an untouched file input
+                    for upload in [f for f in files if not f.filename]:
+                        upload.discard()
+                    files = [f for f in files if f.filename]
+                    
+                    room_name = form.get('room_name')
+                    if not room_name:
+                        self.send_error(400, "Room name is required")
+                        return
+                    if not is_safe_room_name(room_name):
+                        self.send_error(400, "Invalid room name")
+                        return
+                    
+                    if not files:
+                        self.send_error(400, "No file uploaded")
+                        return
+                    
+                    # Save files and get metadata
+                    uploaded = [save_uploaded_file(upload, room_name) for upload in files]
+                finally:
+                    for upload in files:
+                        upload.discard()
                 
                 self.send_json_response({
                     "status": "success",
-                    "message": "File uploaded successfully",
-                    "metadata": metadata
+                    "message": "File uploaded successfully" if len(uploaded) == 1 else f"{len(uploaded)} files uploaded successfully",
+                    "metadata": uploaded[0],
+                    "files": uploaded
                 })
                 
             elif self.path == '/add_project':
@@ -297,39 +837,40 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                     self.send_error(400, error_msg)
                     return
                 
-                # Read current data with robust error handling
-                try:
-                    full_data = load_json_file('converted_source.json')
-                except Exception as e:
-                    self.send_error(500, f"Error loading data: {str(e)}")
-                    return
-                
-                room_name = data['room_name']
-                if room_name not in full_data['rooms']:
-                    self.send_error(400, f"Room {room_name} not found")
-                    return
-                
-                # Initialize projects array if it doesn't exist
-                if 'projects' not in full_data['rooms'][room_name]:
-                    full_data['rooms'][room_name]['projects'] = []
-                
-                # Add new project
-                project = {
-                    "title": data['title'],
-                    "description": data['description'],
-                    "budget": float(data['budget']),
-                    "priority": data['priority'],
-                    "created_at": datetime.now().isoformat(),
-                    "status": "planned",
-                    "attachments": []
-                }
-                
-                full_data['rooms'][room_name]['projects'].append(project)
-                
-                # Save updated data with error handling
-                if not save_json_file('converted_source.json', full_data):
-                    self.send_error(500, "Failed to save updated data")
-                    return
+                with document_write_lock:
+                    # Read current data with robust error handling
+                    try:
+                        full_data = document_cache.load('converted_source.json')
+                    except Exception as e:
+                        self.send_error(500, f"Error loading data: {str(e)}")
+                        return
+                    
+                    room_name = data['room_name']
+                    if room_name not in full_data['rooms']:
+                        self.send_error(400, f"Room {room_name} not found")
+                        return
+                    
+                    # Initialize projects array if it doesn't exist
+                    if 'projects' not in full_data['rooms'][room_name]:
+                        full_data['rooms'][room_name]['projects'] = []
+                    
+                    # Add new project
+                    project = {
+                        "title": data['title'],
+                        "description": data['description'],
+                        "budget": float(data['budget']),
+                        "priority": data['priority'],
+                        "created_at": datetime.now().isoformat(),
+                        "status": "planned",
+                        "attachments": []
+                    }
+                    
+                    full_data['rooms'][room_name]['projects'].append(project)
+                    
+                    # Save updated data with error handling
+                    if not save_json_file('converted_source.json', full_data, touched=[['rooms', room_name]]):
+                        self.send_error(500, "Failed to save updated data")
+                        return
                 
                 self.send_json_response({
                     "status": "success",
@@ -339,86 +880,96 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
             else:
                 # Handle existing POST endpoints
                 content_length = int(self.headers['Content-Length'])
-                post_data = self.rfile.read(content_length)
                 try:
-                    data = json.loads(post_data.decode('utf-8'))
+                    with tracer.span('parse_json', bytes=content_length):
+                        post_data = self.rfile.read(content_length)
+                        data = json.loads(post_data.decode('utf-8'))
                     json_logger.info("Successfully parsed JSON data")
                 except json.JSONDecodeError as e:
                     json_logger.error(f"Failed to parse JSON: {e}")
                     self.send_error(400, "Invalid JSON data")
                     return
                 
-                # Read the existing file with robust error handling
-                try:
-                    full_data = load_json_file('converted_source.json')
-                except Exception as e:
-                    self.send_error(500, f"Error loading data: {str(e)}")
-                    return
+                with document_write_lock:
+                    # Read the existing file with robust error handling
+                    try:
+                        with tracer.span('load_document'):
+                            full_data = document_cache.load('converted_source.json')
+                    except Exception as e:
+                        self.send_error(500, f"Error loading data: {str(e)}")
+                        return
+                        
+                    if self.path == '/save':
+                        # Update building management section
+                        full_data['general_considerations']['building_management'] = data
                     
-                if self.path == '/save':
-                    # Update building management section
-                    full_data['general_considerations']['building_management'] = data
-                
-                elif self.path == '/save_rooms':
-                    # Update rooms section
-                    json_logger.debug(f"Received room data: {json.dumps(data, indent=2)}")
-                    for room_name, room_data in data.items():
-                        if room_name in full_data['rooms']:
-                            json_logger.debug(f"Updating {room_name}")
-                            current_room = full_data['rooms'][room_name]
-                            
-                            # Update priority
-                            current_room['priority'] = room_data['priority']
-                            json_logger.debug(f"Updated priority to {room_data['priority']}")
-                            
-                            # Update budget
-                            if 'budget' in room_data:
-                                current_room['budget']['amount'] = float(room_data['budget']['amount'])
-                                current_room['budget']['notes'] = room_data['budget']['notes']
-                                json_logger.debug(f"Updated budget to {room_data['budget']['amount']}")
-                            
-                            # Update square footage
-                            if 'square_footage' in room_data:
-                                current_room['square_footage']['value'] = int(room_data['square_footage']['value'])
-                                json_logger.debug(f"Updated square footage to {room_data['square_footage']['value']}")
-                            
-                            # Update painting
-                            if 'painting' in room_data and 'walls' in room_data['painting']:
-                                if 'painting' not in current_room:
-                                    current_room['painting'] = {}
-                                if 'walls' not in current_room['painting']:
-                                    current_room['painting']['walls'] = {}
-                                current_room['painting']['walls'].update(room_data['painting']['walls'])
-                                json_logger.debug(f"Updated painting data")
-                
-                # Validate the data before saving
-                is_valid, error_msg = validate_save_data(data, self.path)
-                if not is_valid:
-                    json_logger.error(f"Validation failed: {error_msg}")
-                    self.send_error(400, error_msg)
-                    return
+                    elif self.path == '/save_rooms':
+                        # Update rooms section
+                        # Only serialize the payload when someone will read it
+                        if json_logger.isEnabledFor(logging.DEBUG):
+                            json_logger.debug("Received room data: %s", json.dumps(data, indent=2))
+                        with tracer.span('merge_rooms', rooms=len(data)):
+                            for room_name, room_data in data.items():
+                                if room_name in full_data['rooms']:
+                                    json_logger.debug("Updating %s", room_name)
+                                    current_room = full_data['rooms'][room_name]
+                                
+                                    # Update priority
+                                    current_room['priority'] = room_data['priority']
+                                    json_logger.debug("Updated priority to %s", room_data['priority'])
+                                
+                                    # Update budget
+                                    if 'budget' in room_data:
+                                        current_room['budget']['amount'] = float(room_data['budget']['amount'])
+                                        current_room['budget']['notes'] = room_data['budget']['notes']
+                                        json_logger.debug("Updated budget to %s", room_data['budget']['amount'])
+                                
+                                    # Update square footage
+                                    if 'square_footage' in room_data:
+                                        current_room['square_footage']['value'] = int(room_data['square_footage']['value'])
+                                        json_logger.debug("Updated square footage to %s", room_data['square_footage']['value'])
+                                
+                                    # Update painting
+                                    if 'painting' in room_data and 'walls' in room_data['painting']:
+                                        if 'painting' not in current_room:
+                                            current_room['painting'] = {}
+                                        if 'walls' not in current_room['painting']:
+                                            current_room['painting']['walls'] = {}
+                                        current_room['painting']['walls'].update(room_data['painting']['walls'])
+                                        json_logger.debug("Updated painting data")
+                    
+                    # Validate the data before saving
+                    is_valid, error_msg = validate_save_data(data, self.path)
+                    if not is_valid:
+                        json_logger.error(f"Validation failed: {error_msg}")
+                        self.send_error(400, error_msg)
+                        return
 
-                # Save the updated data with robust error handling
-                timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
-                json_logger.info(f"Saving changes at {timestamp}")
-                
-                # Add timestamp to the data
-                full_data['last_updated'] = timestamp
-                full_data['last_modified_by'] = 'user'  # Could be expanded to track specific users
-                
-                # Save to timestamped file in versions directory
-                versions_dir = 'versions'
-                ensure_directory(versions_dir)
-                new_filename = os.path.join(versions_dir, f'renovation_data_{timestamp}.json')
-                
-                if not save_json_file(new_filename, full_data):
-                    self.send_error(500, "Failed to save version file")
-                    return
-                
-                # Update the current version
-                if not save_json_file('converted_source.json', full_data):
-                    self.send_error(500, "Failed to update current version")
-                    return
+                    # Save the updated data with robust error handling
+                    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+                    json_logger.info(f"Saving changes at {timestamp}")
+                    
+                    # Add timestamp to the data
+                    full_data['last_updated'] = timestamp
+                    full_data['last_modified_by'] = 'user'  # Could be expanded to track specific users
+                    
+                    # Record the new version in the version store
+                    try:
+                        commit_version(full_data, timestamp)
+                    except Exception as e:
+                        json_logger.error(f"Error storing version {timestamp}: {str(e)}", exc_info=True)
+                        self.send_error(500, "Failed to save version file")
+                        return
+                    
+                    # Update the current version
+                    if self.path == '/save':
+                        touched = [['general_considerations', 'building_management']]
+                    else:
+                        touched = [['rooms', room_name] for room_name in data if room_name in full_data['rooms']]
+                    touched += [['last_updated'], ['last_modified_by']]
+                    if not save_json_file('converted_source.json', full_data, touched=touched):
+                        self.send_error(500, "Failed to update current version")
+                        return
                 
                 self.send_json_response({
                     "status": "success",
@@ -436,36 +987,37 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                 self.path = '/building_management.html'
             elif self.path.startswith('/uploads/'):
                 try:
-                    # Serve files from uploads directory
-                    file_path = self.path[1:]  # Remove leading slash
-                    if os.path.exists(file_path):
-                        with open(file_path, 'rb') as f:
-                            content = f.read()
-                        self.send_response(200)
-                        content_type, _ = mimetypes.guess_type(file_path)
-                        if content_type:
-                            self.send_header('Content-type', content_type)
-                        self.end_headers()
-                        self.wfile.write(content)
-                        return
-                    else:
-                        self.send_error(404, "File not found")
-                        return
+                    self.serve_upload()
+                    return
                 except Exception as e:
                     logger.error(f"Error serving file: {str(e)}\n{traceback.format_exc()}")
                     self.send_error(500, f"Error serving file: {str(e)}")
                     return
-            elif self.path == '/list_json_files':
+            elif urllib.parse.urlsplit(self.path).path == '/list_json_files':
                 try:
-                    # List files from versions directory
-                    versions_dir = 'versions'
-                    ensure_directory(versions_dir)
-                    
-                    json_files = []
-                    if os.path.exists(versions_dir):
-                        json_files = [f for f in os.listdir(versions_dir) if f.endswith('.json')]
+                    query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                    if not query:
+                        # Plain list of version names, as older clients expect
+                        self.send_json_response(version_store.list_versions())
+                        return
                     
-                    self.send_json_response(json_files)
+                    # Paginated listing with manifest metadata, newest first unless order=asc
+                    try:
+                        offset = int(query.get('offset', ['0'])[0])
+                        limit = min(MAX_PAGE_SIZE, int(query.get('limit', ['50'])[0]))
+                    except ValueError:
+                        self.send_error(400, "offset and limit must be integers")
+                        return
+                    kind = query.get('kind', ['version'])[0]
+                    total, entries = version_store.page(
+                        None if kind == 'all' else kind, offset, limit,
+                        newest_first=query.get('order', ['desc'])[0] != 'asc')
+                    self.send_json_response({
+                        "total": total,
+                        "offset": offset,
+                        "limit": limit,
+                        "versions": [manifest_record(entry) for entry in entries]
+                    })
                     return
                 except Exception as e:
                     logger.error(f"Error listing JSON files: {str(e)}\n{traceback.format_exc()}")
@@ -478,14 +1030,13 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                         self.send_error(400, "Invalid file type")
                         return
                     
-                    filepath = os.path.join('versions', filename)
-                    if not os.path.exists(filepath):
+                    if version_store.get_entry(filename) is None:
                         self.send_error(404, "File not found")
                         return
                     
                     # Load and validate JSON with robust error handling
                     try:
-                        data = load_json_file(filepath)
+                        data = version_store.load(filename)
                     except Exception as e:
                         self.send_error(500, f"Error loading JSON: {str(e)}")
                         return
@@ -496,10 +1047,11 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                         self.send_error(400, error_msg)
                         return
                     
-                    # If valid, update current version
-                    if not save_json_file('converted_source.json', data):
-                        self.send_error(500, "Failed to update current version")
-                        return
+                    with document_write_lock:
+                        # If valid, update current version
+                        if not save_json_file('converted_source.json', data):
+                            self.send_error(500, "Failed to update current version")
+                            return
                     
                     self.send_json_response({
                         "status": "success",
@@ -510,29 +1062,165 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                     logger.error(f"Error loading JSON file: {str(e)}\n{traceback.format_exc()}")
                     self.send_error(500, f"Error loading JSON file: {str(e)}")
                     return
+            elif self.path == '/totals':
+                try:
+                    entry = document_cache.get_entry('converted_source.json')
+                    self.send_json_response(entry.totals, headers={'ETag': entry.etag})
+                    return
+                except Exception as e:
+                    logger.error(f"Error computing totals: {str(e)}\n{traceback.format_exc()}")
+                    self.send_error(500, f"Error computing totals: {str(e)}")
+                    return
+            elif self.path == '/events':
+                self.serve_events()
+                return
+            elif urllib.parse.urlsplit(self.path).path == '/metrics':
+                self.serve_metrics()
+                return
+            elif urllib.parse.urlsplit(self.path).path == '/diff':
+                try:
+                    # Compare two stored versions, or 'current' for the working document
+                    query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                    names = [query.get(param, [''])[0] for param in ('from', 'to')]
+                    if not all(names):
+                        self.send_error(400, "from and to are required")
+                        return
+                    nodes = []
+                    for name in names:
+                        if name == 'current':
+                            nodes.append(document_cache.get_entry('converted_source.json').data)
+                            continue
+                        entry = version_store.get_entry(name)
+                        if entry is None:
+                            self.send_error(404, f"Version not found: {name}")
+                            return
+                        nodes.append(Ref(entry['root']))
+                    self.send_json_response(TreeDiffer(version_store).diff(*nodes).as_dict())
+                    return
+                except Exception as e:
+                    logger.error(f"Error computing diff: {str(e)}\n{traceback.format_exc()}")
+                    self.send_error(500, f"Error computing diff: {str(e)}")
+                    return
             elif self.path == '/converted_source.json':
                 try:
-                    data = load_json_file('converted_source.json')
-                    self.send_json_response(data)
+                    entry = document_cache.get_entry('converted_source.json')
+                    self.send_cached_document(entry)
                     return
                 except Exception as e:
                     logger.error(f"Error serving JSON file: {str(e)}\n{traceback.format_exc()}")
                     self.send_error(500, f"Error serving JSON file: {str(e)}")
                     return
                     
-            return super().do_GET()
+            return self.serve_static()
             
         except Exception as e:
             logger.error(f"Error processing GET request: {str(e)}\n{traceback.format_exc()}")
             self.send_error(500, f"Internal server error: {str(e)}")
 
+    def do_PATCH(self):
+        """Apply an RFC 6902 JSON Patch to the current document"""
+        logger.info(f"Received PATCH request to {self.path}")
+        
+        try:
+            if self.path != '/converted_source.json':
+                self.send_error(404, "Not found")
+                return
+            
+            content_length = int(self.headers.get('Content-Length') or 0)
+            try:
+                ops = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.send_error(400, "Invalid JSON data")
+                return
+            
+            with document_write_lock:
+                entry = document_cache.get_entry('converted_source.json')
+                
+                # Optimistic concurrency: the client names the version its patch was made against
+                if_match = self.headers.get('If-Match')
+                if if_match and not etag_matches(if_match, entry.etag):
+                    self.send_json_response({
+                        "status": "error",
+                        "message": "Document has changed",
+                        "version": entry.version
+                    }, status=412, headers={'ETag': entry.etag})
+                    return
+                
+                try:
+                    full_data = apply_patch(json.loads(entry.body), ops)
+                except PatchTestFailed as e:
+                    self.send_error(409, str(e))
+                    return
+                except PatchError as e:
+                    self.send_error(400, str(e))
+                    return
+                
+                # A patch that changes nothing (or only tests) is not a new version
+                if full_data == entry.data:
+                    self.send_json_response({
+                        "status": "success",
+                        "version": entry.version,
+                        "message": "No changes"
+                    }, headers={'ETag': entry.etag, 'Access-Control-Expose-Headers': 'ETag'})
+                    return
+                
+                is_valid, error_msg = self.validate_json_structure(full_data)
+                if not is_valid:
+                    self.send_error(400, error_msg)
+                    return
+                
+                timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+                full_data['last_updated'] = timestamp
+                full_data['last_modified_by'] = 'user'
+                
+                try:
+                    commit_version(full_data, timestamp)
+                except Exception as e:
+                    json_logger.error(f"Error storing version {timestamp}: {str(e)}", exc_info=True)
+                    self.send_error(500, "Failed to save version file")
+                    return
+                
+                touched = changed_paths(ops) + [('last_updated',), ('last_modified_by',)]
+                if not save_json_file('converted_source.json', full_data, touched=touched):
+                    self.send_error(500, "Failed to update current version")
+                    return
+                entry = document_cache.get_entry('converted_source.json')
+            
+            json_logger.info(f"Applied {len(ops)} patch operations")
+            self.send_json_response({
+                "status": "success",
+                "timestamp": timestamp,
+                "version": entry.version,
+                "message": "Changes saved successfully"
+            }, headers={'ETag': entry.etag, 'Access-Control-Expose-Headers': 'ETag'})
+            
+        except Exception as e:
+            logger.error(f"Error processing PATCH request: {str(e)}\n{traceback.format_exc()}")
+            self.send_error(500, f"Internal server error: {str(e)}")
+
+    def do_HEAD(self):
+        try:
+            if self.path == '/' or self.path == '':
+                self.path = '/building_management.html'
+            if self.path.startswith('/uploads/'):
+                self.serve_upload(head_only=True)
+            else:
+                self.serve_static(head_only=True)
+        except Exception as e:
+            logger.error(f"Error processing HEAD request: {str(e)}\n{traceback.format_exc()}")
+            self.send_error(500, f"Internal server error: {str(e)}")
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, POST, PATCH, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-Match, If-None-Match, If-Modified-Since, Range')
+        self.send_header('Access-Control-Expose-Headers', 'ETag, Content-Range, Accept-Ranges')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+    @stage_seconds.time(stage='validate')
+    @tracer.traced()
     def validate_json_structure(self, data):
         """Validate the JSON data structure with detailed logging"""
         json_logger.info("Starting JSON structure validation")
@@ -543,7 +1231,7 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
                 if field not in data:
                     json_logger.error(f"Validation failed: Missing required field '{field}'")
                     return False, f"Missing required field: {field}"
-                json_logger.debug(f"Found required field: {field}")
+                json_logger.debug("Found required field: %s", field)
             
             if not isinstance(data.get('rooms'), dict):
                 json_logger.error("Validation failed: 'rooms' is not a dictionary")
@@ -551,7 +1239,7 @@ class BuildingManagementHandler(SimpleHTTPRequestHandler):
             
             # Validate room structure
             for room_name, room_data in data.get('rooms', {}).items():
-                json_logger.debug(f"Validating room: {room_name}")
+                json_logger.debug("Validating room: %s", room_name)
                 if not isinstance(room_data, dict):
                     json_logger.error(f"Room '{room_name}' data is not a dictionary")
                     return False, f"Invalid room data for {room_name}"
@@ -575,7 +1263,7 @@ def initialize_json_file():
     latest_version = get_latest_version()
     if latest_version:
         try:
-            data = load_json_file(latest_version)
+            data = version_store.load(latest_version)
             if save_json_file('converted_source.json', data):
                 logger.info(f"Initialized from latest version: {latest_version}")
                 return
@@ -585,21 +1273,105 @@ def initialize_json_file():
     logger.warning("No valid version found in versions directory")
     logger.info("Please load a valid JSON file through the web interface")
 
-def run_server():
-    port = 8000
-    server_address = ('', port)
-    
-    # Initialize JSON file from latest version
-    initialize_json_file()
-    
+class ThreadPoolHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a bounded pool of worker threads"""
+    def __init__(self, server_address, handler_class, max_workers=None):
+        super().__init__(server_address, handler_class)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        # At most half the workers may hold /events streams
+        self.max_streams = self.max_workers // 2
+        self.stream_slots = threading.BoundedSemaphore(self.max_streams)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='http-worker')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # Release workers parked on /events streams before waiting for the pool
+        change_feed.close()
+        self.executor.shutdown(wait=True)
+
+def create_server(server_address, threads=None):
+    """Create the HTTP server; threads=0 keeps the original single-threaded server"""
+    if threads == 0:
+        return HTTPServer(server_address, BuildingManagementHandler)
+    return ThreadPoolHTTPServer(server_address, BuildingManagementHandler, max_workers=threads)
+
+def start_pruner(retention=DEFAULT_POLICY):
+    """Start the background pruner for the version store and legacy .bak backups"""
+    policy = RetentionPolicy.parse(retention)
+    if not policy.enabled:
+        logger.info("Retention pruning disabled")
+        return None
+    tasks = [
+        lambda: version_store.prune(policy),
+        lambda: prune_files('.', backup_pattern('converted_source.json.', '.bak'), policy),
+    ]
+    pruner = BackgroundPruner(tasks, interval=PRUNE_INTERVAL_SECONDS).start()
+    # Prune once at start-up as well as on the interval
+    pruner.request()
+    logger.info(f"Retention policy: {retention}")
+    return pruner
+
+def prepare_server(sharded=False):
+    """Set up directories and the current document before serving requests"""
     # Create required directories
     ensure_directory('uploads')
     ensure_directory('versions')
     
-    httpd = HTTPServer(server_address, BuildingManagementHandler)
+    # Bring full-copy version files from older releases into the version store
+    version_store.import_legacy_versions()
+    
+    # Split the current document into per-room shards the first time sharding is asked for
+    if sharded and sharded_document('converted_source.json') is None and os.path.exists('converted_source.json'):
+        data = load_json_file('converted_source.json')
+        ShardedDocument('converted_source.json').create(data)
+        document_cache.invalidate('converted_source.json')
+        logger.info("Converted converted_source.json to the sharded layout")
+    
+    # Initialize JSON file from latest version
+    initialize_json_file()
+
+def run_server(port=8000, threads=None, retention=DEFAULT_POLICY, sharded=False, log_profile=None,
+               trace=None, trace_sample=1.0):
+    if log_profile:
+        setup_logging(log_profile)
+    if trace:
+        tracer.configure(trace, trace_sample)
+    server_address = ('', port)
+    prepare_server(sharded)
+    start_pruner(retention)
+    
+    httpd = create_server(server_address, threads)
+    if isinstance(httpd, ThreadPoolHTTPServer):
+        logger.info(f"Serving with a pool of {httpd.max_workers} worker threads")
     print(f"Server running at http://localhost:{port}")
     print("Please load a JSON file through the web interface if no version was found")
     httpd.serve_forever()
 
 if __name__ == '__main__':
-    run_server()
+    parser = argparse.ArgumentParser(description='Building management server')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='Worker threads for concurrent requests (0 = single-threaded)')
+    parser.add_argument('--retention', default=DEFAULT_POLICY,
+                        help="Backup retention, e.g. 'last=20,hourly=24,daily=30,max_mb=512', or 'off'")
+    parser.add_argument('--sharded', action='store_true',
+                        help='Store the document as one file per room and section plus a manifest')
+    parser.add_argument('--log-profile', choices=sorted(PROFILES), default=default_profile(),
+                        help='Logging levels and rotation (default from RENOVATION_LOG_PROFILE)')
+    parser.add_argument('--trace', metavar='TRACE_JSON',
+                        help='Write per-request timing spans to a Chrome trace file (chrome://tracing or Perfetto)')
+    parser.add_argument('--trace-sample', type=float, default=1.0, help='Fraction of requests to trace')
+    args = parser.parse_args()
+    run_server(port=args.port, threads=args.threads, retention=args.retention, sharded=args.sharded,
+               log_profile=args.log_profile, trace=args.trace, trace_sample=args.trace_sample)
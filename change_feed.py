@@ -0,0 +1,124 @@
+"""Fan-out of document change events to Server-Sent Events subscribers.
+
+Each change event carries the previous and new document version ids and a JSON
+Patch between them. A client holding the previous version applies the patch;
+any other client refetches the document. Subscribers that fall too far behind
+are sent a reset event instead of an unbounded backlog.
+"""
+import json
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from json_patch import diff
+
+RESET_EVENT = {'event': 'reset'}
+# Comment line sent while idle so dead connections are noticed
+HEARTBEAT = b': keep-alive\n\n'
+
+
+class Subscription:
+    """Pending events for one connected client."""
+    def __init__(self, notify: Optional[Callable[[], None]] = None, max_pending: int = 256):
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._lost = False
+        self.closed = False
+        self._cond = threading.Condition()
+        # Called after every push, e.g. to wake an event loop from another thread
+        self._notify = notify
+
+    def push(self, event: Dict[str, Any]):
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self._pending.clear()
+                self._lost = True
+            else:
+                self._pending.append(event)
+            self._cond.notify()
+        if self._notify is not None:
+            self._notify()
+
+    def close(self):
+        """End the stream; wait() and drain() return None from now on."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+        if self._notify is not None:
+            self._notify()
+
+    def drain(self) -> Optional[List[Dict[str, Any]]]:
+        """Take all pending events without blocking."""
+        with self._cond:
+            return self._take()
+
+    def wait(self, timeout: float) -> Optional[List[Dict[str, Any]]]:
+        """Block until events arrive or timeout expires; an empty list means the wait timed out."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._lost or self.closed, timeout)
+            return self._take()
+
+    def _take(self) -> Optional[List[Dict[str, Any]]]:
+        if self.closed:
+            return None
+        if self._lost:
+            self._lost = False
+            self._pending.clear()
+            return [RESET_EVENT]
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+
+class ChangeFeed:
+    """Publishes document changes to every current subscription."""
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, notify: Optional[Callable[[], None]] = None) -> Subscription:
+        subscription = Subscription(notify)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def close(self):
+        """End every open stream, e.g. when the server shuts down."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.close()
+
+    def publish_change(self, previous_version: str, version: str, old: Any, new: Any):
+        """Diff two document versions and send the patch to all subscribers."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        if not subscriptions or previous_version == version:
+            return
+        event = {
+            'event': 'change',
+            'id': version,
+            'data': {'previous': previous_version, 'version': version, 'patch': diff(old, new)},
+        }
+        for subscription in subscriptions:
+            subscription.push(event)
+
+
+def format_event(event: Dict[str, Any]) -> bytes:
+    """Encode an event in the text/event-stream wire format."""
+    lines = []
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['event']}")
+    lines.append(f"data: {json.dumps(event.get('data', {}), separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
@@ -0,0 +1,381 @@
+"""Cost aggregation for renovation documents.
+
+aggregate_costs() walks the rooms and contractor groups once and returns a typed
+CostReport. Renderers for markdown, JSON and CSV sit on top of that result, so
+totalling and formatting are kept apart and a report can be cached and rendered
+in several formats without walking the document again.
+"""
+import csv
+import io
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class CostLine:
+    room: str
+    section: str
+    item: Optional[str]
+    cost: float
+    attachments: List[str] = field(default_factory=list)
+
+    @property
+    def item_type(self) -> str:
+        """Key used to group costs across rooms, e.g. 'countertops' or 'appliances_stove'."""
+        return self.section if self.item is None else f"{self.section}_{self.item}"
+
+
+@dataclass
+class RoomCosts:
+    name: str
+    lines: List[CostLine] = field(default_factory=list)
+    total: float = 0.0
+
+
+@dataclass
+class ContractorCost:
+    group: str
+    contractor_id: str
+    name: str
+    cost_type: str  # 'fixed' or 'hourly'
+    amount: float
+
+
+@dataclass
+class BudgetVariance:
+    room: str
+    allocated: float
+    spent: float
+
+    @property
+    def remaining(self) -> float:
+        return self.allocated - self.spent
+
+
+@dataclass
+class CostReport:
+    rooms: List[RoomCosts] = field(default_factory=list)
+    section_totals: Dict[str, float] = field(default_factory=dict)
+    item_type_totals: Dict[str, float] = field(default_factory=dict)
+    contractors: List[ContractorCost] = field(default_factory=list)
+    contractor_totals: Dict[str, float] = field(default_factory=dict)
+    budget_variance: List[BudgetVariance] = field(default_factory=list)
+
+    @property
+    def room_total(self) -> float:
+        return sum(room.total for room in self.rooms)
+
+    @property
+    def contractor_total(self) -> float:
+        return sum(self.contractor_totals.values())
+
+    @property
+    def project_total(self) -> float:
+        return self.room_total + self.contractor_total
+
+
+def title(name: str) -> str:
+    """Turn a snake_case key into a display title."""
+    return name.replace('_', ' ').title()
+
+
+def is_amount(value: Any) -> bool:
+    """True for numeric cost values (bools are not amounts)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def room_cost_lines(room_name: str, room_data: Dict[str, Any]) -> List[CostLine]:
+    """Cost lines for one room: section-level costs plus nested items with a positive cost.
+
+    Non-numeric costs are skipped here; RenovationManager.validate() reports them.
+    """
+    lines = []
+    for section_name, section_data in room_data.items():
+        if not isinstance(section_data, dict):
+            continue
+        if is_amount(section_data.get('cost')):
+            lines.append(CostLine(room_name, section_name, None, section_data['cost'],
+                                  list(section_data.get('attachments', []))))
+        for key, value in section_data.items():
+            if isinstance(value, dict) and is_amount(value.get('cost')) and value['cost'] > 0:
+                lines.append(CostLine(room_name, section_name, key, value['cost'],
+                                      list(value.get('attachments', []))))
+    return lines
+
+
+def contractor_group_costs(group_name: str, group_data: Dict[str, Any]) -> List[ContractorCost]:
+    """Fixed costs and hourly rates for one contractor group."""
+    if group_name == 'general_contractor':
+        display, members = 'General', {'main': group_data}
+    else:
+        display, members = title(group_name), group_data
+    costs = []
+    for contractor_id, contractor in members.items():
+        if not isinstance(contractor, dict):
+            continue
+        name = contractor.get('name', contractor_id)
+        if is_amount(contractor.get('cost')) and contractor['cost']:
+            costs.append(ContractorCost(display, contractor_id, name, 'fixed', contractor['cost']))
+        elif is_amount(contractor.get('pay_rate_by_hour')) and contractor['pay_rate_by_hour']:
+            costs.append(ContractorCost(display, contractor_id, name, 'hourly', contractor['pay_rate_by_hour']))
+    return costs
+
+
+def contractor_group_label(group_name: str) -> str:
+    """Name a contractor group is totalled under in reports."""
+    return 'General Contractor' if group_name == 'general_contractor' else title(group_name)
+
+
+def aggregate_costs(data: Dict[str, Any]) -> CostReport:
+    """Build a CostReport from a renovation document in a single pass."""
+    report = CostReport()
+    rooms = data.get('rooms', {})
+
+    for room_name, room_data in rooms.items():
+        room = RoomCosts(room_name)
+        for line in room_cost_lines(room_name, room_data):
+            room.lines.append(line)
+            room.total += line.cost
+            report.section_totals[line.section] = report.section_totals.get(line.section, 0) + line.cost
+            report.item_type_totals[line.item_type] = report.item_type_totals.get(line.item_type, 0) + line.cost
+        report.rooms.append(room)
+
+    contractors = data.get('general_considerations', {}).get('contractor_information', {})
+    for group_name, group_data in contractors.items():
+        if not isinstance(group_data, dict):
+            continue
+        costs = contractor_group_costs(group_name, group_data)
+        report.contractors.extend(costs)
+        total = sum(c.amount for c in costs if c.cost_type == 'fixed')
+        # The general contractor is always listed; other groups only when they carry fixed costs
+        if group_name == 'general_contractor' or total > 0:
+            report.contractor_totals[contractor_group_label(group_name)] = total
+
+    allocations = data.get('general_considerations', {}).get('budget', {}).get('room_allocations', {})
+    spent = {room.name: room.total for room in report.rooms}
+    for room_name, allocated in allocations.items():
+        report.budget_variance.append(BudgetVariance(room_name, allocated, spent.get(room_name, 0.0)))
+
+    return report
+
+
+class CostTotals:
+    """Running totals per room, item type and contractor group.
+
+    Totals are kept by delta: remove a room's or contractor group's old
+    contribution, edit it, add the new one. Nothing outside that room or group is
+    rescanned.
+    """
+    def __init__(self):
+        self.rooms: Dict[str, float] = {}
+        self.item_types: Dict[str, float] = {}
+        self.contractor_groups: Dict[str, float] = {}
+        self._item_type_counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_document(cls, data: Dict[str, Any]) -> 'CostTotals':
+        totals = cls()
+        for room_name, room_data in data.get('rooms', {}).items():
+            totals.add_room(room_name, room_data)
+        contractors = data.get('general_considerations', {}).get('contractor_information', {})
+        for group_name, group_data in contractors.items():
+            totals.add_contractor_group(group_name, group_data)
+        return totals
+
+    def add_room(self, room_name: str, room_data: Any, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) one room's contribution."""
+        if not isinstance(room_data, dict):
+            return
+        room_total = 0.0
+        for line in room_cost_lines(room_name, room_data):
+            room_total += line.cost
+            key = line.item_type
+            self.item_types[key] = self.item_types.get(key, 0.0) + sign * line.cost
+            self._item_type_counts[key] = self._item_type_counts.get(key, 0) + sign
+            if not self._item_type_counts[key]:
+                del self.item_types[key], self._item_type_counts[key]
+        if sign > 0:
+            self.rooms[room_name] = room_total
+        else:
+            self.rooms.pop(room_name, None)
+
+    def add_contractor_group(self, group_name: str, group_data: Any, sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) one contractor group's fixed costs."""
+        if not isinstance(group_data, dict):
+            return
+        if sign > 0:
+            costs = contractor_group_costs(group_name, group_data)
+            self.contractor_groups[contractor_group_label(group_name)] = sum(
+                c.amount for c in costs if c.cost_type == 'fixed')
+        else:
+            self.contractor_groups.pop(contractor_group_label(group_name), None)
+
+    @property
+    def room_total(self) -> float:
+        return sum(self.rooms.values())
+
+    @property
+    def contractor_total(self) -> float:
+        return sum(self.contractor_groups.values())
+
+    @property
+    def project_total(self) -> float:
+        return self.room_total + self.contractor_total
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rooms': dict(self.rooms),
+            'item_types': dict(self.item_types),
+            'contractor_groups': dict(self.contractor_groups),
+            'room_total': self.room_total,
+            'contractor_total': self.contractor_total,
+            'project_total': self.project_total,
+        }
+
+
+def cost_scope(path: List[str]):
+    """Which running totals an edit at path can affect.
+
+    Returns ('room', name), ('contractor_group', name), ('none', None) for paths
+    that carry no costs, or ('all', None) when the edit replaces a whole
+    collection and everything must be recomputed.
+    """
+    path = [str(key) for key in path]
+    if not path:
+        return 'all', None
+    if path[0] == 'rooms':
+        return ('room', path[1]) if len(path) > 1 else ('all', None)
+    if path[0] == 'general_considerations':
+        if len(path) == 1:
+            return 'all', None
+        if path[1] == 'contractor_information':
+            return ('contractor_group', path[2]) if len(path) > 2 else ('all', None)
+    return 'none', None
+
+
+def compare_totals(totals: CostTotals, report: CostReport, tolerance: float = 0.005) -> List[str]:
+    """List the differences between running totals and a full recompute."""
+    problems = []
+    expected_rooms = {room.name: room.total for room in report.rooms}
+    pairs = [
+        ('room', totals.rooms, expected_rooms),
+        ('item type', totals.item_types, report.item_type_totals),
+        ('contractor group', totals.contractor_groups, report.contractor_totals),
+    ]
+    for label, actual, expected in pairs:
+        for key in sorted(set(actual) | set(expected)):
+            # Contractor groups with no fixed costs are left out of reports, so missing means zero
+            if abs(actual.get(key, 0.0) - expected.get(key, 0.0)) > tolerance:
+                problems.append(f"{label} {key}: running {actual.get(key, 0.0):,.2f}, "
+                                f"recomputed {expected.get(key, 0.0):,.2f}")
+    if abs(totals.project_total - report.project_total) > tolerance:
+        problems.append(f"project total: running {totals.project_total:,.2f}, "
+                        f"recomputed {report.project_total:,.2f}")
+    return problems
+
+
+def render_markdown(report: CostReport, user_name: str = None, date: str = None) -> str:
+    """Render a report as the markdown cost report."""
+    md_content = ["# Renovation Cost Report\n\n"]
+    if user_name:
+        md_content.append(f"Generated by: {user_name}\n\n")
+        md_content.append(f"Date: {date}\n\n")
+
+    md_content.append("## Room Costs\n\n")
+    for room in report.rooms:
+        md_content.append(f"### {title(room.name)}\n\n")
+        md_content.append("| Item | Cost (AED) |\n|------|------------|\n")
+        for line in room.lines:
+            line_title = title(line.section) if line.item is None else f"{title(line.section)} - {title(line.item)}"
+            if line.attachments:
+                attachments = [f"[{att}]({room.name}/{att})" for att in line.attachments]
+                line_title += f" ({', '.join(attachments)})"
+            md_content.append(f"| {line_title} | {line.cost:,.2f} |\n")
+        md_content.append(f"| **Room Total** | **{room.total:,.2f}** |\n\n")
+
+    md_content.append("## Contractor Costs\n\n")
+    md_content.append("| Contractor | Cost Type | Rate/Cost (AED) |\n|------------|------------|---------------|\n")
+    for contractor in report.contractors:
+        cost_type = 'Fixed Cost' if contractor.cost_type == 'fixed' else 'Hourly Rate'
+        md_content.append(f"| {contractor.name} ({contractor.group}) | {cost_type} | {contractor.amount:,.2f} |\n")
+
+    md_content.append("\n## Summary\n\n")
+
+    md_content.append("### Room Totals\n\n")
+    md_content.append("| Room | Total Cost (AED) |\n|------|----------------|\n")
+    for room in report.rooms:
+        md_content.append(f"| {title(room.name)} | {room.total:,.2f} |\n")
+    md_content.append(f"| **Total Room Costs** | **{report.room_total:,.2f}** |\n\n")
+
+    md_content.append("### Contractor Totals (Fixed Costs Only)\n\n")
+    md_content.append("| Contractor Type | Total Cost (AED) |\n|-----------------|----------------|\n")
+    for contractor_type, total in report.contractor_totals.items():
+        md_content.append(f"| {contractor_type} | {total:,.2f} |\n")
+    md_content.append(f"| **Total Contractor Costs** | **{report.contractor_total:,.2f}** |\n\n")
+
+    md_content.append("### Project Totals\n\n")
+    md_content.append("| Category | Total Cost (AED) |\n|-----------|----------------|\n")
+    md_content.append(f"| Room Costs | {report.room_total:,.2f} |\n")
+    md_content.append(f"| Contractor Costs | {report.contractor_total:,.2f} |\n")
+    md_content.append(f"| **Project Total** | **{report.project_total:,.2f}** |\n\n")
+
+    md_content.append("### Room Costs by Item Type\n\n")
+    md_content.append("| Item Type | Total Cost (AED) |\n|-----------|----------------|\n")
+    for item_name, total in report.item_type_totals.items():
+        md_content.append(f"| {title(item_name)} | {total:,.2f} |\n")
+
+    if report.budget_variance:
+        md_content.append("\n### Budget Variance\n\n")
+        md_content.append("| Room | Allocated (AED) | Spent (AED) | Remaining (AED) |\n"
+                          "|------|-----------------|-------------|-----------------|\n")
+        for variance in report.budget_variance:
+            md_content.append(f"| {title(variance.room)} | {variance.allocated:,.2f} | "
+                              f"{variance.spent:,.2f} | {variance.remaining:,.2f} |\n")
+
+    return ''.join(md_content)
+
+
+def report_to_dict(report: CostReport) -> Dict[str, Any]:
+    """Plain-data form of a report, including the derived totals."""
+    result = asdict(report)
+    for variance, raw in zip(report.budget_variance, result['budget_variance']):
+        raw['remaining'] = variance.remaining
+    result['room_total'] = report.room_total
+    result['contractor_total'] = report.contractor_total
+    result['project_total'] = report.project_total
+    return result
+
+
+def render_json(report: CostReport) -> str:
+    """Render a report as indented JSON."""
+    return json.dumps(report_to_dict(report), indent=2)
+
+
+def render_csv(report: CostReport) -> str:
+    """Render a report as CSV: one row per room line, contractor and budget allocation."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['category', 'room_or_group', 'section', 'item', 'cost_type', 'amount'])
+    for room in report.rooms:
+        for line in room.lines:
+            writer.writerow(['room', room.name, line.section, line.item or '', 'fixed', line.cost])
+    for contractor in report.contractors:
+        writer.writerow(['contractor', contractor.group, contractor.contractor_id, contractor.name,
+                         contractor.cost_type, contractor.amount])
+    for variance in report.budget_variance:
+        writer.writerow(['budget_remaining', variance.room, '', '', 'allocation', variance.remaining])
+    return buffer.getvalue()
+
+
+RENDERERS = {
+    'markdown': render_markdown,
+    'json': render_json,
+    'csv': render_csv,
+}
+
+EXTENSIONS = {
+    'markdown': 'md',
+    'json': 'json',
+    'csv': 'csv',
+}
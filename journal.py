@@ -0,0 +1,142 @@
+"""Append-only write-ahead journal for RenovationManager edits.
+
+Each mutation is written as one JSON line ({"op": "set"|"delete", "path": [...],
+"value": ...}; a batch of edits is one {"op": "batch", "records": [...]} line)
+instead of rewriting the whole document. The first line of the
+journal records a hash of the snapshot it applies to. Every write of a new
+snapshot starts the journal over, so a journal whose hash does not match means
+the file was changed behind its back; it is set aside rather than replayed onto
+the wrong snapshot or discarded.
+
+Every record is flushed to the operating system as it is appended, so it survives
+the process dying. fsync, which makes it survive the machine dying, runs every
+fsync_every records and otherwise at most fsync_interval seconds after the first
+unsynced record, from a timer if no further append comes along.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List
+
+from atomic_io import atomic_write_bytes
+
+
+def snapshot_hash(content: bytes) -> str:
+    """Hash identifying the snapshot a journal was started against."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class MutationJournal:
+    def __init__(self, journal_file: str, fsync_every: int = 32, fsync_interval: float = 1.0):
+        self.journal_file = journal_file
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.record_count = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # Guards the file between appends and the interval timer's sync
+        self._lock = threading.RLock()
+        self._timer = None
+
+    def read(self, expected_snapshot: str) -> List[Dict[str, Any]]:
+        """Return the records that still need replaying on top of the given snapshot."""
+        if not os.path.exists(self.journal_file):
+            return []
+
+        records = list(self._iter_lines())
+        if not records:
+            return []
+        if records[0].get('snapshot') != expected_snapshot:
+            stale_file = f"{self.journal_file}.stale_{time.strftime('%Y%m%d_%H%M%S')}"
+            os.replace(self.journal_file, stale_file)
+            logging.error(f"Journal {self.journal_file} was written against a different snapshot; "
+                          f"its {len(records) - 1} records were NOT replayed and are kept in {stale_file}")
+            return []
+        return records[1:]
+
+    def _iter_lines(self) -> Iterator[Dict[str, Any]]:
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line means the process died mid-append; everything before it is intact
+                    logging.warning(f"Stopping journal replay at corrupt line {line_number} in {self.journal_file}")
+                    return
+
+    def open(self, snapshot: str, existing_records: int = 0):
+        """Open the journal for appending, starting a fresh one if it does not belong to snapshot."""
+        if existing_records:
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+            self.record_count = existing_records
+        else:
+            self.reset(snapshot)
+
+    def reset(self, snapshot: str):
+        """Replace the journal with an empty one bound to a new snapshot."""
+        with self._lock:
+            self.close()
+            atomic_write_bytes(self.journal_file, (json.dumps({'snapshot': snapshot}) + "\n").encode('utf-8'))
+            self._file = open(self.journal_file, 'a', encoding='utf-8')
+            self.record_count = 0
+            self._unsynced = 0
+
+    def append(self, op: str, path: list, value: Any = None):
+        """Append one mutation record, fsyncing in batches."""
+        record = {'op': op, 'path': list(path)}
+        if op == 'set':
+            record['value'] = value
+        with self._lock:
+            self._write(record)
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._interval_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def append_batch(self, records: List[Dict[str, Any]]):
+        """Append several mutations as one line, so replay sees all of them or none."""
+        with self._lock:
+            self._write({'op': 'batch', 'records': records})
+            self.sync()
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        self.record_count += 1
+        self._unsynced += 1
+
+    def _interval_sync(self):
+        with self._lock:
+            # A sync since this timer was started has already cancelled or replaced it
+            if self._timer is threading.current_thread():
+                self.sync()
+
+    def sync(self):
+        """Flush buffered records and fsync them to disk."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is None or not self._unsynced:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        """Sync and close the journal file."""
+        with self._lock:
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
@@ -0,0 +1,175 @@
+"""JSON Patch (RFC 6902): diffs between document versions and applying patches.
+
+Paths are JSON Pointers (RFC 6901): ``/rooms/kitchen/budget/amount``, with ``~``
+and ``/`` inside keys escaped as ``~0`` and ``~1``. Patches are applied with the
+json_paths helpers that RenovationManager uses for its own edits.
+"""
+import copy
+from typing import Any, Dict, List, Sequence, Tuple
+
+from json_paths import delete_value, get_value, set_value
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class PatchError(ValueError):
+    """Raised for malformed patches or operations that cannot be applied."""
+
+
+class PatchTestFailed(PatchError):
+    """Raised when a 'test' operation does not match the document."""
+
+
+def escape_token(key: Any) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def unescape_token(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def format_pointer(path: Sequence[Any]) -> str:
+    """Render a key sequence as a JSON Pointer."""
+    return ''.join('/' + escape_token(key) for key in path)
+
+
+def parse_pointer(pointer: str) -> Tuple[str, ...]:
+    """Split a JSON Pointer into its unescaped reference tokens."""
+    if pointer == '':
+        return ()
+    if not pointer.startswith('/'):
+        raise ValueError(f"JSON Pointer must start with '/': {pointer!r}")
+    return tuple(unescape_token(token) for token in pointer[1:].split('/'))
+
+
+def diff(old: Any, new: Any) -> List[Dict[str, Any]]:
+    """Return patch operations that turn old into new.
+
+    Dicts are compared key by key. Lists of equal length are compared element by
+    element, and lists that only grew or shrank at the end get add/remove
+    operations for the tail; any other list change replaces the whole list.
+    """
+    ops: List[Dict[str, Any]] = []
+    _diff(old, new, [], ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: List[str], ops: List[Dict[str, Any]]):
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, old_value in old.items():
+            if key not in new:
+                ops.append({'op': 'remove', 'path': format_pointer(path + [key])})
+            else:
+                _diff(old_value, new[key], path + [key], ops)
+        for key, new_value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': format_pointer(path + [key]), 'value': new_value})
+    elif isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        if len(old) != len(new) and old[:common] != new[:common]:
+            ops.append({'op': 'replace', 'path': format_pointer(path), 'value': new})
+            return
+        for i in range(common):
+            _diff(old[i], new[i], path + [str(i)], ops)
+        for i in range(common, len(new)):
+            ops.append({'op': 'add', 'path': format_pointer(path + [str(i)]), 'value': new[i]})
+        # Remove from the end so earlier indices stay valid
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({'op': 'remove', 'path': format_pointer(path + [str(i)])})
+    elif type(old) is not type(new) or old != new:
+        ops.append({'op': 'replace', 'path': format_pointer(path), 'value': new})
+
+
+def apply_patch(doc: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Apply patch operations to doc in place and return the resulting document.
+
+    'add' inserts into lists (``-`` appends) and sets object members; as RFC
+    6902 requires, the parent must already exist and be an object or a list.
+    'replace' and 'remove' require the target to exist. A failed operation leaves
+    doc partly modified, so callers should patch a copy.
+    """
+    if not isinstance(ops, list):
+        raise PatchError("Patch must be a list of operations")
+    for i, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get('op') not in OPERATIONS or not isinstance(op.get('path'), str):
+            raise PatchError(f"Operation {i} must have a valid 'op' and a string 'path'")
+        try:
+            doc = _apply_operation(doc, op)
+        except PatchTestFailed:
+            raise
+        except (KeyError, ValueError, TypeError) as e:
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            raise PatchError(f"Operation {i} ({op['op']} {op['path']}) failed: {message}")
+    return doc
+
+
+def changed_paths(ops: List[Dict[str, Any]]) -> List[Tuple[str, ...]]:
+    """Paths an applied patch may have changed: every target, and the source of each move."""
+    paths = []
+    for op in ops:
+        if op['op'] == 'test':
+            continue
+        paths.append(parse_pointer(op['path']))
+        if op['op'] == 'move':
+            paths.append(parse_pointer(op['from']))
+    return paths
+
+
+def _apply_operation(doc: Any, op: Dict[str, Any]) -> Any:
+    kind = op['op']
+    path = parse_pointer(op['path'])
+    if kind in ('add', 'replace', 'test') and 'value' not in op:
+        raise PatchError(f"'{kind}' operation requires a value")
+
+    if kind == 'test':
+        if get_value(doc, path) != op['value']:
+            raise PatchTestFailed(f"Test failed at {op['path']}")
+        return doc
+    if kind == 'remove':
+        if not path:
+            raise PatchError("Cannot remove the whole document")
+        delete_value(doc, path)
+        return doc
+    if kind == 'replace':
+        if not path:
+            return op['value']
+        get_value(doc, path)
+        set_value(doc, path, op['value'])
+        return doc
+    if kind in ('move', 'copy'):
+        if not isinstance(op.get('from'), str):
+            raise PatchError(f"'{kind}' operation requires a string 'from'")
+        source = parse_pointer(op['from'])
+        value = get_value(doc, source)
+        if kind == 'move':
+            if path[:len(source)] == source and path != source:
+                raise PatchError("Cannot move a value into one of its own children")
+            if path == source:
+                return doc
+            delete_value(doc, source)
+        else:
+            value = copy.deepcopy(value)
+        return _add(doc, path, value)
+    return _add(doc, path, op['value'])
+
+
+def _add(doc: Any, path: Tuple[str, ...], value: Any) -> Any:
+    if not path:
+        return value
+    try:
+        parent = get_value(doc, path[:-1])
+    except KeyError:
+        raise PatchError(f"Parent of {format_pointer(path)} does not exist")
+    if isinstance(parent, list):
+        key = path[-1]
+        index = len(parent) if key == '-' else int(key)
+        if not 0 <= index <= len(parent):
+            raise KeyError(f"Invalid list index: {key}")
+        parent.insert(index, value)
+    elif isinstance(parent, dict):
+        parent[path[-1]] = value
+    else:
+        raise PatchError(f"Parent of {format_pointer(path)} is not an object or a list")
+    return doc
@@ -0,0 +1,203 @@
+"""Path helpers and a flattened path index for renovation JSON documents.
+
+Paths are sequences of keys (``['rooms', 'kitchen', 'budget']``) or dotted strings
+(``'rooms.kitchen.budget'``). List positions are written as decimal strings, so
+``'rooms.kitchen.projects.0.title'`` addresses the first project's title.
+"""
+import fnmatch
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
+
+PathLike = Union[str, Sequence[Any]]
+
+WILDCARD_CHARS = set('*?[')
+
+
+def parse_path(path: PathLike) -> Tuple[str, ...]:
+    """Normalise a dotted string or key sequence into a tuple of string keys."""
+    if isinstance(path, str):
+        return tuple(part for part in path.split('.') if part)
+    return tuple(str(key) for key in path)
+
+
+def format_path(path: Sequence[Any]) -> str:
+    """Render a key sequence as a dotted string."""
+    return '.'.join(str(key) for key in path)
+
+
+def iter_children(node: Any) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, child) pairs of a dict or list, with list positions as strings."""
+    if isinstance(node, dict):
+        yield from node.items()
+    elif isinstance(node, list):
+        for i, child in enumerate(node):
+            yield str(i), child
+
+
+def get_value(data: Any, path: Sequence[Any]) -> Any:
+    """Return the value at path, raising KeyError if any step is missing."""
+    current = data
+    for key in path:
+        if isinstance(current, dict):
+            if key not in current:
+                raise KeyError(f"Key '{key}' not found")
+            current = current[key]
+        elif isinstance(current, list):
+            try:
+                idx = int(key)
+                current = current[idx]
+            except (ValueError, IndexError):
+                raise KeyError(f"Invalid list index: {key}")
+        else:
+            raise KeyError(f"Cannot navigate further at {key}")
+    return current
+
+
+def set_value(data: Any, path: Sequence[Any], value: Any):
+    """Set the value at path in place.
+
+    Missing intermediate keys are created as empty objects and lists are padded
+    up to the requested index. Raises KeyError if a step on the way is a scalar.
+    """
+    current = data
+    for key in path[:-1]:
+        if isinstance(current, dict):
+            if key not in current:
+                current[key] = {}
+            current = current[key]
+        elif isinstance(current, list):
+            try:
+                idx = int(key)
+                while len(current) <= idx:
+                    current.append({})
+                current = current[idx]
+            except ValueError:
+                raise KeyError(f"Invalid list index: {key}")
+        else:
+            raise KeyError(f"Cannot navigate further at {key}")
+
+    if isinstance(current, dict):
+        current[path[-1]] = value
+    elif isinstance(current, list):
+        try:
+            idx = int(path[-1])
+            while len(current) <= idx:
+                current.append(None)
+            current[idx] = value
+        except ValueError:
+            raise KeyError(f"Invalid list index: {path[-1]}")
+    else:
+        raise KeyError(f"Cannot navigate further at {path[-1]}")
+
+
+def delete_value(data: Any, path: Sequence[Any]):
+    """Remove the value at path in place, raising KeyError if it does not exist."""
+    parent = get_value(data, path[:-1])
+    if isinstance(parent, dict):
+        if path[-1] not in parent:
+            raise KeyError(f"Key '{path[-1]}' not found")
+        del parent[path[-1]]
+    elif isinstance(parent, list):
+        try:
+            idx = int(path[-1])
+            del parent[idx]
+        except (ValueError, IndexError):
+            raise KeyError(f"Invalid list index: {path[-1]}")
+
+
+class PathIndex:
+    """Flat map from path tuples to node references, kept in step with edits.
+
+    Lookups are a single dict access instead of a walk from the root. Callers
+    that mutate the document call detach() on the affected subtree before the
+    change and attach() afterwards; both cost time proportional to that subtree.
+    """
+    def __init__(self, data: Any):
+        self._nodes: Dict[Tuple[str, ...], Any] = {}
+        self.rebuild(data)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, path: PathLike) -> bool:
+        return parse_path(path) in self._nodes
+
+    def rebuild(self, data: Any):
+        """Re-index the whole document."""
+        self._nodes.clear()
+        self.attach((), data)
+
+    def get(self, path: PathLike) -> Any:
+        """Return the node at path, raising KeyError if it is not indexed."""
+        if isinstance(path, str):
+            return self._nodes[parse_path(path)]
+        try:
+            # Paths of string keys need no normalising
+            return self._nodes[tuple(path)]
+        except KeyError:
+            return self._nodes[parse_path(path)]
+
+    def attach(self, path: PathLike, node: Any):
+        """Index node and all of its descendants under path."""
+        stack = [(parse_path(path), node)]
+        while stack:
+            current_path, current = stack.pop()
+            self._nodes[current_path] = current
+            for key, child in iter_children(current):
+                stack.append((current_path + (key,), child))
+
+    def detach(self, path: PathLike):
+        """Drop path and its descendants, as they were when last indexed."""
+        path = parse_path(path)
+        if path not in self._nodes:
+            return
+        stack = [path]
+        while stack:
+            current_path = stack.pop()
+            current = self._nodes.pop(current_path, None)
+            for key, _ in iter_children(current):
+                stack.append(current_path + (key,))
+
+    def deepest_prefix(self, path: PathLike) -> Tuple[str, ...]:
+        """Longest prefix of path that is present in the index."""
+        path = parse_path(path)
+        for length in range(len(path), -1, -1):
+            if path[:length] in self._nodes:
+                return path[:length]
+        return ()
+
+    def query(self, pattern: PathLike) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Return (path, value) pairs matching a glob path such as 'rooms.*.budget.amount'.
+
+        Each segment may use fnmatch wildcards to match one level; a bare '**'
+        matches any number of levels, including none.
+        """
+        segments = parse_path(pattern)
+        matches = [()]
+        for segment in segments:
+            expanded = []
+            if segment == '**':
+                for path in matches:
+                    expanded.extend(self._descendants(path))
+            elif WILDCARD_CHARS & set(segment):
+                for path in matches:
+                    for key, _ in iter_children(self._nodes[path]):
+                        if fnmatch.fnmatchcase(key, segment):
+                            expanded.append(path + (key,))
+            else:
+                for path in matches:
+                    candidate = path + (segment,)
+                    if candidate in self._nodes:
+                        expanded.append(candidate)
+            # '**' can reach the same node along several routes; keep the first
+            matches = list(dict.fromkeys(expanded))
+        return [(path, self._nodes[path]) for path in matches]
+
+    def _descendants(self, path: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+        result = []
+        stack = [path]
+        while stack:
+            current_path = stack.pop()
+            result.append(current_path)
+            for key, _ in iter_children(self._nodes[current_path]):
+                stack.append(current_path + (key,))
+        return result
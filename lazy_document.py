@@ -0,0 +1,134 @@
+"""On-demand loading of subtrees from a large JSON document.
+
+A sidecar file (``<document>.offsets``) records the byte range of every value down
+to INDEX_DEPTH keys deep, e.g. ``rooms``, ``rooms.kitchen`` and
+``rooms.kitchen.budget``. A lookup seeks to the deepest recorded ancestor of the
+requested path and parses only that range, so reading one room section costs the
+same however large the rest of the document grows. The sidecar stores the
+document's size and modification time and is rebuilt when they no longer match.
+"""
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from atomic_io import atomic_write_bytes
+from json_paths import get_value
+
+logger = logging.getLogger(__name__)
+
+INDEX_DEPTH = 3
+OFFSETS_SUFFIX = '.offsets'
+
+# Strings and structural characters; numbers, literals and whitespace fall between tokens
+TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]:,]', re.DOTALL)
+
+Spans = Dict[Tuple[str, ...], Tuple[int, int]]
+
+
+def offsets_path(json_file: str) -> str:
+    return json_file + OFFSETS_SUFFIX
+
+
+def scan_offsets(content: bytes, depth: int = INDEX_DEPTH) -> Spans:
+    """Byte ranges of object members up to depth keys deep.
+
+    Ranges may include surrounding whitespace, which json.loads ignores. Members
+    of arrays are not recorded.
+    """
+    spans: Spans = {}
+    # One frame per open container: [path or None inside arrays, is_object, key, value_start]
+    stack: List[list] = []
+    for match in TOKEN_RE.finditer(content):
+        token = match.group()
+        frame = stack[-1] if stack else None
+        if token == b'{' or token == b'[':
+            if frame is None:
+                path = ()
+            elif frame[0] is not None and frame[1] and len(frame[0]) < depth:
+                path = frame[0] + (frame[2],)
+            else:
+                path = None
+            stack.append([path, token == b'{', None, None])
+        elif token == b'}' or token == b']' or token == b',':
+            if frame is None:
+                continue
+            if frame[1] and frame[3] is not None:
+                if frame[0] is not None and len(frame[0]) < depth:
+                    spans[frame[0] + (frame[2],)] = (frame[3], match.start())
+                frame[2] = frame[3] = None
+            if token != b',':
+                stack.pop()
+        elif token == b':':
+            if frame is not None:
+                frame[3] = match.end()
+        elif frame is not None and frame[1] and frame[3] is None and frame[0] is not None:
+            frame[2] = json.loads(token)
+    return spans
+
+
+def write_offsets(json_file: str, content: bytes, st: Optional[os.stat_result] = None) -> Spans:
+    """Index content, the current contents of json_file, and save the sidecar.
+
+    The sidecar is only a cache, so failing to write it is logged rather than raised.
+    """
+    spans = scan_offsets(content)
+    try:
+        st = st or os.stat(json_file)
+        sidecar = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'spans': [[list(path), start, end] for path, (start, end) in spans.items()],
+        }
+        atomic_write_bytes(offsets_path(json_file), json.dumps(sidecar, separators=(',', ':')).encode('utf-8'),
+                           sync=False)
+    except OSError as e:
+        logger.warning(f"Could not write offset index for {json_file}: {str(e)}")
+    return spans
+
+
+def read_offsets(json_file: str, st: os.stat_result) -> Optional[Spans]:
+    """Spans from the sidecar, or None if it is missing or describes another version of the file."""
+    try:
+        with open(offsets_path(json_file), 'rb') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get('size') != st.st_size or sidecar.get('mtime_ns') != st.st_mtime_ns:
+        return None
+    return {tuple(path): (start, end) for path, start, end in sidecar.get('spans', [])}
+
+
+class LazyDocument:
+    """Read-only access to parts of a JSON file without parsing all of it."""
+    def __init__(self, json_file: str):
+        self.json_file = json_file
+
+    def get(self, path: Sequence[str]) -> Any:
+        """Value at path, raising KeyError like json_paths.get_value if it is missing."""
+        path = tuple(path)
+        with open(self.json_file, 'rb') as f:
+            st = os.fstat(f.fileno())
+            spans = read_offsets(self.json_file, st)
+            if spans is None:
+                content = f.read()
+                spans = write_offsets(self.json_file, content, st)
+                logger.info(f"Rebuilt offset index for {self.json_file}")
+                prefix = self._prefix(spans, path)
+                start, end = spans[prefix] if prefix else (0, len(content))
+                return get_value(json.loads(content[start:end]), path[len(prefix):])
+            prefix = self._prefix(spans, path)
+            if not prefix:
+                return get_value(json.load(f), path)
+            start, end = spans[prefix]
+            f.seek(start)
+            return get_value(json.loads(f.read(end - start)), path[len(prefix):])
+
+    @staticmethod
+    def _prefix(spans: Spans, path: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Deepest indexed ancestor of path, or () if there is none."""
+        for length in range(min(len(path), INDEX_DEPTH), 0, -1):
+            if path[:length] in spans:
+                return path[:length]
+        return ()
@@ -0,0 +1,119 @@
+"""Queue-based logging shared by the server and the CLI.
+
+Loggers put records on an in-memory queue; a QueueListener thread applies the
+handlers' formats and writes them to rotating files and the console, so request
+threads never wait on disk or terminal I/O for logging. The calling thread
+still merges the message with its %-style arguments (and renders any traceback)
+when the record is queued. Records below the configured level are dropped
+before that happens, so debug lines cost almost nothing in production when they
+use %-style arguments or an isEnabledFor check.
+
+Profiles pick levels and rotation:
+
+    development   DEBUG to the console and files, files rotated by size
+    production    INFO to files rotated at midnight, only warnings on the console
+
+The profile comes from --log-profile, or from the RENOVATION_LOG_PROFILE
+environment variable.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+PROFILE_ENV_VAR = 'RENOVATION_LOG_PROFILE'
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+@dataclass
+class LoggingProfile:
+    level: int
+    # None leaves the console out entirely
+    console_level: Optional[int]
+    max_bytes: int
+    backup_count: int
+    # TimedRotatingFileHandler 'when' value; None rotates by size instead
+    rotate_when: Optional[str] = None
+
+
+PROFILES = {
+    'development': LoggingProfile(logging.DEBUG, logging.DEBUG, 10 * 1024 * 1024, 5),
+    'production': LoggingProfile(logging.INFO, logging.WARNING, 0, 14, rotate_when='midnight'),
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def default_profile() -> str:
+    return os.environ.get(PROFILE_ENV_VAR, 'development')
+
+
+def file_handler(filename: str, profile: LoggingProfile) -> logging.Handler:
+    if profile.rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(filename, when=profile.rotate_when,
+                                                         backupCount=profile.backup_count, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(filename, maxBytes=profile.max_bytes,
+                                                backupCount=profile.backup_count, encoding='utf-8')
+
+
+def configure_logging(log_file: str, profile: Optional[str] = None, fmt: str = DEFAULT_FORMAT,
+                      extra_files: Optional[Dict[str, str]] = None,
+                      console: bool = True, level: Optional[int] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to rotating files and, per the profile, the console.
+
+    extra_files maps logger names to files that receive that logger's records in
+    addition to log_file, e.g. {'json_operations': 'json_operations.log'}. With
+    console=False nothing is written to the terminal whatever the profile says.
+    level, if given, replaces the profile's level. Calling this again replaces
+    the previous configuration.
+    """
+    global _listener
+    name = profile or default_profile()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown logging profile: {name} (expected one of {', '.join(PROFILES)})")
+    settings = PROFILES[name]
+    formatter = logging.Formatter(fmt)
+
+    handlers = [file_handler(log_file, settings)]
+    for logger_name, filename in (extra_files or {}).items():
+        handler = file_handler(filename, settings)
+        handler.addFilter(logging.Filter(logger_name))
+        handlers.append(handler)
+    if console and settings.console_level is not None:
+        stream = logging.StreamHandler()
+        stream.setLevel(settings.console_level)
+        handlers.append(stream)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logging()
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level or settings.level)
+    for logger_name in extra_files or {}:
+        logging.getLogger(logger_name).setLevel(level or settings.level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and close the files."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(shutdown_logging)
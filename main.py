@@ -2,27 +2,121 @@
 import argparse
 import json
 import logging
+import sys
 from datetime import datetime
 import os
-from typing import Dict, Any, List, Union, Tuple
-
-# Configure logging
-logging.basicConfig(
-    filename='renovation_manager.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+import atexit
+import copy
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Union, Tuple
+
+from atomic_io import atomic_write_bytes
+from journal import MutationJournal, snapshot_hash
+from retention import DEFAULT_POLICY, BackgroundPruner, RetentionPolicy, backup_pattern, prune_files
+from version_diff import TreeDiffer, load_node, render_diff
+from version_store import VersionStore
+from lazy_document import LazyDocument, write_offsets
+from sharded_store import ShardedDocument
+from logging_setup import PROFILE_ENV_VAR, PROFILES, configure_logging, default_profile
+from tracing import tracer
+from json_paths import PathIndex, PathLike, delete_value, format_path, get_value, parse_path, set_value
+from cost_engine import (CostReport, CostTotals, EXTENSIONS, RENDERERS, aggregate_costs, compare_totals,
+                         cost_scope, is_amount, render_markdown)
+
+# Configure logging; records are written by a background thread. The CLI logs at
+# INFO unless a profile is chosen explicitly with RENOVATION_LOG_PROFILE or --log-profile.
+configure_logging('renovation_manager.log', default_profile(), console=False,
+                  level=None if PROFILE_ENV_VAR in os.environ else logging.INFO)
 
 class RenovationManager:
-    def __init__(self, json_file: str):
+    def __init__(self, json_file: str, journal: bool = False, compact_every: int = 500,
+                 indexed: bool = False, retention: Optional[str] = None, lazy: bool = False):
         self.json_file = json_file
-        self.data = self.load_json()
-
+        self.compact_every = compact_every
+        self.journal = None
+        self.index = None
+        self.revision = 0
+        self._batch = None
+        self._cost_report = None
+        self._cost_report_revision = None
+        self._data = None
+        self._totals = None
+        # Paths edited since the last save, so a sharded document only rewrites the shards they fall in
+        self._touched = []
+        shards = ShardedDocument(json_file)
+        self.shards = shards if shards.exists() else None
+        self.journal_file = f"{json_file}.journal"
+        # Edits from an earlier --journal run live only in the journal until it is compacted
+        pending_journal = os.path.exists(self.journal_file)
+        # Lazy managers read single subtrees through the offset index (or the shards) until
+        # something needs the whole document
+        if lazy and not journal and not indexed and not pending_journal:
+            self.lazy = self.shards or LazyDocument(json_file)
+        else:
+            self.lazy = None
+        if self.lazy is None:
+            self._load()
+        if journal:
+            self.journal = MutationJournal(self.journal_file)
+            self.replay_journal()
+        elif pending_journal:
+            # Without --journal the edits are applied in memory and folded in by the next save
+            self.replay_journal(MutationJournal(self.journal_file))
+        if indexed:
+            self.index = PathIndex(self.data)
+        self.pruner = self._start_pruner(retention) if retention else None
+
+    def _load(self):
+        self._data = self.load_json()
+        self._totals = CostTotals.from_document(self._data)
+
+    @property
+    def data(self) -> Dict:
+        if self._data is None:
+            self._load()
+        return self._data
+
+    @data.setter
+    def data(self, value: Dict):
+        self._data = value
+
+    @property
+    def totals(self) -> CostTotals:
+        if self._data is None:
+            self._load()
+        return self._totals
+
+    @totals.setter
+    def totals(self, value: CostTotals):
+        self._totals = value
+
+    def _start_pruner(self, retention: str) -> Optional[BackgroundPruner]:
+        """Prune timestamped copies written by save_json in the background."""
+        policy = RetentionPolicy.parse(retention)
+        if not policy.enabled:
+            return None
+        directory = os.path.dirname(self.json_file) or '.'
+        pattern = backup_pattern(f"{os.path.splitext(os.path.basename(self.json_file))[0]}_", '.json')
+
+        def prune():
+            # Shard backups sit next to each shard under the same naming scheme
+            directories = self.shards.directories() if self.shards is not None else []
+            for path in [directory] + directories:
+                prune_files(path, pattern, policy)
+        return BackgroundPruner([prune]).start()
+
+    @tracer.traced()
     def load_json(self) -> Dict:
         """Load JSON data from file."""
+        if self.shards is not None:
+            data = self.shards.load()
+            self.snapshot_hash = self.shards.manifest_hash
+            return data
         try:
-            with open(self.json_file, 'r') as f:
-                return json.load(f)
+            with open(self.json_file, 'rb') as f:
+                content = f.read()
+            self.snapshot_hash = snapshot_hash(content)
+            return json.loads(content)
         except FileNotFoundError:
             logging.error(f"File not found: {self.json_file}")
             raise
@@ -30,93 +124,273 @@ class RenovationManager:
             logging.error(f"Invalid JSON format in {self.json_file}")
             raise
 
+    @tracer.traced()
     def save_json(self):
         """Save JSON data to file with backup."""
         # Create backup
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.shards is not None:
+            # Only the edited shards are backed up and rewritten
+            written = self.shards.save(self.data, self._touched, backup_timestamp=timestamp)
+            self._touched = []
+            self.snapshot_hash = self.shards.manifest_hash
+            self._retire_journal()
+            logging.info(f"Data saved successfully ({len(written)} shards written)")
+            if self.pruner is not None:
+                self.pruner.request()
+            return
         backup_file = f"{os.path.splitext(self.json_file)[0]}_{timestamp}.json"
-        with open(backup_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        content = json.dumps(self.data, indent=2).encode('utf-8')
+        atomic_write_bytes(backup_file, content)
         logging.info(f"Created backup: {backup_file}")
 
         # Save updated data
-        with open(self.json_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        atomic_write_bytes(self.json_file, content)
+        self.snapshot_hash = snapshot_hash(content)
+        write_offsets(self.json_file, content)
+        self._retire_journal()
         logging.info("Data saved successfully")
-
-    def get_nested_value(self, path: list) -> Any:
-        """Get value at nested path."""
-        current = self.data
-        for key in path:
-            if isinstance(current, dict):
-                if key not in current:
-                    raise KeyError(f"Key '{key}' not found")
-                current = current[key]
-            elif isinstance(current, list):
+        if self.pruner is not None:
+            self.pruner.request()
+
+    def _retire_journal(self):
+        """The snapshot just written holds every journaled edit, so the journal starts over."""
+        if self.journal is not None:
+            self.journal.reset(self.snapshot_hash)
+        elif os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+            logging.info(f"Folded {self.journal_file} into {self.json_file}")
+
+    def replay_journal(self, journal: Optional[MutationJournal] = None):
+        """Apply journaled edits on top of the snapshot loaded from disk."""
+        journal = journal or self.journal
+        records = journal.read(self.snapshot_hash)
+        for record in records:
+            for edit in record['records'] if record['op'] == 'batch' else [record]:
                 try:
-                    idx = int(key)
-                    current = current[idx]
-                except (ValueError, IndexError):
-                    raise KeyError(f"Invalid list index: {key}")
-            else:
-                raise KeyError(f"Cannot navigate further at {key}")
-        return current
+                    if edit['op'] == 'set':
+                        self._apply_set(edit['path'], edit['value'])
+                    elif edit['op'] == 'delete':
+                        self._apply_delete(edit['path'])
+                except KeyError as e:
+                    logging.error(f"Skipping journal record {edit}: {e}")
+        if records:
+            logging.info(f"Replayed {len(records)} journal records onto {self.json_file}")
+        if journal is self.journal:
+            self.journal.open(self.snapshot_hash, len(records))
+
+    def compact(self):
+        """Fold the journal into a new snapshot of the JSON file."""
+        if self.shards is not None:
+            self.shards.save(self.data, self._touched)
+            self._touched = []
+            self.journal.reset(self.shards.manifest_hash)
+            logging.info(f"Compacted journal into the shards of {self.json_file}")
+            return
+        content = json.dumps(self.data, indent=2).encode('utf-8')
+        atomic_write_bytes(self.json_file, content)
+        self.snapshot_hash = snapshot_hash(content)
+        write_offsets(self.json_file, content)
+        self.journal.reset(self.snapshot_hash)
+        logging.info(f"Compacted journal into {self.json_file}")
+
+    def close(self):
+        """Flush any pending journal records to disk and finish pending pruning."""
+        if self.journal is not None:
+            self.journal.close()
+        if self.pruner is not None:
+            self.pruner.stop()
+
+    def _commit(self, op: str, path: list, value: Any = None):
+        """Persist a mutation: append it to the journal, or rewrite the file when journaling is off."""
+        if self._batch is not None:
+            self._batch.append((op, list(path), value))
+            return
+        self._persist([(op, list(path), value)])
+
+    def _persist(self, records: List[Tuple[str, list, Any]]):
+        if not records:
+            return
+        if self.journal is None:
+            self.save_json()
+            return
+        if len(records) == 1:
+            self.journal.append(*records[0])
+        else:
+            self.journal.append_batch([{'op': op, 'path': path, 'value': value} for op, path, value in records])
+        if self.journal.record_count >= self.compact_every:
+            self.compact()
+
+    def validate(self) -> List[str]:
+        """Check the document against the project's data requirements and list any problems."""
+        problems = []
+        for field in ['project_name', 'last_updated', 'status']:
+            if field not in self.data:
+                problems.append(f"Missing required field: {field}")
+        rooms = self.data.get('rooms')
+        if not isinstance(rooms, dict):
+            return problems + ["Rooms must be a dictionary"]
+        for room_name, room_data in rooms.items():
+            if not isinstance(room_data, dict):
+                problems.append(f"Invalid room data for {room_name}")
+                continue
+            if not isinstance(room_data.get('budget'), dict):
+                problems.append(f"Room {room_name} missing budget object")
+        for path, value in PathIndex(self.data).query('**.cost'):
+            if not is_amount(value):
+                problems.append(f"Cost at {format_path(path)} must be numeric")
+        return problems
+
+    @contextmanager
+    def batch(self):
+        """Stage edits in memory and commit them with a single write.
+
+        Edits made inside the block are validated once on exit and persisted as
+        one file save (one backup) or one journal sync. If the block raises, or
+        the edits introduce validation problems, the document is rolled back and
+        nothing is written. Nested batches join the outermost one.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        snapshot = copy.deepcopy(self.data)
+        problems_before = set(self.validate())
+        self._batch = []
+        try:
+            yield self
+            records, self._batch = self._batch, None
+            # Only fail on problems the batch introduced, not ones already in the file
+            new_problems = [p for p in self.validate() if p not in problems_before]
+            if new_problems:
+                raise ValueError(f"Batch rejected: {'; '.join(new_problems)}")
+            self._persist(records)
+            if records:
+                logging.info(f"Committed batch of {len(records)} edits")
+        except BaseException:
+            self._batch = None
+            self._rollback(snapshot)
+            raise
+
+    def _rollback(self, snapshot: Dict):
+        self.data = snapshot
+        self.revision += 1
+        if self.index is not None:
+            self.index.rebuild(self.data)
+        self.totals = CostTotals.from_document(self.data)
+        logging.warning("Rolled back batch of edits")
+
+    def apply_edits(self, edits: List[Dict[str, Any]]):
+        """Apply a list of {'path': ..., 'value': ...} or {'op': 'delete', 'path': ...} edits as one batch."""
+        with self.batch():
+            for edit in edits:
+                path = list(parse_path(edit['path'])) if isinstance(edit['path'], str) else edit['path']
+                if edit.get('op', 'set') == 'delete':
+                    self.delete_nested_value(path)
+                else:
+                    self.set_nested_value(path, edit['value'])
+
+    def get_nested_value(self, path: PathLike) -> Any:
+        """Get value at nested path (a key list or a dotted string)."""
+        if self.index is not None:
+            try:
+                return self.index.get(path)
+            except KeyError:
+                pass  # Fall through so callers get the same error messages as before
+        if isinstance(path, str):
+            path = parse_path(path)
+        if self._data is None and self.lazy is not None:
+            return self.lazy.get(parse_path(path))
+        return get_value(self.data, path)
+
+    def query(self, pattern: PathLike) -> List[Tuple[str, Any]]:
+        """Return (dotted path, value) pairs matching a glob such as 'rooms.*.budget.amount'."""
+        index = self.index if self.index is not None else PathIndex(self.data)
+        return [(format_path(path), value) for path, value in index.query(pattern)]
+
+    def _index_anchor(self, path: list) -> Tuple[str, ...]:
+        """Subtree of the index that an edit at path can change."""
+        path = parse_path(path)
+        existing = self.index.deepest_prefix(path)
+        anchor = path[:len(existing) + 1] if len(existing) < len(path) else path
+        # List edits can pad or shift siblings, so re-index the whole list
+        if anchor and isinstance(self.index.get(anchor[:-1]), list):
+            anchor = anchor[:-1]
+        return anchor
+
+    def _reindex(self, anchor: Tuple[str, ...]):
+        try:
+            self.index.attach(anchor, get_value(self.data, anchor))
+        except KeyError:
+            pass  # The anchor itself was deleted
 
     def set_nested_value(self, path: list, value: Any):
         """Set value at nested path."""
-        current = self.data
-        for i, key in enumerate(path[:-1]):
-            if isinstance(current, dict):
-                if key not in current:
-                    current[key] = {}
-                current = current[key]
-            elif isinstance(current, list):
-                try:
-                    idx = int(key)
-                    while len(current) <= idx:
-                        current.append({})
-                    current = current[idx]
-                except ValueError:
-                    raise KeyError(f"Invalid list index: {key}")
-        
-        if isinstance(current, dict):
-            current[path[-1]] = value
-        elif isinstance(current, list):
-            try:
-                idx = int(path[-1])
-                while len(current) <= idx:
-                    current.append(None)
-                current[idx] = value
-            except ValueError:
-                raise KeyError(f"Invalid list index: {path[-1]}")
-        self.save_json()
+        self._apply_set(path, value)
+        self._commit('set', path, value)
+
+    @tracer.traced()
+    def cost_report(self) -> CostReport:
+        """Aggregated costs, recomputed only after the document has changed."""
+        if self._cost_report is None or self._cost_report_revision != self.revision:
+            self._cost_report = aggregate_costs(self.data)
+            self._cost_report_revision = self.revision
+        return self._cost_report
+
+    def get_totals(self) -> Dict[str, Any]:
+        """Running cost totals per room, item type and contractor group, plus project totals."""
+        return self.totals.as_dict()
+
+    def verify_totals(self) -> List[str]:
+        """Compare the running totals with a full recompute and list any differences."""
+        problems = compare_totals(self.totals, aggregate_costs(self.data))
+        for problem in problems:
+            logging.error(f"Running totals out of step: {problem}")
+        return problems
+
+    def _scope_node(self, scope: Tuple[str, str]) -> Any:
+        kind, name = scope
+        if kind == 'room':
+            rooms = self.data.get('rooms')
+            return rooms.get(name) if isinstance(rooms, dict) else None
+        contractors = self.data.get('general_considerations', {})
+        contractors = contractors.get('contractor_information') if isinstance(contractors, dict) else None
+        return contractors.get(name) if isinstance(contractors, dict) else None
+
+    def _update_totals(self, scope: Tuple[str, str], sign: int):
+        kind, name = scope
+        if kind == 'room':
+            self.totals.add_room(name, self._scope_node(scope), sign)
+        elif kind == 'contractor_group':
+            self.totals.add_contractor_group(name, self._scope_node(scope), sign)
+        elif kind == 'all' and sign > 0:
+            self.totals = CostTotals.from_document(self.data)
+
+    def _apply(self, path: list, mutate):
+        """Run an in-place edit at path, keeping the index and running totals in step."""
+        self.revision += 1
+        self._touched.append(parse_path(path))
+        anchor = self._index_anchor(path) if self.index is not None else None
+        scope = cost_scope(path) if self.totals is not None else ('none', None)
+        if anchor is not None:
+            self.index.detach(anchor)
+        self._update_totals(scope, -1)
+        try:
+            mutate()
+        finally:
+            if anchor is not None:
+                self._reindex(anchor)
+            self._update_totals(scope, 1)
+
+    def _apply_set(self, path: list, value: Any):
+        self._apply(path, lambda: set_value(self.data, path, value))
 
     def delete_nested_value(self, path: list):
         """Delete value at nested path."""
-        current = self.data
-        for key in path[:-1]:
-            if isinstance(current, dict):
-                if key not in current:
-                    raise KeyError(f"Key '{key}' not found")
-                current = current[key]
-            elif isinstance(current, list):
-                try:
-                    idx = int(key)
-                    current = current[idx]
-                except (ValueError, IndexError):
-                    raise KeyError(f"Invalid list index: {key}")
-
-        if isinstance(current, dict):
-            if path[-1] not in current:
-                raise KeyError(f"Key '{path[-1]}' not found")
-            del current[path[-1]]
-        elif isinstance(current, list):
-            try:
-                idx = int(path[-1])
-                del current[idx]
-            except (ValueError, IndexError):
-                raise KeyError(f"Invalid list index: {path[-1]}")
-        self.save_json()
+        self._apply_delete(path)
+        self._commit('delete', path)
+
+    def _apply_delete(self, path: list):
+        self._apply(path, lambda: delete_value(self.data, path))
 
     def format_value(self, value: Any, indent: int = 0) -> str:
         """Format value for display."""
@@ -289,19 +563,6 @@ def run_test_script(manager: RenovationManager, script_name: str):
         except KeyError as e:
             print(f"Error: {e}")
 
-def process_contractor_group(group_name: str, contractors_data: Dict, md_content: List[str]) -> Tuple[float, List[str]]:
-    """Process a group of contractors and return their total cost and updated markdown content."""
-    group_total = 0
-    for contractor_id, contractor in contractors_data.items():
-        if 'cost' in contractor and contractor['cost']:
-            cost = contractor['cost']
-            md_content.append(f"| {contractor['name']} ({group_name}) | Fixed Cost | {cost:,.2f} |\n")
-            group_total += cost
-        elif 'pay_rate_by_hour' in contractor and contractor['pay_rate_by_hour']:
-            rate = contractor['pay_rate_by_hour']
-            md_content.append(f"| {contractor['name']} ({group_name}) | Hourly Rate | {rate:,.2f} |\n")
-    return group_total, md_content
-
 def create_attachment_placeholders(manager: RenovationManager):
     """Create directories and placeholder files for attachments."""
     rooms = manager.get_nested_value(['rooms'])
@@ -331,135 +592,24 @@ def create_attachment_placeholders(manager: RenovationManager):
                                 with open(filepath, 'w') as f:
                                     f.write(f"Placeholder for {attachment}\n")
 
-def generate_cost_report(manager: RenovationManager, export: bool = False, user_name: str = None) -> str:
-    """Generate a markdown formatted cost report for all rooms and contractors."""
+@tracer.traced()
+def generate_cost_report(manager: RenovationManager, export: bool = False, user_name: str = None,
+                         report_format: str = 'markdown') -> str:
+    """Generate a cost report for all rooms and contractors as markdown, json or csv."""
     try:
-        rooms = manager.get_nested_value(['rooms'])
-        contractors = manager.get_nested_value(['general_considerations', 'contractor_information'])
-        
-        # Initialize the markdown content as a list for better memory management
-        md_content = ["# Renovation Cost Report\n\n"]
-    
-        # Track totals
-        total_costs = {}
-        room_totals = {}
-        contractor_totals = {}
-    
-        # Ensure attachment placeholders are created
-        create_attachment_placeholders(manager)
-        
-        # Process each room
-        md_content.append("## Room Costs\n\n")
-        for room_name, room_data in rooms.items():
-            room_total = 0
-            md_content.append(f"### {room_name.replace('_', ' ').title()}\n\n")
-            md_content.append("| Item | Cost (AED) |\n|------|------------|\n")
-            
-            for section_name, section_data in room_data.items():
-                if isinstance(section_data, dict):
-                    # Add section with cost if available
-                    if 'cost' in section_data:
-                        cost = section_data['cost']
-                        section_title = section_name.replace('_', ' ').title()
-                        
-                        # Add attachments if present
-                        if 'attachments' in section_data:
-                            attachments = [f"[{att}]({room_name}/{att})" for att in section_data['attachments']]
-                            section_title += f" ({', '.join(attachments)})"
-                        
-                        md_content.append(f"| {section_title} | {cost:,.2f} |\n")
-                        room_total += cost
-                        
-                        # Track item totals across rooms
-                        if section_name not in total_costs:
-                            total_costs[section_name] = 0
-                        total_costs[section_name] += cost
-                    
-                    # Handle nested items with costs
-                    for key, value in section_data.items():
-                        if isinstance(value, dict) and 'cost' in value:
-                            cost = value['cost']
-                            if cost > 0:  # Only show items with actual costs
-                                item_title = f"{section_name.replace('_', ' ').title()} - {key.replace('_', ' ').title()}"
-                                
-                                # Add attachments if present
-                                if 'attachments' in value:
-                                    attachments = [f"[{att}]({room_name}/{att})" for att in value['attachments']]
-                                    item_title += f" ({', '.join(attachments)})"
-                                
-                                md_content.append(f"| {item_title} | {cost:,.2f} |\n")
-                                room_total += cost
-                                
-                                # Track item totals
-                                item_key = f"{section_name}_{key}"
-                                if item_key not in total_costs:
-                                    total_costs[item_key] = 0
-                                total_costs[item_key] += cost
-            
-            room_totals[room_name] = room_total
-            md_content.append(f"| **Room Total** | **{room_total:,.2f}** |\n\n")
-        
-        # Process contractor costs
-        md_content.append("## Contractor Costs\n\n")
-        md_content.append("| Contractor | Cost Type | Rate/Cost (AED) |\n|------------|------------|---------------|\n")
-        
-        # Process each contractor group
-        for group_name, group_data in contractors.items():
-            if isinstance(group_data, dict):
-                if group_name == 'general_contractor':
-                    total, md_content = process_contractor_group('General', {'main': group_data}, md_content)
-                    contractor_totals['General Contractor'] = total
-                elif isinstance(group_data, dict):
-                    total, md_content = process_contractor_group(group_name.replace('_', ' ').title(), group_data, md_content)
-                    if total > 0:
-                        contractor_totals[group_name.replace('_', ' ').title()] = total
-        
-        # Add summary sections
-        md_content.append("\n## Summary\n\n")
-        
-        # Room totals
-        md_content.append("### Room Totals\n\n")
-        md_content.append("| Room | Total Cost (AED) |\n|------|----------------|\n")
-        room_grand_total = 0
-        for room_name, total in room_totals.items():
-            md_content.append(f"| {room_name.replace('_', ' ').title()} | {total:,.2f} |\n")
-            room_grand_total += total
-        md_content.append(f"| **Total Room Costs** | **{room_grand_total:,.2f}** |\n\n")
-        
-        # Contractor totals
-        md_content.append("### Contractor Totals (Fixed Costs Only)\n\n")
-        md_content.append("| Contractor Type | Total Cost (AED) |\n|-----------------|----------------|\n")
-        contractor_grand_total = 0
-        for contractor_type, total in contractor_totals.items():
-            md_content.append(f"| {contractor_type} | {total:,.2f} |\n")
-            contractor_grand_total += total
-        md_content.append(f"| **Total Contractor Costs** | **{contractor_grand_total:,.2f}** |\n\n")
-        
-        # Overall total
-        md_content.append("### Project Totals\n\n")
-        md_content.append("| Category | Total Cost (AED) |\n|-----------|----------------|\n")
-        md_content.append(f"| Room Costs | {room_grand_total:,.2f} |\n")
-        md_content.append(f"| Contractor Costs | {contractor_grand_total:,.2f} |\n")
-        md_content.append(f"| **Project Total** | **{(room_grand_total + contractor_grand_total):,.2f}** |\n\n")
-        
-        # Costs by item type
-        md_content.append("### Room Costs by Item Type\n\n")
-        md_content.append("| Item Type | Total Cost (AED) |\n|-----------|----------------|\n")
-        for item_name, total in total_costs.items():
-            md_content.append(f"| {item_name.replace('_', ' ').title()} | {total:,.2f} |\n")
-        
-        # Join all content into a single string
-        final_content = ''.join(md_content)
+        report = manager.cost_report()
+        final_content = RENDERERS[report_format](report)
         
         if export:
             current_date = datetime.now().strftime("%Y.%m.%d")
-            filename = f"room_cost_report_{current_date}.md"
+            filename = f"room_cost_report_{current_date}.{EXTENSIONS[report_format]}"
+            
+            # Exported reports link to attachment files, so make sure they exist
+            create_attachment_placeholders(manager)
             
             # Add user name to report if provided
-            if user_name:
-                md_content.insert(1, f"Generated by: {user_name}\n\n")
-                md_content.insert(2, f"Date: {current_date}\n\n")
-                final_content = ''.join(md_content)
+            if user_name and report_format == 'markdown':
+                final_content = render_markdown(report, user_name=user_name, date=current_date)
             
             with open(filename, 'w') as f:
                 f.write(final_content)
@@ -508,9 +658,68 @@ def main():
     parser.add_argument('--contractors', action='store_true', help='View contractor information')
     parser.add_argument('--timeline', action='store_true', help='View timeline information')
     parser.add_argument('--management', action='store_true', help='View building management information')
+    parser.add_argument('--journal', action='store_true', help='Append edits to a journal instead of rewriting the file')
+    parser.add_argument('--query', type=str, help='Print values matching a path pattern, e.g. rooms.*.budget.amount')
+    parser.add_argument('--report', choices=sorted(RENDERERS), help='Print the cost report in the given format')
+    parser.add_argument('--export', action='store_true', help='With --report, also write the report to a file')
+    parser.add_argument('--apply', type=str, metavar='EDITS_JSON',
+                        help='Apply a JSON list of {"path", "value"} / {"op": "delete", "path"} edits in one commit')
+    parser.add_argument('--totals', action='store_true', help='Print running cost totals')
+    parser.add_argument('--verify-totals', action='store_true',
+                        help='Check running cost totals against a full recompute')
+    parser.add_argument('--diff', nargs=2, metavar=('FROM', 'TO'),
+                        help='Show changes between two versions (names in versions/ or JSON file paths)')
+    parser.add_argument('--shard', action='store_true',
+                        help='Split new_source.json into one file per room and section plus a manifest')
+    parser.add_argument('--unshard', action='store_true', help='Merge a sharded document back into one file')
+    parser.add_argument('--retention', default=DEFAULT_POLICY,
+                        help="Which timestamped backups to keep, e.g. 'last=20,hourly=24,daily=30,max_mb=512', or 'off'")
+    parser.add_argument('--log-profile', choices=sorted(PROFILES),
+                        help='Logging levels and rotation (default from RENOVATION_LOG_PROFILE, at INFO level)')
+    parser.add_argument('--trace', metavar='TRACE_JSON',
+                        help='Write timing spans to a Chrome trace file (chrome://tracing or Perfetto)')
+    parser.add_argument('--trace-sample', type=float, default=1.0, help='Fraction of runs to trace')
     args = parser.parse_args()
+    if args.log_profile:
+        configure_logging('renovation_manager.log', args.log_profile, console=False)
+    if args.trace:
+        tracer.configure(args.trace, args.trace_sample)
+    with tracer.request('main', argv=' '.join(sys.argv[1:])):
+        run_command(args)
+
+def run_command(args: argparse.Namespace):
+    """Carry out the command line options, or run the interactive session."""
+    if args.shard or args.unshard:
+        shards = ShardedDocument('new_source.json')
+        if args.shard and shards.exists():
+            print("new_source.json is already sharded")
+        elif args.shard:
+            with open('new_source.json', 'r') as f:
+                written = shards.create(json.load(f))
+            print(f"Wrote {len(written)} shards and {shards.manifest_file}")
+        elif not shards.exists():
+            print("new_source.json is not sharded")
+        else:
+            shards.unshard()
+            print("Merged the shards back into new_source.json")
+        return
 
-    manager = RenovationManager('new_source.json')
+    if args.diff:
+        # Diffs read stored versions directly and never need the working document
+        store = VersionStore('versions') if os.path.isdir('versions') else None
+        try:
+            old, new = (load_node(store, name) for name in args.diff)
+            print(render_diff(TreeDiffer(store).diff(old, new)))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error: {e}")
+        return
+
+    # One-shot commands do a handful of lookups; only the interactive session pays off an index
+    one_shot = any([args.contractors, args.timeline, args.management, args.room, args.test, args.query,
+                    args.report, args.totals, args.verify_totals, args.apply])
+    manager = RenovationManager('new_source.json', journal=args.journal, indexed=not one_shot,
+                                retention=args.retention, lazy=one_shot)
+    atexit.register(manager.close)
 
     # Handle command line options
     if args.contractors:
@@ -540,6 +749,36 @@ def main():
     elif args.test:
         run_test_script(manager, args.test)
         return
+    elif args.apply:
+        try:
+            with open(args.apply, 'r') as f:
+                edits = json.load(f)
+            manager.apply_edits(edits)
+            print(f"Applied {len(edits)} edits")
+        except (OSError, json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Error: {e}")
+        return
+    elif args.totals:
+        print(json.dumps(manager.get_totals(), indent=2))
+        return
+    elif args.verify_totals:
+        problems = manager.verify_totals()
+        print("Running totals match a full recompute" if not problems else "\n".join(problems))
+        return
+    elif args.report:
+        print(generate_cost_report(manager, export=args.export, report_format=args.report))
+        return
+    elif args.query:
+        matches = manager.query(args.query)
+        if not matches:
+            print(f"No values match {args.query}")
+        for path, value in matches:
+            if isinstance(value, (dict, list)):
+                print(f"{path}:")
+                print(manager.format_value(value, 1))
+            else:
+                print(f"{path}: {value}")
+        return
 
     # Interactive mode
     while True:
@@ -0,0 +1,185 @@
+"""Streaming multipart/form-data parser for the /upload endpoint.
+
+The request body is read in fixed-size chunks. File parts are written straight to
+temporary files (hashed as they stream) and ordinary fields are kept in memory up
+to a small limit, so memory use stays constant regardless of upload size. Parts
+may arrive in any order and a request may carry several files.
+"""
+import hashlib
+import os
+import tempfile
+from email.message import Message
+from email.parser import BytesHeaderParser
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+
+
+class MultipartError(ValueError):
+    """Raised for malformed or oversized multipart bodies; carries the HTTP status to send."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class UploadedFile:
+    """A file part that has been streamed to a temporary file."""
+    def __init__(self, field_name, filename, content_type, temp_path):
+        self.field_name = field_name
+        self.filename = filename
+        self.content_type = content_type
+        self.temp_path = temp_path
+        self.size = 0
+        self.sha256 = None
+
+    def discard(self):
+        """Remove the temporary file if it has not been moved into place."""
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+def get_boundary(content_type):
+    """Extract the boundary parameter from a multipart Content-Type header."""
+    msg = Message()
+    msg['content-type'] = content_type or ''
+    if msg.get_content_type() != 'multipart/form-data':
+        raise MultipartError("Expected multipart/form-data")
+    boundary = msg.get_param('boundary')
+    if not boundary:
+        raise MultipartError("Missing multipart boundary")
+    return boundary.encode('latin-1')
+
+
+class _BodyReader:
+    """Reads at most content_length bytes from rfile in bounded chunks."""
+    def __init__(self, rfile, content_length, chunk_size):
+        self.rfile = rfile
+        self.remaining = content_length
+        self.chunk_size = chunk_size
+
+    def read(self):
+        if self.remaining <= 0:
+            return b''
+        chunk = self.rfile.read(min(self.chunk_size, self.remaining))
+        if not chunk:
+            raise MultipartError("Request body ended early")
+        self.remaining -= len(chunk)
+        return chunk
+
+
+def parse_multipart_stream(rfile, content_type, content_length, temp_dir,
+                           max_total_size, max_file_size, max_field_size=64 * 1024,
+                           max_parts=32, chunk_size=CHUNK_SIZE):
+    """Parse a multipart body from rfile.
+
+    Returns (fields, files): a dict of field name to string value, and a list of
+    UploadedFile objects whose data sits in temporary files under temp_dir. On
+    error every temporary file created so far is removed before MultipartError
+    is raised.
+    """
+    if content_length is None:
+        raise MultipartError("Content-Length required", status=411)
+    if content_length > max_total_size:
+        raise MultipartError(f"Upload exceeds {max_total_size} bytes", status=413)
+
+    boundary = get_boundary(content_type)
+    # Prefixing CRLF lets the first boundary be matched by the same delimiter as the rest
+    delimiter = b'\r\n--' + boundary
+    reader = _BodyReader(rfile, content_length, chunk_size)
+    buffer = bytearray(b'\r\n')
+    fields = {}
+    files = []
+    os.makedirs(temp_dir, exist_ok=True)
+
+    def fill():
+        chunk = reader.read()
+        if not chunk:
+            raise MultipartError("Unexpected end of multipart body")
+        buffer.extend(chunk)
+
+    try:
+        # Skip any preamble up to the first boundary
+        while True:
+            index = buffer.find(delimiter)
+            if index >= 0:
+                del buffer[:index + len(delimiter)]
+                break
+            del buffer[:max(0, len(buffer) - len(delimiter))]
+            fill()
+
+        while True:
+            while len(buffer) < 2:
+                fill()
+            if buffer[:2] == b'--':
+                # Closing boundary; discard any epilogue so the connection is left clean
+                while reader.read():
+                    pass
+                break
+            header_end = buffer.find(b'\r\n\r\n')
+            while header_end < 0:
+                if len(buffer) > MAX_HEADER_SIZE:
+                    raise MultipartError("Multipart part headers too large")
+                fill()
+                header_end = buffer.find(b'\r\n\r\n')
+            # Drop the CRLF that ends the boundary line, then parse the part headers
+            headers = BytesHeaderParser().parsebytes(bytes(buffer[2:header_end]))
+            del buffer[:header_end + 4]
+
+            if len(fields) + len(files) >= max_parts:
+                raise MultipartError(f"Too many parts (limit {max_parts})", status=413)
+            name = headers.get_param('name', header='content-disposition')
+            if not name:
+                raise MultipartError("Multipart part without a field name")
+            filename = headers.get_filename()
+
+            if filename is not None:
+                handle = tempfile.NamedTemporaryFile(dir=temp_dir, prefix='upload_', suffix='.part', delete=False)
+                upload = UploadedFile(name, os.path.basename(filename), headers.get_content_type(), handle.name)
+                files.append(upload)
+                digest = hashlib.sha256()
+                with handle:
+                    def sink(data):
+                        upload.size += len(data)
+                        if upload.size > max_file_size:
+                            raise MultipartError(f"File {upload.filename} exceeds {max_file_size} bytes", status=413)
+                        digest.update(data)
+                        handle.write(data)
+                    _stream_part(buffer, delimiter, fill, sink)
+                upload.sha256 = digest.hexdigest()
+            else:
+                value = bytearray()
+                def sink(data):
+                    value.extend(data)
+                    if len(value) > max_field_size:
+                        raise MultipartError(f"Field {name} exceeds {max_field_size} bytes", status=413)
+                _stream_part(buffer, delimiter, fill, sink)
+                charset = headers.get_content_charset() or 'utf-8'
+                try:
+                    fields[name] = value.decode(charset)
+                except (UnicodeDecodeError, LookupError):
+                    raise MultipartError(f"Field {name} is not valid {charset} text")
+    except Exception:
+        for upload in files:
+            upload.discard()
+        raise
+
+    return fields, files
+
+
+def _stream_part(buffer, delimiter, fill, sink):
+    """Feed part data to sink until the next delimiter, which is consumed."""
+    while True:
+        index = buffer.find(delimiter)
+        if index >= 0:
+            if index:
+                sink(bytes(buffer[:index]))
+            del buffer[:index + len(delimiter)]
+            return
+        # Hold back enough bytes to catch a delimiter split across chunks
+        safe = len(buffer) - len(delimiter) + 1
+        if safe > 0:
+            sink(bytes(buffer[:safe]))
+            del buffer[:safe]
+        fill()
@@ -0,0 +1,177 @@
+"""Retention policy and background pruning for versions and backups.
+
+A policy keeps the newest ``last`` items, plus the newest item in each of the
+latest ``hourly`` hours and ``daily`` days, and can cap the total size. Everything
+else may be deleted. Policies are written as comma-separated settings:
+
+    last=20,hourly=24,daily=30,max_mb=512
+
+and ``off`` disables pruning.
+"""
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMATS = ('%Y-%m-%d_%H-%M-%S', '%Y%m%d_%H%M%S')
+DEFAULT_POLICY = 'last=20,hourly=24,daily=30'
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse the timestamp formats used in version and backup names."""
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value or '', fmt)
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass
+class RetentionPolicy:
+    last: int = 20
+    hourly: int = 24
+    daily: int = 30
+    max_bytes: Optional[int] = None
+    enabled: bool = True
+
+    @classmethod
+    def parse(cls, spec: str) -> 'RetentionPolicy':
+        """Build a policy from 'last=N,hourly=N,daily=N,max_mb=N' or 'off'."""
+        if spec.strip().lower() in ('off', 'none', ''):
+            return cls(enabled=False)
+        policy = cls()
+        for part in spec.split(','):
+            name, sep, value = part.partition('=')
+            name = name.strip()
+            if not sep:
+                raise ValueError(f"Expected name=value in retention policy, got {part!r}")
+            if name == 'max_mb':
+                policy.max_bytes = int(float(value) * 1024 * 1024)
+            elif name in ('last', 'hourly', 'daily'):
+                setattr(policy, name, int(value))
+            else:
+                raise ValueError(f"Unknown retention setting: {name}")
+        # The newest item is always kept so there is something to recover from
+        policy.last = max(1, policy.last)
+        return policy
+
+    def select(self, items: List[Tuple[str, Optional[datetime], int]]) -> Set[str]:
+        """Return the names to keep from (name, timestamp, size) items ordered oldest first."""
+        if not self.enabled:
+            return {name for name, _, _ in items}
+        newest_first = list(reversed(items))
+        keep = [name for name, _, _ in newest_first[:self.last]]
+        for bucket_format, count in (('%Y%m%d%H', self.hourly), ('%Y%m%d', self.daily)):
+            seen = set()
+            for name, timestamp, _ in newest_first:
+                if len(seen) >= count:
+                    break
+                if timestamp is None:
+                    continue
+                bucket = timestamp.strftime(bucket_format)
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.append(name)
+        keep = set(keep)
+
+        if self.max_bytes is not None:
+            total = sum(size for name, _, size in items if name in keep)
+            # Drop the oldest survivors until under the cap, never the newest item
+            for name, _, size in items[:-1]:
+                if total <= self.max_bytes:
+                    break
+                if name in keep:
+                    keep.discard(name)
+                    total -= size
+        return keep
+
+
+def prune_files(directory: str, pattern: re.Pattern, policy: RetentionPolicy) -> List[str]:
+    """Delete timestamped backup files matching pattern that the policy does not keep.
+
+    pattern must have a 'timestamp' group. Returns the names of removed files.
+    """
+    if not policy.enabled or not os.path.isdir(directory):
+        return []
+    items = []
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if not match:
+            continue
+        timestamp = parse_timestamp(match.group('timestamp'))
+        try:
+            size = os.path.getsize(os.path.join(directory, name))
+        except OSError:
+            continue
+        items.append((name, timestamp, size))
+    items.sort(key=lambda item: (item[1] or datetime.min, item[0]))
+    keep = policy.select(items)
+    removed = []
+    for name, _, _ in items:
+        if name in keep:
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+            removed.append(name)
+        except OSError as e:
+            logger.warning(f"Could not remove {name}: {str(e)}")
+    if removed:
+        logger.info(f"Pruned {len(removed)} backups from {directory or '.'}")
+    return removed
+
+
+def backup_pattern(prefix: str, suffix: str) -> re.Pattern:
+    """Pattern for '<prefix><timestamp><suffix>' backup names."""
+    return re.compile(re.escape(prefix) + r'(?P<timestamp>\d{8}_\d{6})' + re.escape(suffix))
+
+
+class BackgroundPruner:
+    """Runs pruning tasks on a daemon thread, periodically and whenever request() is called."""
+    def __init__(self, tasks: Iterable[Callable[[], object]], interval: float = 300.0):
+        self.tasks = list(tasks)
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._pending = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='retention-pruner', daemon=True)
+
+    def start(self) -> 'BackgroundPruner':
+        self._thread.start()
+        return self
+
+    def request(self):
+        """Ask for a pruning pass soon; requests made while one is pending are merged."""
+        self._pending = True
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """Stop the thread, finishing a requested pass first."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def run_once(self):
+        for task in self.tasks:
+            try:
+                task()
+            except Exception as e:
+                logger.error(f"Retention pruning failed: {str(e)}", exc_info=True)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped and not self._pending:
+                break
+            self._pending = False
+            self.run_once()
+            # A pass requested while this one ran still goes ahead before stopping
+            if self._stopped and not self._pending:
+                break
@@ -0,0 +1,299 @@
+"""Per-room sharded storage for a renovation document.
+
+Instead of one large JSON file, a sharded document keeps each room in its own
+file inside the room's directory and each ``general_considerations`` section in
+its own file, with a small manifest tying them together:
+
+    converted_source.manifest.json                          top-level fields, shard list and hashes
+    kitchen/converted_source.json                           rooms.kitchen
+    general_considerations/timeline/converted_source.json   general_considerations.timeline
+
+Shard files are named after the document, so the CLI's new_source.json and the
+server's converted_source.json can both be sharded into the same room
+directories. Saving rewrites only the shards whose content changed, then the
+manifest. When the caller lists the paths it edited, only those shards are
+compared, and only they and the edited top-level fields are merged into the
+manifest as it is at that moment, so concurrent saves keep each other's
+changes. Each shard and the manifest are replaced atomically; the manifest
+records every shard's hash so a save interrupted between the two is noticed
+on the next load. Rooms whose names cannot be used as directory names stay
+inline in the manifest.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from atomic_io import atomic_write_bytes, atomic_write_json
+from json_paths import get_value
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+SHARDED_KEYS = ('rooms', 'general_considerations')
+SECTIONS_DIR = 'general_considerations'
+# Top-level directories that belong to the application rather than to rooms
+RESERVED_NAMES = {'uploads', 'versions', 'benchmarks', SECTIONS_DIR, '__pycache__'}
+
+ShardKey = Tuple[str, str]
+
+
+def shard_key(path: Sequence[Any]) -> Optional[ShardKey]:
+    """Shard holding path, or None if the path is above shard level."""
+    if len(path) >= 2 and path[0] in SHARDED_KEYS:
+        return str(path[0]), str(path[1])
+    return None
+
+
+def touched_scope(touched: Optional[Iterable[Sequence[Any]]]) -> Optional[Tuple[set, set]]:
+    """Shards and top-level fields that edits at the touched paths can change, or None for everything."""
+    if touched is None:
+        return None
+    keys, fields = set(), set()
+    for path in touched:
+        key = shard_key(path)
+        if key is not None:
+            keys.add(key)
+        elif path and path[0] not in SHARDED_KEYS:
+            fields.add(str(path[0]))
+        else:
+            return None
+    return keys, fields
+
+
+def encode_shard(value: Any) -> bytes:
+    return json.dumps(value, indent=2).encode('utf-8')
+
+
+class ShardedDocument:
+    """A document stored as a manifest plus one file per room and section."""
+    def __init__(self, json_file: str):
+        self.json_file = json_file
+        self.base_dir = os.path.dirname(json_file)
+        self.stem = os.path.splitext(os.path.basename(json_file))[0]
+        self.manifest_file = os.path.join(self.base_dir, f"{self.stem}.manifest.json")
+        # Held only while the manifest is merged and written, not while shards are written
+        self._lock = threading.Lock()
+        self.manifest_hash = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_file)
+
+    def shard_path(self, key: ShardKey) -> Optional[str]:
+        """Relative file for a shard, or None if the name cannot be a directory."""
+        kind, name = key
+        if not name or name.startswith('.') or '/' in name or '\\' in name or name != name.strip():
+            return None
+        if kind == 'rooms':
+            if name in RESERVED_NAMES:
+                return None
+            return os.path.join(name, f"{self.stem}.json")
+        return os.path.join(SECTIONS_DIR, name, f"{self.stem}.json")
+
+    # Reading
+
+    def read_manifest(self) -> Dict[str, Any]:
+        with open(self.manifest_file, 'rb') as f:
+            content = f.read()
+        self.manifest_hash = hashlib.sha256(content).hexdigest()
+        return json.loads(content)
+
+    def _read_shard(self, entry: Dict[str, Any]) -> Any:
+        if 'inline' in entry:
+            return entry['inline']
+        with open(os.path.join(self.base_dir, entry['file']), 'rb') as f:
+            content = f.read()
+        if hashlib.sha256(content).hexdigest() != entry['sha256']:
+            # Each shard is written atomically, so this is a whole newer shard from an interrupted save
+            logger.warning(f"Shard {entry['file']} does not match the manifest; using the file as found")
+        return json.loads(content)
+
+    def load(self) -> Dict[str, Any]:
+        """Assemble the whole document."""
+        manifest = self.read_manifest()
+        data = {}
+        for key in manifest['order']:
+            if key in SHARDED_KEYS and key in manifest['shards']:
+                data[key] = {name: self._read_shard(entry) for name, entry in manifest['shards'][key].items()}
+            else:
+                data[key] = manifest['fields'][key]
+        return data
+
+    def get(self, path: Sequence[str]) -> Any:
+        """Value at path, reading only the shard that holds it."""
+        path = tuple(path)
+        manifest = self.read_manifest()
+        if not path:
+            return self.load()
+        if path[0] in manifest['shards']:
+            shards = manifest['shards'][path[0]]
+            if len(path) == 1:
+                return {name: self._read_shard(entry) for name, entry in shards.items()}
+            if path[1] not in shards:
+                raise KeyError(f"Key '{path[1]}' not found")
+            return get_value(self._read_shard(shards[path[1]]), path[2:])
+        if path[0] not in manifest['fields']:
+            raise KeyError(f"Key '{path[0]}' not found")
+        return get_value(manifest['fields'][path[0]], path[1:])
+
+    def directories(self) -> List[str]:
+        """Directories holding this document's shards."""
+        if not self.exists():
+            return []
+        manifest = self.read_manifest()
+        return sorted({os.path.join(self.base_dir, os.path.dirname(relative)) for relative in self._files(manifest)})
+
+    # Writing
+
+    def save(self, data: Dict[str, Any], touched: Optional[Iterable[Sequence[Any]]] = None,
+             backup_timestamp: Optional[str] = None) -> List[str]:
+        """Write the shards of data that changed, then the manifest; return the shard files written.
+
+        touched lists the paths edited since the last save. When it is given, only
+        the shards under those paths are compared with what is on disk; otherwise
+        every shard is. With backup_timestamp, each replaced shard is first kept as
+        <stem>_<timestamp>.json in its directory.
+        """
+        manifest = self.read_manifest() if self.exists() else None
+        scope = touched_scope(touched) if manifest is not None else None
+        candidates = self._candidates(data, scope)
+
+        # Shards are written outside the lock, so saves touching different rooms overlap
+        updates: Dict[ShardKey, Dict[str, Any]] = {}
+        written = []
+        for key in candidates:
+            value = data[key[0]][key[1]]
+            relative = self.shard_path(key)
+            if relative is None:
+                updates[key] = {'inline': value}
+                continue
+            content = encode_shard(value)
+            digest = hashlib.sha256(content).hexdigest()
+            current = manifest['shards'].get(key[0], {}).get(key[1]) if manifest else None
+            if current is not None and current.get('sha256') == digest:
+                continue
+            target = os.path.join(self.base_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if backup_timestamp and os.path.exists(target):
+                self._backup(target, backup_timestamp)
+            atomic_write_bytes(target, content)
+            written.append(relative)
+            updates[key] = {'file': relative.replace(os.sep, '/'), 'sha256': digest, 'size': len(content)}
+
+        with self._lock:
+            # Merge into the manifest as it is now, which may include another writer's shards
+            manifest = self.read_manifest() if self.exists() else None
+            if scope is None or manifest is None:
+                new_manifest = self._build_manifest(data, manifest, updates)
+            else:
+                new_manifest = self._merge_manifest(data, manifest, updates, scope)
+            content = json.dumps(new_manifest, indent=2).encode('utf-8')
+            atomic_write_bytes(self.manifest_file, content)
+            self.manifest_hash = hashlib.sha256(content).hexdigest()
+            # Rooms and sections that were deleted leave files nothing refers to any more
+            for relative in self._files(manifest) - self._files(new_manifest):
+                try:
+                    os.remove(os.path.join(self.base_dir, relative))
+                except FileNotFoundError:
+                    pass
+        if written:
+            logger.info(f"Wrote {len(written)} shards of {self.json_file}")
+        return written
+
+    @staticmethod
+    def _candidates(data: Dict[str, Any], scope: Optional[Tuple[set, set]]) -> List[ShardKey]:
+        everything = [(key, name) for key in SHARDED_KEYS if isinstance(data.get(key), dict)
+                      for name in data[key]]
+        if scope is None:
+            return everything
+        return [key for key in everything if key in scope[0]]
+
+    def _build_manifest(self, data: Dict[str, Any], manifest: Optional[Dict[str, Any]],
+                        updates: Dict[ShardKey, Dict[str, Any]]) -> Dict[str, Any]:
+        old_shards = manifest['shards'] if manifest else {}
+        shards, fields = {}, {}
+        for key, value in data.items():
+            if key in SHARDED_KEYS and isinstance(value, dict):
+                shards[key] = {name: updates.get((key, name)) or old_shards.get(key, {}).get(name)
+                               for name in value}
+                missing = [name for name, entry in shards[key].items() if entry is None]
+                if missing:
+                    raise ValueError(f"No shard written for {key}: {', '.join(missing)}")
+            else:
+                fields[key] = value
+        return {'format': MANIFEST_FORMAT, 'order': list(data), 'fields': fields, 'shards': shards}
+
+    @staticmethod
+    def _merge_manifest(data: Dict[str, Any], manifest: Dict[str, Any], updates: Dict[ShardKey, Dict[str, Any]],
+                        scope: Tuple[set, set]) -> Dict[str, Any]:
+        """The current manifest with only the touched shards and fields taken from data."""
+        keys, fields = scope
+        order = list(manifest['order'])
+        merged_fields = dict(manifest['fields'])
+        shards = {kind: dict(entries) for kind, entries in manifest['shards'].items()}
+        for field in fields:
+            if field in data:
+                merged_fields[field] = data[field]
+                if field not in order:
+                    order.append(field)
+            elif field in order:
+                merged_fields.pop(field, None)
+                order.remove(field)
+        for kind, name in keys:
+            if isinstance(data.get(kind), dict) and name in data[kind]:
+                entry = updates.get((kind, name)) or shards.get(kind, {}).get(name)
+                if entry is None:
+                    raise ValueError(f"No shard written for {kind}: {name}")
+                shards.setdefault(kind, {})[name] = entry
+                if kind not in order:
+                    order.append(kind)
+            else:
+                shards.get(kind, {}).pop(name, None)
+        return {'format': MANIFEST_FORMAT, 'order': order, 'fields': merged_fields, 'shards': shards}
+
+    @staticmethod
+    def _files(manifest: Optional[Dict[str, Any]]) -> set:
+        if not manifest:
+            return set()
+        return {entry['file'] for shards in manifest['shards'].values() for entry in shards.values()
+                if 'file' in entry}
+
+    def _backup(self, target: str, timestamp: str):
+        """Keep the current shard under a timestamped name, by hard link where possible."""
+        backup = os.path.join(os.path.dirname(target), f"{self.stem}_{timestamp}.json")
+        try:
+            if os.path.exists(backup):
+                os.remove(backup)
+            os.link(target, backup)
+        except OSError:
+            shutil.copy2(target, backup)
+
+    # Converting
+
+    def create(self, data: Dict[str, Any]) -> List[str]:
+        """Write data as a new sharded document and set the single file aside as a backup."""
+        written = self.save(data)
+        if os.path.exists(self.json_file):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup = os.path.join(self.base_dir, f"{self.stem}_{timestamp}.json")
+            os.replace(self.json_file, backup)
+            logger.info(f"Sharded {self.json_file}; the single file was kept as {backup}")
+        return written
+
+    def unshard(self) -> Dict[str, Any]:
+        """Write the document back to its single file and remove the shards and manifest."""
+        manifest = self.read_manifest()
+        data = self.load()
+        atomic_write_json(self.json_file, data)
+        os.remove(self.manifest_file)
+        for relative in self._files(manifest):
+            try:
+                os.remove(os.path.join(self.base_dir, relative))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Merged the shards of {self.json_file} back into one file")
+        return data
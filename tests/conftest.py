@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.generator import generate_document
+
+
+@pytest.fixture
+def document():
+    """A small seeded document shaped like schema.json."""
+    return generate_document(3, seed=1, projects_per_room=2, contractors_per_group=2)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test inside an empty directory; backups and logs land there."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def source_file(workdir, document):
+    path = workdir / 'new_source.json'
+    path.write_text(json.dumps(document, indent=2))
+    return str(path)
+
+
+@pytest.fixture
+def main_module(workdir):
+    """main configures its log file in the working directory on import, so import it here."""
+    import main
+    return main
+
+
+@pytest.fixture
+def server_module(workdir):
+    """The server sets up its log files and version store relative to the working directory."""
+    import building_management_server
+    return building_management_server
+
+
+@pytest.fixture
+def server_factory(server_module, workdir, document):
+    """Start in-process servers on free ports; returns (server, port) and shuts them down afterwards."""
+    import threading
+
+    (workdir / 'converted_source.json').write_text(json.dumps(document, indent=2))
+    server_module.document_cache.invalidate('converted_source.json')
+    started = []
+
+    def start(threads=4):
+        server = server_module.create_server(('127.0.0.1', 0), threads=threads)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        started.append((server, thread))
+        return server, server.server_address[1]
+
+    yield start
+    for server, thread in started:
+        server.shutdown()
+        server.server_close()
+        thread.join()
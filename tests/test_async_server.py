@@ -0,0 +1,65 @@
+import asyncio
+import http.client
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def async_server(server_module, server_factory, workdir):
+    import async_server as module
+
+    server = module.AsyncBuildingServer('127.0.0.1', 0, 2)
+    handled = []
+    run_handler = server.run_handler
+
+    def recording_run_handler(request_stream, client_address):
+        handled.append(request_stream.readline())
+        request_stream.seek(0)
+        return run_handler(request_stream, client_address)
+
+    server.run_handler = recording_run_handler
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield server.port, handled
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.server.close()
+    loop.run_until_complete(server.server.wait_closed())
+    loop.close()
+    server.executor.shutdown(wait=True)
+
+
+def request(port, method, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_static_files_are_streamed_from_the_loop(async_server, workdir):
+    port, handled = async_server
+    content = os.urandom(3 * 1024 * 1024 + 17)
+    (workdir / 'attachment.bin').write_bytes(content)
+
+    status, headers, body = request(port, 'GET', '/attachment.bin')
+    assert status == 200 and body == content
+    status, headers, body = request(port, 'GET', '/attachment.bin', {'Range': 'bytes=10-19'})
+    assert status == 206 and body == content[10:20]
+    status, headers, body = request(port, 'HEAD', '/attachment.bin')
+    assert status == 200 and body == b'' and int(headers['Content-Length']) == len(content)
+    assert handled == []
+
+
+def test_routes_and_missing_files_still_reach_the_handler(async_server, workdir):
+    port, handled = async_server
+    assert request(port, 'GET', '/totals')[0] == 200
+    assert request(port, 'GET', '/../../etc/passwd')[0] == 404
+    assert request(port, 'GET', '/missing.txt')[0] == 404
+    assert len(handled) == 3
@@ -0,0 +1,55 @@
+import json
+import os
+import stat
+
+import pytest
+
+import atomic_io
+from atomic_io import atomic_write_bytes, atomic_write_json
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith('.tmp')]
+
+
+def test_write_replaces_the_target(tmp_path):
+    target = tmp_path / 'doc.json'
+    target.write_bytes(b'old')
+    os.chmod(target, 0o600)
+    atomic_write_bytes(str(target), b'new')
+    assert target.read_bytes() == b'new'
+    # The replaced file keeps its permissions rather than mkstemp's
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o600
+    assert leftovers(tmp_path) == []
+
+
+def test_new_file_gets_the_usual_permissions(tmp_path):
+    target = tmp_path / 'new.json'
+    atomic_write_json(str(target), {'a': [1, 2]}, sync=False)
+    assert json.loads(target.read_text()) == {'a': [1, 2]}
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o644
+    assert leftovers(tmp_path) == []
+
+
+@pytest.mark.parametrize('failing', ['fsync', 'replace'])
+def test_failure_before_the_rename_leaves_the_target_alone(tmp_path, monkeypatch, failing):
+    target = tmp_path / 'doc.json'
+    target.write_bytes(b'old')
+
+    def fail(*args):
+        raise OSError("disk full")
+    monkeypatch.setattr(atomic_io.os, failing, fail)
+    with pytest.raises(OSError, match='disk full'):
+        atomic_write_bytes(str(target), b'new')
+    monkeypatch.undo()
+    assert target.read_bytes() == b'old'
+    assert leftovers(tmp_path) == []
+
+
+def test_unserializable_data_writes_nothing(tmp_path):
+    target = tmp_path / 'doc.json'
+    target.write_bytes(b'old')
+    with pytest.raises(TypeError):
+        atomic_write_json(str(target), {'bad': object()})
+    assert target.read_bytes() == b'old'
+    assert leftovers(tmp_path) == []
@@ -0,0 +1,88 @@
+import copy
+import json
+import os
+
+import pytest
+
+BUDGET = ['rooms', 'kitchen_0', 'budget', 'amount']
+
+
+def journal_lines(source_file):
+    with open(f"{source_file}.journal") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def backups(source_file):
+    directory = os.path.dirname(source_file)
+    return sorted(name for name in os.listdir(directory) if name.startswith('new_source_'))
+
+
+def test_failed_edit_rolls_back_document_totals_and_journal(main_module, source_file, document):
+    manager = main_module.RenovationManager(source_file, journal=True)
+    totals = manager.get_totals()
+    journal = journal_lines(source_file)
+
+    with pytest.raises(KeyError):
+        with manager.batch():
+            manager.set_nested_value(BUDGET, 1.0)
+            manager.delete_nested_value(['rooms', 'bathroom_1'])
+            manager.delete_nested_value(['rooms', 'missing', 'budget'])
+    assert manager.data == document
+    assert manager.get_totals() == totals
+    assert manager.verify_totals() == []
+    assert journal_lines(source_file) == journal
+    manager.close()
+    assert main_module.RenovationManager(source_file).data == document
+
+
+def test_failed_batch_writes_nothing_without_a_journal(main_module, source_file, document):
+    with open(source_file, 'rb') as f:
+        content = f.read()
+    manager = main_module.RenovationManager(source_file)
+    with pytest.raises(KeyError):
+        manager.apply_edits([
+            {'path': BUDGET, 'value': 1.0},
+            {'op': 'delete', 'path': 'rooms.missing'},
+        ])
+    assert manager.data == document
+    with open(source_file, 'rb') as f:
+        assert f.read() == content
+    assert backups(source_file) == []
+
+
+def test_edits_that_fail_validation_are_rolled_back(main_module, source_file, document):
+    manager = main_module.RenovationManager(source_file)
+    with pytest.raises(ValueError, match='Batch rejected'):
+        manager.apply_edits([{'path': BUDGET, 'value': 1.0},
+                             {'path': 'rooms.kitchen_0.lighting.extra', 'value': {'cost': 'a lot'}}])
+    assert manager.data == document
+
+
+def test_batch_is_one_journal_record(main_module, source_file, document):
+    manager = main_module.RenovationManager(source_file, journal=True)
+    with manager.batch():
+        manager.set_nested_value(BUDGET, 1.0)
+        with manager.batch():
+            manager.set_nested_value(['rooms', 'kitchen_0', 'priority'], 'low')
+        manager.delete_nested_value(['rooms', 'bedroom_2'])
+    records = journal_lines(source_file)[1:]
+    assert len(records) == 1 and records[0]['op'] == 'batch'
+    assert [(r['op'], r['path']) for r in records[0]['records']] == [
+        ('set', BUDGET), ('set', ['rooms', 'kitchen_0', 'priority']), ('delete', ['rooms', 'bedroom_2'])]
+    manager.close()
+
+    expected = copy.deepcopy(document)
+    expected['rooms']['kitchen_0']['budget']['amount'] = 1.0
+    expected['rooms']['kitchen_0']['priority'] = 'low'
+    del expected['rooms']['bedroom_2']
+    assert main_module.RenovationManager(source_file).data == expected
+
+
+def test_batch_without_a_journal_saves_once(main_module, source_file):
+    manager = main_module.RenovationManager(source_file)
+    with manager.batch():
+        manager.set_nested_value(BUDGET, 1.0)
+        manager.set_nested_value(['rooms', 'kitchen_0', 'priority'], 'low')
+    assert len(backups(source_file)) == 1
+    with open(source_file) as f:
+        assert json.load(f)['rooms']['kitchen_0']['budget']['amount'] == 1.0
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from benchmarks.history import (T_TABLE, classify, compare_runs, compare_samples, record_run, resolve_run,
+                                t_quantile)
+
+
+def run(means, commit='abc1234', noise=0.01):
+    results = []
+    for (name, rooms), mean in means.items():
+        samples = [mean * (1 - noise), mean, mean * (1 + noise)]
+        results.append({'name': name, 'rooms': rooms, 'samples': samples, 'mean': mean})
+    return {'commit': commit, 'results': results}
+
+
+def test_t_quantile_matches_tables():
+    assert t_quantile(0.975, float('inf')) == pytest.approx(1.960, abs=1e-3)
+    # Low df, where few repeats put most comparisons, comes from the exact table
+    assert t_quantile(0.975, 1) == pytest.approx(12.706, abs=1e-3)
+    assert t_quantile(0.975, 2) == pytest.approx(4.303, abs=1e-3)
+    assert t_quantile(0.995, 3) == pytest.approx(5.841, abs=1e-3)
+    assert t_quantile(0.025, 4) == pytest.approx(-2.776, abs=1e-3)
+    assert t_quantile(0.975, 10) == pytest.approx(2.228, abs=1e-3)
+    # Fractional Welch df falls between its neighbours
+    assert 2.2281 < t_quantile(0.975, 9.5) < 2.2622
+    # Past the table the expansion takes over without a jump
+    assert t_quantile(0.975, 31) == pytest.approx(2.040, abs=1e-3)
+    assert t_quantile(0.975, 30) == pytest.approx(t_quantile(0.975, 30.0001), abs=1e-3)
+    assert all(len(column) == 30 for column in T_TABLE.values())
+
+
+def test_compare_samples_interval():
+    change, low, high = compare_samples([1.0, 1.01, 0.99], [1.3, 1.31, 1.29], 0.95)
+    assert change == pytest.approx(30)
+    assert 0 < low < change < high
+    # One sample each gives no interval, just the estimate
+    assert compare_samples([1.0], [2.0], 0.95) == (100, 100, 100)
+    # Noise large enough to cover zero
+    _, low, high = compare_samples([1.0, 2.0, 0.5], [1.2, 2.1, 0.6], 0.95)
+    assert low < 0 < high
+
+
+def test_classify_needs_both_threshold_and_interval():
+    assert classify(30, 20, 40, 5) == 'regression'
+    assert classify(-30, -40, -20, 5) == 'improvement'
+    assert classify(3, 1, 5, 5) == 'unchanged'
+    assert classify(30, -10, 70, 5) == 'unchanged'
+
+
+def test_compare_runs_flags_regressions_and_reports_new_and_missing():
+    baseline = run({('manager.load', 10): 1.0, ('manager.save', 10): 1.0, ('report.csv', 10): 1.0})
+    current = run({('manager.load', 10): 1.3, ('manager.save', 10): 1.0, ('http.metrics', 10): 1.0})
+    comparisons, added, missing = compare_runs(baseline, current, threshold=5)
+    statuses = {c.key: c.status for c in comparisons}
+    assert statuses == {('manager.load', 10): 'regression', ('manager.save', 10): 'unchanged'}
+    assert added == [('http.metrics', 10)] and missing == [('report.csv', 10)]
+
+
+def test_record_and_resolve_runs(tmp_path):
+    store = str(tmp_path / 'history')
+    first = record_run(run({('manager.load', 10): 1.0}, commit='1111111'), store, label='before')
+    # Timestamps have one-second resolution, so make the order explicit
+    os.rename(first, os.path.join(store, '20250101_000000_before.json'))
+    second = record_run(run({('manager.load', 10): 1.1}, commit='2222222'), store, label='after')
+
+    assert resolve_run('latest', store) == second
+    assert resolve_run(os.path.splitext(os.path.basename(second))[0], store) == second
+    assert resolve_run('previous', store).endswith('20250101_000000_before.json')
+    assert resolve_run('before', store).endswith('20250101_000000_before.json')
+    assert resolve_run('2222222', store) == second
+    assert resolve_run(second, store) == second
+    with pytest.raises(FileNotFoundError):
+        resolve_run('unknown', store)
+    # A bare prefix such as a year matches every timestamped run, so it is refused
+    with pytest.raises(ValueError, match='only matches the start'):
+        resolve_run('2', store)
+    with pytest.raises(ValueError):
+        record_run(run({}), store, label='a/b')
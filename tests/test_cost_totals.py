@@ -0,0 +1,78 @@
+import pytest
+
+from cost_engine import CostTotals, aggregate_costs, compare_totals
+
+
+def assert_totals_match_recompute(manager):
+    totals = manager.get_totals()
+    recomputed = CostTotals.from_document(manager.data).as_dict()
+    for key in ('rooms', 'item_types', 'contractor_groups'):
+        assert totals[key] == pytest.approx(recomputed[key])
+    assert totals['project_total'] == pytest.approx(aggregate_costs(manager.data).project_total)
+    assert manager.verify_totals() == []
+
+
+@pytest.fixture
+def manager(main_module, source_file):
+    return main_module.RenovationManager(source_file)
+
+
+def lighting_cost_path(document, room='kitchen_0'):
+    fixture = next(iter(document['rooms'][room]['lighting']))
+    return ['rooms', room, 'lighting', fixture, 'cost']
+
+
+def test_running_totals_start_equal_to_a_recompute(manager, document):
+    assert compare_totals(CostTotals.from_document(document), aggregate_costs(document)) == []
+    assert_totals_match_recompute(manager)
+
+
+def test_editing_a_cost(manager, document):
+    before = manager.get_totals()['rooms']['kitchen_0']
+    path = lighting_cost_path(document)
+    old = document['rooms']['kitchen_0']['lighting'][path[3]]['cost']
+    manager.set_nested_value(path, old + 250.0)
+    assert manager.get_totals()['rooms']['kitchen_0'] == pytest.approx(before + 250.0)
+    assert_totals_match_recompute(manager)
+
+
+def test_changing_a_budget_leaves_costs_alone(manager):
+    before = manager.get_totals()
+    manager.set_nested_value(['rooms', 'kitchen_0', 'budget', 'amount'], 1.0)
+    assert manager.get_totals() == before
+    assert_totals_match_recompute(manager)
+
+
+def test_adding_and_removing_rooms(manager, document):
+    manager.set_nested_value(['rooms', 'study_9'], {'budget': {'amount': 100},
+                                                    'lighting': {'lamp': {'cost': 75.5}}})
+    assert manager.get_totals()['rooms']['study_9'] == 75.5
+    assert_totals_match_recompute(manager)
+
+    manager.delete_nested_value(['rooms', 'bathroom_1'])
+    assert 'bathroom_1' not in manager.get_totals()['rooms']
+    assert_totals_match_recompute(manager)
+
+
+def test_contractor_and_whole_collection_edits(manager, document):
+    manager.set_nested_value(['general_considerations', 'contractor_information', 'general_contractor', 'cost'],
+                             1000.0)
+    assert manager.get_totals()['contractor_groups']['General Contractor'] == 1000.0
+    assert_totals_match_recompute(manager)
+
+    rooms = dict(document['rooms'])
+    del rooms['kitchen_0']
+    manager.set_nested_value(['rooms'], rooms)
+    assert set(manager.get_totals()['rooms']) == set(rooms)
+    assert_totals_match_recompute(manager)
+
+
+def test_batch_rollback_restores_the_totals(manager, document):
+    before = manager.get_totals()
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.set_nested_value(lighting_cost_path(document), 99999.0)
+            manager.delete_nested_value(['rooms', 'bedroom_2'])
+            raise RuntimeError("abandon the batch")
+    assert manager.get_totals() == before
+    assert_totals_match_recompute(manager)
@@ -0,0 +1,59 @@
+import gzip
+import http.client
+import json
+
+
+def request(port, method, path, headers=None, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_document_etag_and_not_modified(server_factory, document):
+    _, port = server_factory()
+    status, headers, body = request(port, 'GET', '/converted_source.json')
+    assert status == 200 and json.loads(body) == document
+    etag = headers['ETag']
+
+    status, headers, body = request(port, 'GET', '/converted_source.json', {'If-None-Match': etag})
+    assert status == 304 and body == b'' and headers['ETag'] == etag
+    status, _, _ = request(port, 'GET', '/converted_source.json', {'If-None-Match': '"stale", "other"'})
+    assert status == 200
+
+
+def test_a_save_changes_the_etag(server_factory, document):
+    _, port = server_factory()
+    _, headers, _ = request(port, 'GET', '/converted_source.json')
+    room = document['rooms']['kitchen_0']
+    payload = {'kitchen_0': {'priority': 'low', 'budget': room['budget'],
+                             'square_footage': {'value': room['square_footage']['value']}}}
+    status, _, _ = request(port, 'POST', '/save_rooms', {'Content-Type': 'application/json'},
+                           json.dumps(payload).encode('utf-8'))
+    assert status == 200
+
+    status, new_headers, body = request(port, 'GET', '/converted_source.json', {'If-None-Match': headers['ETag']})
+    assert status == 200 and new_headers['ETag'] != headers['ETag']
+    assert json.loads(body)['rooms']['kitchen_0']['priority'] == 'low'
+
+
+def test_the_cache_notices_the_file_changing_on_disk(server_factory, workdir, document):
+    _, port = server_factory()
+    request(port, 'GET', '/converted_source.json')
+    (workdir / 'converted_source.json').write_text(json.dumps(dict(document, status='edited by hand'), indent=4))
+    _, _, body = request(port, 'GET', '/converted_source.json')
+    assert json.loads(body)['status'] == 'edited by hand'
+
+
+def test_gzip_is_negotiated(server_factory):
+    _, port = server_factory()
+    _, _, plain = request(port, 'GET', '/converted_source.json')
+    status, headers, body = request(port, 'GET', '/converted_source.json', {'Accept-Encoding': 'br, gzip'})
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(body) == plain and len(body) < len(plain)
+    _, headers, body = request(port, 'GET', '/converted_source.json', {'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in headers and body == plain
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from conftest import REPO_ROOT
+from journal import MutationJournal, snapshot_hash
+
+BUDGET = ['rooms', 'kitchen_0', 'budget', 'amount']
+
+
+def test_replay_applies_records_for_matching_snapshot(tmp_path):
+    journal = MutationJournal(str(tmp_path / 'doc.json.journal'))
+    journal.reset('abc')
+    journal.append('set', ['a'], 1)
+    journal.append_batch([{'op': 'set', 'path': ['b'], 'value': 2}, {'op': 'delete', 'path': ['c']}])
+    journal.close()
+    records = MutationJournal(journal.journal_file).read('abc')
+    assert [r['op'] for r in records] == ['set', 'batch']
+
+
+def test_torn_final_line_keeps_earlier_records(tmp_path):
+    journal = MutationJournal(str(tmp_path / 'doc.json.journal'))
+    journal.reset('abc')
+    journal.append('set', ['a'], 1)
+    journal.close()
+    with open(journal.journal_file, 'a') as f:
+        f.write('{"op": "set", "pa')
+    assert MutationJournal(journal.journal_file).read('abc') == [{'op': 'set', 'path': ['a'], 'value': 1}]
+
+
+def test_mismatched_journal_is_set_aside_not_discarded(tmp_path):
+    journal = MutationJournal(str(tmp_path / 'doc.json.journal'))
+    journal.reset(snapshot_hash(b'old'))
+    journal.append('set', ['a'], 1)
+    journal.close()
+    assert journal.read(snapshot_hash(b'new')) == []
+    assert not os.path.exists(journal.journal_file)
+    stale = [name for name in os.listdir(tmp_path) if name.startswith('doc.json.journal.stale_')]
+    assert len(stale) == 1
+    with open(tmp_path / stale[0]) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_journaled_edits_are_seen_without_the_journal_flag(main_module, source_file):
+    manager = main_module.RenovationManager(source_file, journal=True)
+    manager.set_nested_value(BUDGET, 1234.5)
+    manager.close()
+
+    assert main_module.RenovationManager(source_file).get_nested_value(BUDGET) == 1234.5
+    lazy = main_module.RenovationManager(source_file, lazy=True)
+    assert lazy.lazy is None
+    assert lazy.get_nested_value(BUDGET) == 1234.5
+
+
+def test_plain_save_folds_the_journal_into_the_file(main_module, source_file):
+    manager = main_module.RenovationManager(source_file, journal=True)
+    manager.set_nested_value(BUDGET, 1234.5)
+    manager.close()
+
+    plain = main_module.RenovationManager(source_file)
+    plain.set_nested_value(['rooms', 'kitchen_0', 'priority'], 'low')
+    assert not os.path.exists(f"{source_file}.journal")
+    with open(source_file) as f:
+        data = json.load(f)
+    assert data['rooms']['kitchen_0']['budget']['amount'] == 1234.5
+    assert data['rooms']['kitchen_0']['priority'] == 'low'
+
+
+def test_journal_mode_survives_a_compaction(main_module, source_file):
+    manager = main_module.RenovationManager(source_file, journal=True, compact_every=2)
+    for amount in (1.0, 2.0, 3.0):
+        manager.set_nested_value(BUDGET, amount)
+    manager.close()
+    assert main_module.RenovationManager(source_file, journal=True).get_nested_value(BUDGET) == 3.0
+
+
+def test_edits_survive_the_process_dying_without_close(main_module, source_file):
+    script = (
+        "import os, time\n"
+        "from main import RenovationManager\n"
+        f"manager = RenovationManager({source_file!r}, journal=True)\n"
+        f"manager.set_nested_value({BUDGET!r}, 111.0)\n"
+        "manager.set_nested_value(['rooms', 'kitchen_0', 'priority'], 'low')\n"
+        "os._exit(0)\n"
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, timeout=60,
+                   env=dict(os.environ, PYTHONPATH=REPO_ROOT))
+    manager = main_module.RenovationManager(source_file)
+    assert manager.get_nested_value(BUDGET) == 111.0
+    assert manager.get_nested_value(['rooms', 'kitchen_0', 'priority']) == 'low'
+
+
+def test_idle_journal_is_synced_after_the_interval(tmp_path):
+    journal = MutationJournal(str(tmp_path / 'doc.json.journal'), fsync_interval=0.05)
+    journal.reset('abc')
+    journal.append('set', ['a'], 1)
+    assert journal._unsynced == 1
+    deadline = time.monotonic() + 5
+    while journal._unsynced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journal._unsynced == 0 and journal._timer is None
+    journal.close()
@@ -0,0 +1,112 @@
+import copy
+import json
+
+import pytest
+
+from json_paths import set_value
+from json_patch import PatchError, PatchTestFailed, apply_patch, diff, format_pointer, parse_pointer
+
+DOC = {'rooms': {'kitchen': {'budget': {'amount': 100}, 'projects': [{'title': 'a'}]}}, 'a/b': {'c~d': 1}}
+
+
+@pytest.fixture
+def doc():
+    return copy.deepcopy(DOC)
+
+
+def test_pointer_escaping_round_trips():
+    assert parse_pointer('/a~1b/c~0d') == ('a/b', 'c~d')
+    assert format_pointer(['a/b', 'c~d']) == '/a~1b/c~0d'
+    assert parse_pointer('') == ()
+
+
+def test_add_replace_remove_move_copy(doc):
+    result = apply_patch(doc, [
+        {'op': 'add', 'path': '/rooms/kitchen/projects/-', 'value': {'title': 'b'}},
+        {'op': 'add', 'path': '/rooms/kitchen/projects/0', 'value': {'title': 'first'}},
+        {'op': 'replace', 'path': '/rooms/kitchen/budget/amount', 'value': 250},
+        {'op': 'copy', 'from': '/rooms/kitchen/budget', 'path': '/rooms/kitchen/saved'},
+        {'op': 'move', 'from': '/a~1b/c~0d', 'path': '/rooms/kitchen/moved'},
+        {'op': 'remove', 'path': '/a~1b'},
+        {'op': 'test', 'path': '/rooms/kitchen/saved/amount', 'value': 250},
+    ])
+    kitchen = result['rooms']['kitchen']
+    assert [p['title'] for p in kitchen['projects']] == ['first', 'a', 'b']
+    assert kitchen['budget'] == {'amount': 250} and kitchen['saved'] == {'amount': 250}
+    assert kitchen['saved'] is not kitchen['budget']
+    assert kitchen['moved'] == 1 and 'a/b' not in result
+
+
+def test_failed_test_operation(doc):
+    with pytest.raises(PatchTestFailed):
+        apply_patch(doc, [{'op': 'test', 'path': '/rooms/kitchen/budget/amount', 'value': 1}])
+
+
+@pytest.mark.parametrize('path', [
+    '/rooms/kitchen/budget/amount/x',   # parent is a scalar
+    '/rooms/bathroom/budget',           # parent is missing
+    '/rooms/kitchen/projects/5',        # past the end of a list
+])
+def test_add_requires_an_existing_container_parent(doc, path):
+    with pytest.raises(PatchError):
+        apply_patch(doc, [{'op': 'add', 'path': path, 'value': 1}])
+
+
+@pytest.mark.parametrize('op', [
+    {'op': 'replace', 'path': '/rooms/kitchen/missing', 'value': 1},
+    {'op': 'remove', 'path': '/rooms/kitchen/missing'},
+    {'op': 'move', 'from': '/rooms', 'path': '/rooms/kitchen/inner'},
+    {'op': 'add', 'path': '/x'},
+    {'op': 'frobnicate', 'path': '/x'},
+])
+def test_invalid_operations_raise_patch_error(doc, op):
+    with pytest.raises(PatchError):
+        apply_patch(doc, [op])
+
+
+def test_set_value_refuses_to_step_through_a_scalar(doc):
+    with pytest.raises(KeyError):
+        set_value(doc, ['rooms', 'kitchen', 'budget', 'amount', 'x'], 1)
+    with pytest.raises(KeyError):
+        set_value(doc, ['rooms', 'kitchen', 'budget', 'amount', 'x', 'y'], 1)
+    assert doc == DOC
+
+
+def test_diff_produces_a_patch_that_reproduces_the_target(document):
+    new = copy.deepcopy(document)
+    room = next(iter(new['rooms']))
+    new['rooms'][room]['budget']['amount'] = 1
+    new['rooms'][room]['projects'].append({'title': 'extra'})
+    del new['status']
+    new['added'] = {'x': [1, 2]}
+    patch = diff(document, new)
+    assert apply_patch(json.loads(json.dumps(document)), patch) == new
+
+
+def patch_request(port, ops):
+    import http.client
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('PATCH', '/converted_source.json', body=json.dumps(ops),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def test_server_rejects_add_through_a_scalar_and_skips_no_op_patches(server_module, server_factory, document):
+    _, port = server_factory()
+    room = next(iter(document['rooms']))
+    before = server_module.version_store.list_versions()
+
+    status, _ = patch_request(port, [{'op': 'add', 'path': f'/rooms/{room}/budget/amount/x', 'value': 1}])
+    assert status == 400
+    status, body = patch_request(port, [
+        {'op': 'replace', 'path': f'/rooms/{room}/priority', 'value': document['rooms'][room]['priority']}])
+    assert status == 200 and json.loads(body)['message'] == 'No changes'
+    assert server_module.version_store.list_versions() == before
+
+    status, _ = patch_request(port, [{'op': 'replace', 'path': f'/rooms/{room}/priority', 'value': 'other'}])
+    assert status == 200
+    assert len(server_module.version_store.list_versions()) == len(before) + 1
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from lazy_document import INDEX_DEPTH, LazyDocument, offsets_path, read_offsets, scan_offsets, write_offsets
+
+
+def write_document(path, data, indent=2):
+    content = json.dumps(data, indent=indent).encode('utf-8')
+    path.write_bytes(content)
+    return content
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_scan_offsets_spans_parse_to_the_value(document, indent):
+    content = json.dumps(document, indent=indent).encode('utf-8')
+    spans = scan_offsets(content)
+    assert ('rooms', 'kitchen_0', 'budget') in spans
+    assert all(len(path) <= INDEX_DEPTH for path in spans)
+    for path, (start, end) in spans.items():
+        value = document
+        for key in path:
+            value = value[key]
+        assert json.loads(content[start:end]) == value
+
+
+def test_scan_offsets_skips_array_members_and_handles_escapes():
+    data = {'list': [{'inner': 1}, 2], 'text': 'a "quoted" } , [', 'nested': {'k': {'deep': {'x': None}}}}
+    content = json.dumps(data).encode('utf-8')
+    spans = scan_offsets(content, depth=2)
+    assert set(spans) == {('list',), ('text',), ('nested',), ('nested', 'k')}
+    start, end = spans[('text',)]
+    assert json.loads(content[start:end]) == data['text']
+
+
+def test_offsets_sidecar_round_trip_and_staleness(tmp_path, document):
+    source = tmp_path / 'new_source.json'
+    content = write_document(source, document)
+    spans = write_offsets(str(source), content)
+    assert os.path.exists(offsets_path(str(source)))
+    assert read_offsets(str(source), os.stat(source)) == spans
+
+    write_document(source, dict(document, status='done'), indent=4)
+    assert read_offsets(str(source), os.stat(source)) is None
+
+
+def test_get_matches_json_values(tmp_path, document):
+    source = tmp_path / 'new_source.json'
+    write_document(source, document)
+    lazy = LazyDocument(str(source))
+    paths = [
+        ['rooms'],
+        ['rooms', 'kitchen_0', 'budget'],
+        ['rooms', 'kitchen_0', 'budget', 'amount'],
+        ['rooms', 'bathroom_1', 'projects', '0', 'title'],
+        ['project_name'],
+    ]
+    for path in paths:
+        value = document
+        for key in path:
+            value = value[int(key)] if isinstance(value, list) else value[key]
+        assert lazy.get(path) == value
+    with pytest.raises(KeyError):
+        lazy.get(['rooms', 'missing_room'])
+
+
+def test_get_rebuilds_a_stale_index(tmp_path, document):
+    source = tmp_path / 'new_source.json'
+    write_document(source, document)
+    lazy = LazyDocument(str(source))
+    assert lazy.get(['rooms', 'kitchen_0', 'priority']) == document['rooms']['kitchen_0']['priority']
+
+    edited = json.loads(json.dumps(document))
+    edited['rooms']['kitchen_0']['priority'] = 'a much longer priority than before'
+    write_document(source, edited)
+    # Old spans would now point at the wrong bytes
+    assert lazy.get(['rooms', 'kitchen_0', 'priority']) == 'a much longer priority than before'
+    assert lazy.get(['rooms', 'bedroom_2']) == edited['rooms']['bedroom_2']
+    assert read_offsets(str(source), os.stat(source)) is not None
@@ -0,0 +1,61 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from logging_setup import PROFILE_ENV_VAR, configure_logging, shutdown_logging
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    yield str(tmp_path / 'test.log')
+    shutdown_logging()
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_records_reach_the_file_through_the_queue(log_file, tmp_path):
+    extra = str(tmp_path / 'json_operations.log')
+    configure_logging(log_file, 'development', console=False, extra_files={'json_operations': extra})
+    logging.getLogger('json_operations').debug("parsed %s", 'payload')
+    logging.getLogger('other').info("hello")
+    shutdown_logging()
+    assert 'parsed payload' in read(log_file) and 'hello' in read(log_file)
+    assert 'parsed payload' in read(extra) and 'hello' not in read(extra)
+
+
+def test_production_drops_debug_before_formatting(log_file):
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("debug arguments were formatted")
+
+    configure_logging(log_file, 'production', console=False)
+    logging.getLogger('test').debug("value %s", Exploding())
+    logging.getLogger('test').info("kept")
+    shutdown_logging()
+    assert read(log_file).count('\n') == 1
+
+
+def test_level_overrides_the_profile(log_file):
+    configure_logging(log_file, 'development', console=False, level=logging.INFO)
+    assert logging.getLogger().level == logging.INFO
+    with pytest.raises(ValueError):
+        configure_logging(log_file, 'nonexistent')
+
+
+@pytest.mark.parametrize('env, expected', [(None, logging.INFO), ('development', logging.DEBUG)])
+def test_cli_logs_at_info_unless_a_profile_is_chosen(tmp_path, env, expected):
+    environ = {key: value for key, value in os.environ.items() if key != PROFILE_ENV_VAR}
+    if env:
+        environ[PROFILE_ENV_VAR] = env
+    result = subprocess.run([sys.executable, '-c', 'import logging, main; print(logging.getLogger().level)'],
+                            cwd=tmp_path, env=dict(environ, PYTHONPATH=REPO_ROOT),
+                            capture_output=True, text=True, check=True)
+    assert int(result.stdout) == expected
@@ -0,0 +1,100 @@
+import hashlib
+import http.client
+import io
+import os
+
+import pytest
+
+from multipart_upload import MultipartError, parse_multipart_stream
+
+BOUNDARY = 'XyZboundary'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+
+
+def encode(parts, boundary=BOUNDARY):
+    body = b'preamble\r\n'
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        body += f'--{boundary}\r\nContent-Disposition: {disposition}\r\n'.encode()
+        if filename:
+            body += b'Content-Type: application/octet-stream\r\n'
+        body += b'\r\n' + data + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode()
+
+
+def parse(body, tmp_path, **limits):
+    options = dict(max_total_size=10 * 1024 * 1024, max_file_size=5 * 1024 * 1024, chunk_size=1024)
+    options.update(limits)
+    return parse_multipart_stream(io.BytesIO(body), CONTENT_TYPE, len(body), str(tmp_path / 'incoming'), **options)
+
+
+def test_fields_and_files_stream_to_temporary_files(tmp_path):
+    # Data containing something close to the delimiter, split across small chunks
+    data = os.urandom(50_000) + f'\r\n--{BOUNDARY[:-1]}'.encode() + os.urandom(3000)
+    fields, files = parse(encode([('room_name', None, b'kitchen'), ('file', '../evil/photo.jpg', data),
+                                  ('second', 'notes.txt', b'')]), tmp_path)
+    assert fields == {'room_name': 'kitchen'}
+    assert [f.filename for f in files] == ['photo.jpg', 'notes.txt']
+    with open(files[0].temp_path, 'rb') as f:
+        assert f.read() == data
+    assert files[0].size == len(data) and files[0].sha256 == hashlib.sha256(data).hexdigest()
+    assert files[1].size == 0
+    for upload in files:
+        upload.discard()
+    assert os.listdir(tmp_path / 'incoming') == []
+
+
+@pytest.mark.parametrize('limits, status', [
+    ({'max_total_size': 100}, 413),
+    ({'max_file_size': 10}, 413),
+    ({'max_field_size': 3}, 413),
+    ({'max_parts': 1}, 413),
+])
+def test_limits_are_enforced_and_temporary_files_removed(tmp_path, limits, status):
+    body = encode([('room_name', None, b'kitchen'), ('file', 'a.bin', b'x' * 50)])
+    with pytest.raises(MultipartError) as error:
+        parse(body, tmp_path, **limits)
+    assert error.value.status == status
+    incoming = tmp_path / 'incoming'
+    assert not incoming.exists() or os.listdir(incoming) == []
+
+
+def test_truncated_body_and_bad_headers(tmp_path):
+    body = encode([('file', 'a.bin', b'x' * 5000)])
+    with pytest.raises(MultipartError):
+        parse_multipart_stream(io.BytesIO(body[:-200]), CONTENT_TYPE, len(body), str(tmp_path),
+                               max_total_size=10 ** 6, max_file_size=10 ** 6)
+    with pytest.raises(MultipartError):
+        parse_multipart_stream(io.BytesIO(body), 'application/json', len(body), str(tmp_path),
+                               max_total_size=10 ** 6, max_file_size=10 ** 6)
+    with pytest.raises(MultipartError) as error:
+        parse_multipart_stream(io.BytesIO(body), CONTENT_TYPE, None, str(tmp_path),
+                               max_total_size=10 ** 6, max_file_size=10 ** 6)
+    assert error.value.status == 411
+
+
+def test_undecodable_text_field_is_a_bad_request(tmp_path):
+    body = encode([('file', 'a.bin', b'x' * 50), ('room_name', None, b'kitchen\xff\xfe')])
+    with pytest.raises(MultipartError) as error:
+        parse(body, tmp_path)
+    assert error.value.status == 400
+    assert os.listdir(tmp_path / 'incoming') == []
+
+    body = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="room_name"\r\n'
+            f'Content-Type: text/plain; charset=no-such-charset\r\n\r\nkitchen\r\n--{BOUNDARY}--\r\n').encode()
+    with pytest.raises(MultipartError) as error:
+        parse(body, tmp_path)
+    assert error.value.status == 400
+
+
+def test_server_answers_an_undecodable_field_with_400(server_factory):
+    _, port = server_factory()
+    body = encode([('room_name', None, b'\xff'), ('file', 'a.txt', b'data')])
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('POST', '/upload', body=body, headers={'Content-Type': CONTENT_TYPE})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 400
+    finally:
+        conn.close()
@@ -0,0 +1,83 @@
+import pytest
+
+from json_paths import PathIndex
+
+AMOUNTS = 'rooms.*.budget.amount'
+
+
+def assert_index_in_step(manager):
+    """The maintained index holds exactly the nodes a fresh index of the document would."""
+    fresh = PathIndex(manager.data)
+    assert set(manager.index._nodes) == set(fresh._nodes)
+    for path, node in fresh._nodes.items():
+        assert manager.index._nodes[path] is node
+
+
+@pytest.fixture
+def manager(main_module, source_file):
+    return main_module.RenovationManager(source_file, indexed=True)
+
+
+def test_wildcard_query(manager, document):
+    expected = [(f"rooms.{name}.budget.amount", room['budget']['amount'])
+                for name, room in document['rooms'].items()]
+    assert manager.query(AMOUNTS) == expected
+    assert manager.query('rooms.bath*.priority') == [
+        ('rooms.bathroom_1.priority', document['rooms']['bathroom_1']['priority'])]
+    costs = manager.query('rooms.kitchen_0.**.cost')
+    assert costs and all(path.endswith('.cost') for path, _ in costs)
+
+
+def test_query_misses(manager):
+    assert manager.query('rooms.missing.*') == []
+    assert manager.query('rooms.*.missing') == []
+    with pytest.raises(KeyError):
+        manager.get_nested_value(['rooms', 'missing', 'budget'])
+
+
+def test_query_follows_edits(manager, document):
+    manager.set_nested_value(['rooms', 'kitchen_0', 'budget', 'amount'], 1.5)
+    manager.set_nested_value(['rooms', 'study_9'], {'budget': {'amount': 2.5}})
+    manager.delete_nested_value(['rooms', 'bedroom_2'])
+    assert manager.query(AMOUNTS) == [
+        ('rooms.kitchen_0.budget.amount', 1.5),
+        ('rooms.bathroom_1.budget.amount', document['rooms']['bathroom_1']['budget']['amount']),
+        ('rooms.study_9.budget.amount', 2.5),
+    ]
+    assert manager.get_nested_value('rooms.study_9.budget.amount') == 2.5
+    with pytest.raises(KeyError):
+        manager.get_nested_value(['rooms', 'bedroom_2'])
+    assert_index_in_step(manager)
+
+
+def test_list_edits_reindex_shifted_siblings(manager, document):
+    projects = document['rooms']['kitchen_0']['projects']
+    manager.delete_nested_value(['rooms', 'kitchen_0', 'projects', '0'])
+    assert manager.get_nested_value('rooms.kitchen_0.projects.0.title') == projects[1]['title']
+    assert manager.query('rooms.kitchen_0.projects.*.title') == [
+        ('rooms.kitchen_0.projects.0.title', projects[1]['title'])]
+    assert_index_in_step(manager)
+
+
+def test_batch_rollback_restores_the_index(manager, document):
+    before = manager.query(AMOUNTS)
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.set_nested_value(['rooms', 'kitchen_0', 'budget', 'amount'], 1.5)
+            manager.delete_nested_value(['rooms', 'bathroom_1'])
+            raise RuntimeError("abandon the batch")
+    assert manager.query(AMOUNTS) == before
+    assert_index_in_step(manager)
+
+
+def test_apply_edits_keeps_the_index_in_step(manager):
+    manager.apply_edits([
+        {'path': 'rooms.kitchen_0.budget.amount', 'value': 7.0},
+        {'path': ['rooms', 'bathroom_1', 'priority'], 'value': 'low'},
+        {'op': 'delete', 'path': 'rooms.bedroom_2.painting'},
+    ])
+    assert manager.get_nested_value('rooms.kitchen_0.budget.amount') == 7.0
+    assert [path for path, _ in manager.query('rooms.*.painting')] == [
+        'rooms.kitchen_0.painting', 'rooms.bathroom_1.painting']
+    assert 'rooms.bedroom_2.painting' not in manager.index
+    assert_index_in_step(manager)
@@ -0,0 +1,62 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from retention import BackgroundPruner, RetentionPolicy, backup_pattern, parse_timestamp, prune_files
+
+
+def test_parse_policy():
+    policy = RetentionPolicy.parse('last=5, hourly=2,daily=0,max_mb=1.5')
+    assert (policy.last, policy.hourly, policy.daily) == (5, 2, 0)
+    assert policy.max_bytes == int(1.5 * 1024 * 1024)
+    assert RetentionPolicy.parse('last=0').last == 1
+    assert not RetentionPolicy.parse('off').enabled
+    for spec in ('last', 'weekly=3', 'last=x'):
+        with pytest.raises(ValueError):
+            RetentionPolicy.parse(spec)
+
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp('2025-01-02_14-35-33') == datetime(2025, 1, 2, 14, 35, 33)
+    assert parse_timestamp('20250102_143533') == datetime(2025, 1, 2, 14, 35, 33)
+    assert parse_timestamp('yesterday') is None
+
+
+def test_select_keeps_last_plus_hourly_and_daily_buckets():
+    start = datetime(2025, 1, 1)
+    # Every 20 minutes over three days, oldest first
+    items = [(f'v{i}', start + timedelta(minutes=20 * i), 10) for i in range(216)]
+    keep = RetentionPolicy(last=3, hourly=4, daily=3).select(items)
+    assert {'v215', 'v214', 'v213'} <= keep
+    # The newest item of each of the last four hours, and of each day
+    assert {'v212', 'v209', 'v206'} <= keep
+    assert {'v143', 'v71'} <= keep
+    assert len(keep) == 3 + 3 + 2
+
+
+def test_size_cap_drops_oldest_but_never_the_newest():
+    items = [(f'v{i}', None, 100) for i in range(5)]
+    assert RetentionPolicy(last=5, hourly=0, daily=0, max_bytes=250).select(items) == {'v3', 'v4'}
+    assert RetentionPolicy(last=5, hourly=0, daily=0, max_bytes=1).select(items) == {'v4'}
+
+
+def test_prune_files_only_touches_matching_backups(tmp_path):
+    names = [f'new_source_2025010{day}_120000.json' for day in range(1, 6)] + ['new_source.json', 'notes.txt']
+    for name in names:
+        (tmp_path / name).write_text('{}')
+    removed = prune_files(str(tmp_path), backup_pattern('new_source_', '.json'), RetentionPolicy(2, 0, 0))
+    assert sorted(removed) == names[:3]
+    assert sorted(os.listdir(tmp_path)) == sorted(names[3:])
+
+
+def test_background_pruner_runs_requested_passes_before_stopping():
+    ran = threading.Event()
+    pruner = BackgroundPruner([ran.set, lambda: 1 / 0], interval=60).start()
+    pruner.request()
+    assert ran.wait(5)
+    ran.clear()
+    pruner.request()
+    pruner.stop()
+    assert ran.is_set()
@@ -0,0 +1,47 @@
+import http.client
+import socket
+
+
+def open_stream(port):
+    sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+    sock.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    received = b''
+    while b'event: version' not in received:
+        chunk = sock.recv(4096)
+        assert chunk, received
+        received += chunk
+    assert received.startswith(b'HTTP/1.0 200') or received.startswith(b'HTTP/1.1 200')
+    return sock
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_streams_beyond_the_limit_get_503_and_requests_still_run(server_factory):
+    server, port = server_factory(threads=4)
+    assert server.max_streams == 2
+    streams = [open_stream(port) for _ in range(server.max_streams)]
+    try:
+        status, headers, _ = get(port, '/events')
+        assert status == 503
+        assert int(headers['Retry-After']) > 0
+
+        status, _, body = get(port, '/converted_source.json')
+        assert status == 200 and body
+    finally:
+        for sock in streams:
+            sock.close()
+
+
+def test_single_worker_pool_refuses_streams(server_factory):
+    server, port = server_factory(threads=1)
+    status, _, _ = get(port, '/events')
+    assert status == 503
+    assert get(port, '/converted_source.json')[0] == 200
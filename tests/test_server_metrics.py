@@ -0,0 +1,53 @@
+import http.client
+import shutil
+import time
+
+from conftest import REPO_ROOT
+
+
+def request(port, method, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def wait_for_count(server_module, route, method, status, expected):
+    # Metrics are recorded just after the response is written
+    key = (route, method, str(status))
+    deadline = time.time() + 5
+    while server_module.http_requests.samples().get(key, 0) < expected and time.time() < deadline:
+        time.sleep(0.01)
+    assert server_module.http_requests.samples().get(key, 0) >= expected
+
+
+def bytes_out(server_module, route):
+    return server_module.http_bytes_out.samples().get((route,), 0)
+
+
+def test_only_sent_bodies_count_as_bytes_out(server_module, server_factory, workdir):
+    shutil.copy(f"{REPO_ROOT}/building_management.html", workdir)
+    _, port = server_factory()
+    route = 'static'
+    path = '/building_management.html'
+    counts = server_module.http_requests.samples()
+
+    def count(method, status):
+        return counts.get((route, method, str(status)), 0)
+
+    before = bytes_out(server_module, route)
+    status, headers, body = request(port, 'GET', path)
+    assert status == 200
+    wait_for_count(server_module, route, 'GET', 200, count('GET', 200) + 1)
+    assert bytes_out(server_module, route) == before + len(body)
+
+    before = bytes_out(server_module, route)
+    assert request(port, 'HEAD', path)[0] == 200
+    wait_for_count(server_module, route, 'HEAD', 200, count('HEAD', 200) + 1)
+    status, _, _ = request(port, 'GET', path, {'If-Modified-Since': headers['Last-Modified']})
+    assert status == 304
+    wait_for_count(server_module, route, 'GET', 304, count('GET', 304) + 1)
+    assert bytes_out(server_module, route) == before
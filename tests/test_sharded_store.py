@@ -0,0 +1,144 @@
+import copy
+import http.client
+import json
+import os
+
+import pytest
+
+import sharded_store
+from sharded_store import ShardedDocument
+
+
+def post(port, method, path, payload):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def sharded(tmp_path, document):
+    source = tmp_path / 'new_source.json'
+    source.write_text(json.dumps(document))
+    store = ShardedDocument(str(source))
+    store.create(document)
+    return store
+
+
+def test_create_and_load_round_trip(tmp_path, document, sharded):
+    assert sharded.exists() and not os.path.exists(sharded.json_file)
+    # The single file is set aside rather than deleted
+    assert any(name.startswith('new_source_') for name in os.listdir(tmp_path))
+    assert os.path.isfile(tmp_path / 'kitchen_0' / 'new_source.json')
+    assert os.path.isfile(tmp_path / 'general_considerations' / 'timeline' / 'new_source.json')
+    loaded = ShardedDocument(sharded.json_file).load()
+    assert loaded == document and list(loaded) == list(document)
+
+
+def test_save_with_touched_rewrites_one_shard(document, sharded):
+    edited = copy.deepcopy(document)
+    edited['rooms']['kitchen_0']['budget']['amount'] = 1
+    written = sharded.save(edited, touched=[['rooms', 'kitchen_0', 'budget', 'amount']])
+    assert written == [os.path.join('kitchen_0', 'new_source.json')]
+    assert sharded.load() == edited
+    # An unchanged document writes no shards even when every shard is compared
+    assert sharded.save(edited) == []
+
+
+def test_top_level_edit_only_rewrites_the_manifest(document, sharded):
+    edited = dict(document, status='in_progress')
+    assert sharded.save(edited, touched=[['status']]) == []
+    assert sharded.get(['status']) == 'in_progress'
+
+
+def test_get_reads_single_shards(document, sharded):
+    assert sharded.get(['rooms', 'bathroom_1', 'priority']) == document['rooms']['bathroom_1']['priority']
+    assert sharded.get(['general_considerations', 'budget']) == document['general_considerations']['budget']
+    assert sharded.get(['rooms']) == document['rooms']
+    assert sharded.get(['project_name']) == document['project_name']
+    for path in (['rooms', 'missing'], ['missing'], ['rooms', 'kitchen_0', 'missing']):
+        with pytest.raises(KeyError):
+            sharded.get(path)
+
+
+def test_deleted_room_removes_its_shard(tmp_path, document, sharded):
+    edited = copy.deepcopy(document)
+    del edited['rooms']['bedroom_2']
+    sharded.save(edited, touched=[['rooms', 'bedroom_2']])
+    assert not os.path.exists(tmp_path / 'bedroom_2' / 'new_source.json')
+    assert sharded.load() == edited
+
+
+def test_reserved_and_unsafe_room_names_stay_inline(tmp_path, document, sharded):
+    edited = copy.deepcopy(document)
+    for name in ('uploads', 'versions', '.hidden', 'a/b'):
+        edited['rooms'][name] = {'priority': 'low'}
+    sharded.save(edited, touched=[['rooms', name] for name in ('uploads', 'versions', '.hidden', 'a/b')])
+    manifest = sharded.read_manifest()
+    for name in ('uploads', 'versions', '.hidden', 'a/b'):
+        assert manifest['shards']['rooms'][name] == {'inline': {'priority': 'low'}}
+    assert not os.path.exists(tmp_path / 'uploads' / 'new_source.json')
+    assert sharded.get(['rooms', 'a/b', 'priority']) == 'low'
+
+
+def test_unshard_restores_the_single_file(tmp_path, document, sharded):
+    assert sharded.unshard() == document
+    assert not sharded.exists()
+    assert not os.path.exists(tmp_path / 'kitchen_0' / 'new_source.json')
+    with open(sharded.json_file) as f:
+        assert json.load(f) == document
+
+
+def test_touched_save_only_encodes_the_touched_shards(document, sharded, monkeypatch):
+    encoded = []
+    monkeypatch.setattr(sharded_store, 'encode_shard',
+                        lambda value, encode=sharded_store.encode_shard: encoded.append(value) or encode(value))
+    edited = copy.deepcopy(document)
+    edited['rooms']['kitchen_0']['priority'] = 'urgent'
+    sharded.save(edited, touched=[['rooms', 'kitchen_0', 'priority']])
+    assert encoded == [edited['rooms']['kitchen_0']]
+
+
+def test_concurrent_saves_from_stale_copies_keep_both_edits(document, sharded):
+    first, second = ShardedDocument(sharded.json_file), ShardedDocument(sharded.json_file)
+    first_copy, second_copy = first.load(), second.load()
+
+    first_copy['rooms']['kitchen_0']['priority'] = 'urgent'
+    first_copy['status'] = 'in_progress'
+    first.save(first_copy, touched=[['rooms', 'kitchen_0', 'priority'], ['status']])
+    # The second writer never saw the first one's edits
+    second_copy['rooms']['bathroom_1']['priority'] = 'later'
+    second_copy['rooms']['study_9'] = {'priority': 'low'}
+    second.save(second_copy, touched=[['rooms', 'bathroom_1', 'priority'], ['rooms', 'study_9']])
+
+    loaded = ShardedDocument(sharded.json_file).load()
+    assert loaded['status'] == 'in_progress'
+    assert loaded['rooms']['kitchen_0']['priority'] == 'urgent'
+    assert loaded['rooms']['bathroom_1']['priority'] == 'later'
+    assert loaded['rooms']['study_9'] == {'priority': 'low'}
+
+
+def test_server_saves_only_rewrite_the_edited_room(server_module, server_factory, workdir, document, monkeypatch):
+    ShardedDocument(str(workdir / 'converted_source.json')).create(document)
+    server_module.document_cache.invalidate('converted_source.json')
+    _, port = server_factory()
+    encoded = []
+    monkeypatch.setattr(sharded_store, 'encode_shard',
+                        lambda value, encode=sharded_store.encode_shard: encoded.append(value) or encode(value))
+
+    room = document['rooms']['kitchen_0']
+    payload = {'kitchen_0': {'priority': 'low', 'budget': room['budget'],
+                             'square_footage': {'value': room['square_footage']['value']}}}
+    assert post(port, 'POST', '/save_rooms', payload) == 200
+    patch = [{'op': 'replace', 'path': '/rooms/bathroom_1/priority', 'value': 'low'}]
+    assert post(port, 'PATCH', '/converted_source.json', patch) == 200
+    assert [value['priority'] for value in encoded] == ['low', 'low']
+
+    loaded = ShardedDocument(str(workdir / 'converted_source.json')).load()
+    assert loaded['rooms']['kitchen_0']['priority'] == 'low'
+    assert loaded['rooms']['bathroom_1']['priority'] == 'low'
+    assert loaded['last_modified_by'] == 'user'
@@ -0,0 +1,86 @@
+import email.utils
+import http.client
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_ROOT
+
+PAYLOAD = bytes(range(256)) * 4
+
+
+def request(port, method, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def upload(workdir):
+    """A 1 KiB file under uploads/ and its URL."""
+    directory = workdir / 'uploads' / 'kitchen_0'
+    directory.mkdir(parents=True)
+    (directory / 'quote.bin').write_bytes(PAYLOAD)
+    return '/uploads/kitchen_0/quote.bin'
+
+
+@pytest.mark.parametrize('range_header, expected', [
+    ('bytes=10-19', (10, 19)),
+    ('bytes=1000-', (1000, 1023)),
+    ('bytes=-24', (1000, 1023)),
+    ('bytes=0-99999', (0, 1023)),
+])
+def test_range_requests(server_factory, upload, range_header, expected):
+    _, port = server_factory()
+    status, headers, body = request(port, 'GET', upload, {'Range': range_header})
+    start, end = expected
+    assert status == 206
+    assert headers['Content-Range'] == f"bytes {start}-{end}/{len(PAYLOAD)}"
+    assert body == PAYLOAD[start:end + 1]
+
+
+def test_unsatisfiable_and_ignored_ranges(server_factory, upload):
+    _, port = server_factory()
+    status, headers, body = request(port, 'GET', upload, {'Range': 'bytes=5000-'})
+    assert status == 416 and headers['Content-Range'] == f"bytes */{len(PAYLOAD)}" and body == b''
+    # Several ranges, other units and a stale If-Range all fall back to the whole file
+    for headers in ({'Range': 'bytes=0-1,5-6'}, {'Range': 'items=0-1'},
+                    {'Range': 'bytes=0-9', 'If-Range': 'Mon, 01 Jan 2001 00:00:00 GMT'}):
+        status, _, body = request(port, 'GET', upload, headers)
+        assert status == 200 and body == PAYLOAD
+
+
+def test_if_modified_since(server_factory, upload):
+    _, port = server_factory()
+    status, headers, _ = request(port, 'GET', upload)
+    assert status == 200 and headers['Accept-Ranges'] == 'bytes'
+    last_modified = headers['Last-Modified']
+    status, _, body = request(port, 'GET', upload, {'If-Modified-Since': last_modified})
+    assert status == 304 and body == b''
+    status, _, body = request(port, 'GET', upload, {'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+    assert status == 200 and body == PAYLOAD
+    status, _, _ = request(port, 'GET', upload, {'If-Modified-Since': 'not a date'})
+    assert status == 200
+
+
+def test_head_sends_headers_only(server_factory, upload, workdir):
+    shutil.copy(os.path.join(REPO_ROOT, 'building_management.html'), workdir)
+    _, port = server_factory()
+    status, headers, body = request(port, 'HEAD', upload)
+    assert status == 200 and body == b'' and headers['Content-Length'] == str(len(PAYLOAD))
+    status, headers, body = request(port, 'HEAD', '/')
+    size = os.path.getsize(workdir / 'building_management.html')
+    assert status == 200 and body == b'' and headers['Content-Length'] == str(size)
+    assert email.utils.parsedate_to_datetime(headers['Last-Modified'])
+
+
+def test_uploads_cannot_escape_their_directory(server_factory, upload):
+    _, port = server_factory()
+    for path in ('/uploads/../converted_source.json', '/uploads/kitchen_0/.hidden', '/uploads/kitchen_0/missing'):
+        status, _, _ = request(port, 'GET', path)
+        assert status == 404
@@ -0,0 +1,78 @@
+import copy
+
+from version_diff import Ref, TreeDiffer, diff_documents, diff_versions, render_diff, room_budget, room_cost
+from version_store import VersionStore
+
+
+def edit(document):
+    edited = copy.deepcopy(document)
+    edited['rooms']['kitchen_0']['budget']['amount'] += 100
+    edited['rooms']['kitchen_0']['benchmark_note'] = 'added'
+    del edited['rooms']['bedroom_2']['painting']
+    return edited
+
+
+def test_diff_documents_lists_changes_and_room_deltas(document):
+    edited = edit(document)
+    result = diff_documents(document, edited)
+    changes = {change.path: change for change in result.changes}
+    budget = changes['rooms.kitchen_0.budget.amount']
+    assert budget.op == 'changed' and budget.new - budget.old == 100
+    assert changes['rooms.kitchen_0.benchmark_note'].op == 'added'
+    assert changes['rooms.bedroom_2.painting'].op == 'removed'
+    assert len(result.changes) == 3
+
+    rooms = {room.room: room for room in result.rooms}
+    assert set(rooms) == {'kitchen_0', 'bedroom_2'}
+    assert rooms['kitchen_0'].budget_delta == 100
+    bedroom = document['rooms']['bedroom_2']
+    assert rooms['bedroom_2'].cost_before == room_cost('bedroom_2', bedroom)
+    assert rooms['bedroom_2'].cost_after == room_cost('bedroom_2', edited['rooms']['bedroom_2'])
+    assert rooms['bedroom_2'].budget_delta == 0 and room_budget(bedroom) > 0
+
+
+def test_identical_documents_have_no_differences(document):
+    result = diff_documents(document, copy.deepcopy(document))
+    assert result.changes == [] and result.rooms == []
+    assert render_diff(result) == "No differences"
+
+
+def test_diff_versions_matches_in_memory_diff(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    edited = edit(document)
+    old = store.commit(document, timestamp='2025-01-01_10-00-00')['name']
+    new = store.commit(edited, timestamp='2025-01-01_10-05-00')['name']
+    assert diff_versions(store, old, new).as_dict() == diff_documents(document, edited).as_dict()
+
+
+def test_stored_diff_reads_only_changed_subtrees(tmp_path, document, monkeypatch):
+    store = VersionStore(str(tmp_path / 'versions'))
+    edited = copy.deepcopy(document)
+    edited['rooms']['kitchen_0']['priority'] = 'urgent'
+    old = store.commit(document, timestamp='2025-01-01_10-00-00')['name']
+    new = store.commit(edited, timestamp='2025-01-01_10-05-00')['name']
+
+    read = []
+    read_object = store.read_object
+    monkeypatch.setattr(store, 'read_object', lambda digest: read.append(digest) or read_object(digest))
+    result = diff_versions(store, old, new)
+    assert [(c.path, c.old, c.new) for c in result.changes] == [
+        ('rooms.kitchen_0.priority', document['rooms']['kitchen_0']['priority'], 'urgent')]
+    # Unchanged rooms and general_considerations are compared by hash and never opened
+    assert len(read) < len(set(store._reachable(store.get_entry(new)['root'])))
+
+
+def test_render_diff_summarises_changes_and_rooms(document):
+    text = render_diff(diff_documents(document, edit(document)))
+    assert '~ rooms.kitchen_0.budget.amount:' in text
+    assert "+ rooms.kitchen_0.benchmark_note: 'added'" in text
+    assert '- rooms.bedroom_2.painting:' in text
+    assert 'Kitchen 0' in text and text.splitlines()[-1].startswith('Total')
+
+
+def test_tree_differ_mixes_refs_and_plain_values(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    entry = store.commit(document, timestamp='2025-01-01_10-00-00')
+    edited = edit(document)
+    result = TreeDiffer(store).diff(Ref(entry['root']), edited)
+    assert result.as_dict() == diff_documents(document, edited).as_dict()
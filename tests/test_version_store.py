@@ -0,0 +1,70 @@
+import copy
+import json
+import os
+
+from retention import RetentionPolicy
+from version_store import BACKUP_KIND, VersionStore
+
+
+def object_count(store):
+    return sum(len(files) for _, _, files in os.walk(store.objects_dir))
+
+
+def test_commit_and_load_round_trip(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    entry = store.commit(document, timestamp='2025-01-01_10-00-00')
+    assert entry['name'] == 'renovation_data_2025-01-01_10-00-00.json'
+    assert VersionStore(store.root).load(entry['name']) == document
+
+
+def test_unchanged_subtrees_are_stored_once(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    first = store.commit(document, timestamp='2025-01-01_10-00-00')
+    objects = object_count(store)
+    edited = copy.deepcopy(document)
+    room = next(iter(edited['rooms']))
+    edited['rooms'][room]['budget']['amount'] = 1
+    second = store.commit(edited, timestamp='2025-01-01_10-05-00')
+    # Only the objects on the path from the root to the edit are new
+    assert 0 < object_count(store) - objects <= store.split_depth
+    assert second['parent'] == first['name']
+    assert store.load(first['name']) == document and store.load(second['name']) == edited
+
+
+def test_listing_latest_and_paging(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    for minute in range(5):
+        store.commit(document, timestamp=f'2025-01-01_10-0{minute}-00')
+    store.commit(document, name='backup.json', kind=BACKUP_KIND)
+    assert len(store.list_versions()) == 5
+    assert store.latest()['timestamp'] == '2025-01-01_10-04-00'
+    assert store.latest(BACKUP_KIND)['name'] == 'backup.json'
+    total, page = store.page(offset=1, limit=2)
+    assert total == 5
+    assert [entry['timestamp'] for entry in page] == ['2025-01-01_10-03-00', '2025-01-01_10-02-00']
+
+
+def test_prune_drops_entries_and_unreferenced_objects(tmp_path, document):
+    store = VersionStore(str(tmp_path / 'versions'))
+    for i in range(4):
+        edited = copy.deepcopy(document)
+        edited['status'] = f'step {i}'
+        edited['rooms'][next(iter(edited['rooms']))]['budget']['amount'] = i
+        store.commit(edited, timestamp=f'2025-01-0{i + 1}_10-00-00')
+    objects = object_count(store)
+    removed = store.prune(RetentionPolicy(last=1, hourly=0, daily=0))
+    assert removed == 3
+    assert store.list_versions() == ['renovation_data_2025-01-04_10-00-00.json']
+    assert object_count(store) < objects
+    assert store.load(store.list_versions()[0])['status'] == 'step 3'
+
+
+def test_import_legacy_versions(tmp_path, document):
+    root = tmp_path / 'versions'
+    root.mkdir()
+    (root / 'renovation_data_2025-01-02_14-35-33.json').write_text(json.dumps(document))
+    store = VersionStore(str(root))
+    assert store.import_legacy_versions() == 1
+    assert store.import_legacy_versions() == 0
+    assert store.latest()['timestamp'] == '2025-01-02_14-35-33'
+    assert store.load('renovation_data_2025-01-02_14-35-33.json') == document
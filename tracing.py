@@ -0,0 +1,162 @@
+"""Sampled request tracing written in the Chrome trace event format.
+
+A trace covers one request (or one CLI command) and holds nested spans for the
+stages inside it. Whether a request is traced is decided once, when it starts,
+from the sample rate. Spans outside a sampled request cost one thread-local
+lookup. Finished spans are buffered in memory and appended to the trace file by
+a background thread. The file is a JSON array of complete ("X") events that
+loads in chrome://tracing and in Perfetto (ui.perfetto.dev), even before the
+array is closed at exit.
+
+    tracer.configure('trace.json', sample_rate=0.1)
+    with tracer.request('POST /save_rooms'):
+        with tracer.span('load_document'):
+            ...
+"""
+import atexit
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+def now_us() -> float:
+    return time.perf_counter_ns() / 1000
+
+
+class Trace:
+    """The root span of one sampled request; name and args may be filled in while it runs."""
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.path: Optional[str] = None
+        self._local = threading.local()
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._threads_named = set()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def configure(self, path: str, sample_rate: float = 1.0, flush_interval: float = 1.0):
+        """Start writing sampled traces to path, replacing any earlier trace file."""
+        self.close()
+        self.path = path
+        self.sample_rate = sample_rate
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[\n')
+        self._threads_named = set()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                         name='trace-writer', daemon=True)
+        self._flusher.start()
+        self.enabled = True
+
+    @property
+    def active(self) -> bool:
+        """Whether the current thread is inside a sampled request."""
+        return getattr(self._local, 'trace', None) is not None
+
+    @contextmanager
+    def request(self, name: str, **args):
+        """Trace the enclosed work as one request if it is sampled; yields the Trace or None."""
+        if not self.enabled or self.active or random.random() >= self.sample_rate:
+            yield None
+            return
+        trace = Trace(name, args)
+        self._local.trace = trace
+        start = now_us()
+        try:
+            yield trace
+        finally:
+            self._local.trace = None
+            self._record(trace.name, 'request', start, now_us() - start, trace.args)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Time the enclosed block as a child span of the current request."""
+        if getattr(self._local, 'trace', None) is None:
+            yield
+            return
+        start = now_us()
+        try:
+            yield
+        finally:
+            self._record(name, 'stage', start, now_us() - start, args)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """Decorator recording each call of a function as a span."""
+        def decorate(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, 'trace', None) is None:
+                    return func(*args, **kwargs)
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _record(self, name: str, category: str, start: float, duration: float, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round(start, 3),
+            'dur': round(duration, 3),
+            'pid': os.getpid(),
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = {key: value if isinstance(value, (int, float, bool)) else str(value)
+                             for key, value in args.items()}
+        with self._lock:
+            if thread.ident not in self._threads_named:
+                self._threads_named.add(thread.ident)
+                self._events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                                     'tid': thread.ident, 'args': {'name': thread.name}})
+            self._events.append(event)
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+            if self._file is None or not events:
+                return
+            self._file.write(''.join(json.dumps(event, separators=(',', ':')) + ',\n' for event in events))
+            self._file.flush()
+
+    def close(self):
+        """Write out buffered spans and close the JSON array."""
+        if self._file is None:
+            return
+        self.enabled = False
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self.flush()
+        with self._lock:
+            # A final metadata event, so the array ends without a trailing comma
+            self._file.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                                         'args': {'name': 'renovation'}}) + '\n]\n')
+            self._file.close()
+            self._file = None
+
+
+tracer = Tracer()
+atexit.register(tracer.close)
@@ -0,0 +1,217 @@
+"""Structural diffs between versions of a renovation document.
+
+Versions in the version store are Merkle trees, so two subtrees with the same hash
+are identical and are skipped without being read. Only objects on paths that
+actually changed are opened, which keeps comparisons along a long history cheap.
+Plain in-memory documents can be compared too, and both kinds can be mixed.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from cost_engine import is_amount, room_cost_lines
+from json_paths import format_path
+from version_store import VersionStore
+
+
+@dataclass(frozen=True)
+class Ref:
+    """A stored subtree that has not been read yet."""
+    digest: str
+
+
+@dataclass
+class Change:
+    path: str
+    op: str  # 'added', 'removed' or 'changed'
+    old: Any = None
+    new: Any = None
+
+
+@dataclass
+class RoomDelta:
+    room: str
+    cost_before: float
+    cost_after: float
+    budget_before: float
+    budget_after: float
+
+    @property
+    def cost_delta(self) -> float:
+        return self.cost_after - self.cost_before
+
+    @property
+    def budget_delta(self) -> float:
+        return self.budget_after - self.budget_before
+
+
+@dataclass
+class DocumentDiff:
+    changes: List[Change] = field(default_factory=list)
+    rooms: List[RoomDelta] = field(default_factory=list)
+
+    @property
+    def cost_delta(self) -> float:
+        return sum(room.cost_delta for room in self.rooms)
+
+    @property
+    def budget_delta(self) -> float:
+        return sum(room.budget_delta for room in self.rooms)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'changes': [{'path': c.path, 'op': c.op, 'old': c.old, 'new': c.new} for c in self.changes],
+            'rooms': [{
+                'room': r.room,
+                'cost_before': r.cost_before,
+                'cost_after': r.cost_after,
+                'cost_delta': r.cost_delta,
+                'budget_before': r.budget_before,
+                'budget_after': r.budget_after,
+                'budget_delta': r.budget_delta,
+            } for r in self.rooms],
+            'cost_delta': self.cost_delta,
+            'budget_delta': self.budget_delta,
+        }
+
+
+class TreeDiffer:
+    """Compares documents given as stored roots (Ref) or plain values."""
+    def __init__(self, store: Optional[VersionStore] = None):
+        self.store = store
+        self._objects: Dict[str, Dict[str, Any]] = {}
+
+    def diff(self, old: Any, new: Any) -> DocumentDiff:
+        result = DocumentDiff()
+        self._diff(old, new, (), result.changes)
+        result.rooms = self.room_deltas(old, new)
+        return result
+
+    def materialize(self, node: Any) -> Any:
+        """Turn a Ref into its full value; plain values are returned as they are."""
+        return self.store.get_tree(node.digest) if isinstance(node, Ref) else node
+
+    def child(self, node: Any, key: str) -> Tuple[bool, Any]:
+        """Return (found, child) for one key of a dict or list node."""
+        _, items = self._expand(node)
+        if items is None or key not in items:
+            return False, None
+        return True, items[key]
+
+    def _read(self, digest: str) -> Dict[str, Any]:
+        if digest not in self._objects:
+            self._objects[digest] = self.store.read_object(digest)
+        return self._objects[digest]
+
+    def _expand(self, node: Any) -> Tuple[Optional[type], Optional[Dict[str, Any]]]:
+        """Container type and key -> child map of a node, or (None, None) for scalars."""
+        refs = {}
+        if isinstance(node, Ref):
+            obj = self._read(node.digest)
+            node, refs = obj['v'], obj['r']
+        if isinstance(node, dict):
+            return dict, {key: Ref(refs[key]) if key in refs else value for key, value in node.items()}
+        if isinstance(node, list):
+            return list, {str(i): Ref(refs[str(i)]) if str(i) in refs else value for i, value in enumerate(node)}
+        return None, None
+
+    def _diff(self, old: Any, new: Any, path: Tuple[str, ...], changes: List[Change]):
+        if isinstance(old, Ref) and isinstance(new, Ref):
+            if old.digest == new.digest:
+                return
+        elif not isinstance(old, Ref) and not isinstance(new, Ref):
+            if type(old) is type(new) and old == new:
+                return
+        old_type, old_items = self._expand(old)
+        new_type, new_items = self._expand(new)
+        if old_type is None or old_type is not new_type:
+            changes.append(Change(format_path(path), 'changed', self.materialize(old), self.materialize(new)))
+            return
+        for key, old_child in old_items.items():
+            if key in new_items:
+                self._diff(old_child, new_items[key], path + (key,), changes)
+            else:
+                changes.append(Change(format_path(path + (key,)), 'removed', old=self.materialize(old_child)))
+        for key, new_child in new_items.items():
+            if key not in old_items:
+                changes.append(Change(format_path(path + (key,)), 'added', new=self.materialize(new_child)))
+
+    def room_deltas(self, old: Any, new: Any) -> List[RoomDelta]:
+        """Cost and budget before and after for every room whose subtree changed."""
+        _, old_rooms = self.child(old, 'rooms')
+        _, new_rooms = self.child(new, 'rooms')
+        old_items = self._expand(old_rooms)[1] or {}
+        new_items = self._expand(new_rooms)[1] or {}
+        deltas = []
+        for name in list(old_items) + [name for name in new_items if name not in old_items]:
+            before, after = old_items.get(name), new_items.get(name)
+            if isinstance(before, Ref) and isinstance(after, Ref) and before.digest == after.digest:
+                continue
+            before, after = self.materialize(before), self.materialize(after)
+            if before == after:
+                continue
+            deltas.append(RoomDelta(name, room_cost(name, before), room_cost(name, after),
+                                    room_budget(before), room_budget(after)))
+        return deltas
+
+
+def room_cost(name: str, room: Any) -> float:
+    if not isinstance(room, dict):
+        return 0.0
+    return sum(line.cost for line in room_cost_lines(name, room))
+
+
+def room_budget(room: Any) -> float:
+    budget = room.get('budget') if isinstance(room, dict) else None
+    amount = budget.get('amount') if isinstance(budget, dict) else None
+    return amount if is_amount(amount) else 0.0
+
+
+def diff_documents(old: Any, new: Any) -> DocumentDiff:
+    """Diff two in-memory documents."""
+    return TreeDiffer().diff(old, new)
+
+
+def diff_versions(store: VersionStore, old_name: str, new_name: str) -> DocumentDiff:
+    """Diff two stored versions by name, skipping subtrees whose hashes match."""
+    old_entry, new_entry = store.get_entry(old_name), store.get_entry(new_name)
+    for name, entry in ((old_name, old_entry), (new_name, new_entry)):
+        if entry is None:
+            raise FileNotFoundError(f"Version not found: {name}")
+    return TreeDiffer(store).diff(Ref(old_entry['root']), Ref(new_entry['root']))
+
+
+def load_node(store: Optional[VersionStore], name: str) -> Any:
+    """A stored version by name as a Ref, or else a JSON file on disk as a plain value."""
+    entry = store.get_entry(name) if store is not None else None
+    if entry is not None:
+        return Ref(entry['root'])
+    with open(name, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def render_diff(result: DocumentDiff, max_value_length: int = 60) -> str:
+    """Plain-text summary of a diff for the command line."""
+    def short(value: Any) -> str:
+        text = repr(value)
+        return text if len(text) <= max_value_length else text[:max_value_length - 3] + '...'
+
+    lines = []
+    for change in result.changes:
+        if change.op == 'added':
+            lines.append(f"+ {change.path}: {short(change.new)}")
+        elif change.op == 'removed':
+            lines.append(f"- {change.path}: {short(change.old)}")
+        else:
+            lines.append(f"~ {change.path}: {short(change.old)} -> {short(change.new)}")
+    if not lines:
+        lines.append("No differences")
+    if result.rooms:
+        lines.append("")
+        lines.append(f"{'Room':<20} {'Cost before':>12} {'Cost after':>12} {'Delta':>10} {'Budget delta':>13}")
+        lines.append("-" * 71)
+        for room in result.rooms:
+            lines.append(f"{room.room.replace('_', ' ').title():<20} ${room.cost_before:>11,.2f} "
+                         f"${room.cost_after:>11,.2f} {room.cost_delta:>+10,.2f} {room.budget_delta:>+13,.2f}")
+        lines.append(f"{'Total':<20} {'':>12} {'':>12} {result.cost_delta:>+10,.2f} {result.budget_delta:>+13,.2f}")
+    return '\n'.join(lines)
@@ -0,0 +1,349 @@
+"""Content-addressed, deduplicated store for renovation document versions.
+
+Documents are split into a Merkle tree of JSON objects: every dict or list down to
+``split_depth`` levels is stored once under ``objects/`` keyed by the SHA-256 of its
+canonical encoding, with its container children replaced by references. Saving a
+version whose rooms are mostly unchanged therefore only writes the handful of
+objects on the path from the root to the edited values, plus one line in
+``index.jsonl``.
+
+    versions/
+        index.jsonl                      one JSON line per saved version
+        objects/3f/2a...e1.json          {"v": <node with refs blanked>, "r": {<key>: <hash>}}
+
+``index.jsonl`` doubles as the version manifest. Each line records the name,
+kind, timestamp, root hash (a content hash of the whole document), document
+size in bytes and parent version, plus the author and summary totals when the
+caller supplies them. Listings and latest-version lookups are served from it
+without opening any version.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from atomic_io import atomic_write_bytes
+from retention import RetentionPolicy, parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+VERSION_KIND = 'version'
+BACKUP_KIND = 'backup'
+
+
+class VersionStore:
+    def __init__(self, root: str = 'versions', split_depth: int = 4):
+        self.root = root
+        self.split_depth = split_depth
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_file = os.path.join(root, 'index.jsonl')
+        self._lock = threading.RLock()
+        self._entries: Optional[List[Dict[str, Any]]] = None
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        # Newest entry per kind (and overall under None), so latest() needs no scan
+        self._latest: Dict[Optional[str], Dict[str, Any]] = {}
+        # Current entries per kind (and overall under None) in commit order, for paging
+        self._current: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self._index_size = 0
+        # Objects never change, so their child hashes and sizes are cached between prunes
+        self._children: Dict[str, List[str]] = {}
+        self._sizes: Dict[str, int] = {}
+
+    # Objects
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest[2:]}.json")
+
+    def _write_object(self, digest: str, encoded: bytes):
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Objects must be durable before an index line can refer to them
+        atomic_write_bytes(path, encoded)
+
+    def put_tree(self, node: Any, depth: int = 0) -> str:
+        """Store a container and its split-out children; return the root hash."""
+        refs = {}
+        if isinstance(node, dict):
+            shallow = {}
+            for key, value in node.items():
+                if isinstance(value, (dict, list)) and depth + 1 < self.split_depth:
+                    refs[key] = self.put_tree(value, depth + 1)
+                    shallow[key] = None
+                else:
+                    shallow[key] = value
+        elif isinstance(node, list):
+            shallow = []
+            for i, value in enumerate(node):
+                if isinstance(value, (dict, list)) and depth + 1 < self.split_depth:
+                    refs[str(i)] = self.put_tree(value, depth + 1)
+                    shallow.append(None)
+                else:
+                    shallow.append(value)
+        else:
+            raise TypeError(f"Only dicts and lists can be stored, got {type(node).__name__}")
+
+        # Key order is kept so restored documents read the same as the original
+        encoded = json.dumps({'v': shallow, 'r': refs}, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(encoded).hexdigest()
+        self._write_object(digest, encoded)
+        return digest
+
+    def read_object(self, digest: str) -> Dict[str, Any]:
+        """Return the raw stored object ({"v": ..., "r": ...}) for a hash."""
+        with open(self._object_path(digest), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def get_tree(self, digest: str) -> Any:
+        """Rebuild the full document rooted at digest."""
+        obj = self.read_object(digest)
+        value = obj['v']
+        for key, child in obj['r'].items():
+            if isinstance(value, list):
+                value[int(key)] = self.get_tree(child)
+            else:
+                value[key] = self.get_tree(child)
+        return value
+
+    # Index
+
+    def _load_index(self):
+        """Read index.jsonl into memory, picking up lines appended by other processes."""
+        try:
+            size = os.path.getsize(self.index_file)
+        except OSError:
+            size = 0
+        if self._entries is not None and size == self._index_size:
+            return
+        entries = []
+        if size:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt line in {self.index_file}")
+        self._entries = entries
+        self._by_name = {}
+        self._latest = {}
+        self._current = {}
+        for entry in entries:
+            self._track(entry, self._by_name.get(entry['name']))
+            self._by_name[entry['name']] = entry
+        self._index_size = size
+
+    def _track(self, entry: Dict[str, Any], replaced: Optional[Dict[str, Any]]):
+        """Update the latest pointers and per-kind listings for a newly indexed entry."""
+        for kind in (entry['kind'], None):
+            self._latest[kind] = entry
+            self._current.setdefault(kind, []).append(entry)
+        if replaced is not None:
+            # Re-saving a name supersedes its earlier entry; this is rare, so a linear remove is fine
+            for kind in (replaced['kind'], None):
+                self._current[kind].remove(replaced)
+
+    def _append_index(self, entry: Dict[str, Any]):
+        os.makedirs(self.root, exist_ok=True)
+        line = json.dumps(entry, separators=(',', ':')) + "\n"
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries.append(entry)
+        self._track(entry, self._by_name.get(entry['name']))
+        self._by_name[entry['name']] = entry
+        self._index_size += len(line.encode('utf-8'))
+
+    # Versions
+
+    def commit(self, data: Any, name: Optional[str] = None, kind: str = VERSION_KIND,
+               timestamp: Optional[str] = None, author: Optional[str] = None,
+               summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Store data as a new named version and return its manifest entry."""
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        name = name or f"renovation_data_{timestamp}.json"
+        size = len(json.dumps(data, indent=2).encode('utf-8'))
+        with self._lock:
+            self._load_index()
+            root = self.put_tree(data)
+            parent = self._latest.get(kind)
+            if parent is not None and parent['name'] == name:
+                # Re-saving the newest name keeps its original parent
+                parent_name = parent.get('parent')
+            else:
+                parent_name = parent['name'] if parent else None
+            entry = {'name': name, 'kind': kind, 'timestamp': timestamp, 'root': root, 'size': size,
+                     'parent': parent_name}
+            if author is not None:
+                entry['author'] = author
+            if summary is not None:
+                entry['summary'] = summary
+            self._append_index(entry)
+        logger.info(f"Stored {kind} {name} (root {root[:12]})")
+        return entry
+
+    def entries(self, kind: Optional[str] = VERSION_KIND) -> List[Dict[str, Any]]:
+        """Index entries in commit order; a name saved twice keeps only its latest entry."""
+        with self._lock:
+            self._load_index()
+            return list(self._current.get(kind, []))
+
+    def page(self, kind: Optional[str] = VERSION_KIND, offset: int = 0, limit: int = 50,
+             newest_first: bool = True) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return (total, entries) for one page of the listing, in time proportional to the page."""
+        with self._lock:
+            self._load_index()
+            current = self._current.get(kind, [])
+            total = len(current)
+            offset = max(0, offset)
+            if newest_first:
+                start, stop = max(0, total - offset - limit), max(0, total - offset)
+                return total, current[start:stop][::-1]
+            return total, current[offset:offset + limit]
+
+    def list_versions(self, kind: Optional[str] = VERSION_KIND) -> List[str]:
+        """Names of stored versions in commit order."""
+        return [entry['name'] for entry in self.entries(kind)]
+
+    def get_entry(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._load_index()
+            return self._by_name.get(name)
+
+    def latest(self, kind: Optional[str] = VERSION_KIND, prefix: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recently committed entry of a kind, optionally restricted to a name prefix."""
+        with self._lock:
+            self._load_index()
+            entry = self._latest.get(kind)
+            if entry is None or prefix is None or entry['name'].startswith(prefix):
+                return entry
+            for entry in reversed(self._current.get(kind, [])):
+                if entry['name'].startswith(prefix):
+                    return entry
+        return None
+
+    def load(self, name: str) -> Any:
+        """Rebuild a stored version by name."""
+        entry = self.get_entry(name)
+        if entry is None:
+            raise FileNotFoundError(f"Version not found: {name}")
+        return self.get_tree(entry['root'])
+
+    # Retention
+
+    def prune(self, policy: RetentionPolicy) -> int:
+        """Drop entries the policy does not keep (per kind) and delete objects no entry uses.
+
+        An entry's size for the policy's byte cap is the total size of the objects
+        it references, so the cap is conservative when versions share subtrees.
+        Returns the number of entries removed.
+        """
+        if not policy.enabled:
+            return 0
+        with self._lock:
+            self._load_index()
+            current = list(self._current.get(None, []))
+            reachable = {entry['name']: self._reachable(entry['root']) for entry in current}
+
+            keep = set()
+            for kind in {entry['kind'] for entry in current}:
+                items = [(entry['name'], parse_timestamp(entry.get('timestamp')),
+                          sum(self._sizes[digest] for digest in reachable[entry['name']]))
+                         for entry in current if entry['kind'] == kind]
+                keep |= policy.select(items)
+            kept = [entry for entry in current if entry['name'] in keep]
+            removed = len(current) - len(kept)
+            if not removed and len(current) == len(self._entries):
+                return 0
+
+            # Rewrite the index first so no surviving entry points at a deleted object
+            content = ''.join(json.dumps(entry, separators=(',', ':')) + "\n" for entry in kept).encode('utf-8')
+            atomic_write_bytes(self.index_file, content)
+            self._entries = None
+            self._load_index()
+
+            live = set()
+            for entry in kept:
+                live |= reachable[entry['name']]
+            deleted = self._sweep(live)
+            # Full-copy files from older releases would otherwise be imported again on restart
+            for entry in current:
+                if entry['name'] not in keep:
+                    try:
+                        os.remove(os.path.join(self.root, entry['name']))
+                    except OSError:
+                        pass
+        logger.info(f"Pruned {removed} entries and {deleted} objects from {self.root}")
+        return removed
+
+    def _reachable(self, root: str) -> set:
+        """Hashes of all objects in the tree under root, reading each object at most once."""
+        seen = set()
+        stack = [root]
+        while stack:
+            digest = stack.pop()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            if digest not in self._children:
+                try:
+                    self._sizes[digest] = os.path.getsize(self._object_path(digest))
+                    self._children[digest] = list(self.read_object(digest)['r'].values())
+                except (OSError, json.JSONDecodeError):
+                    logger.warning(f"Missing or unreadable object {digest}")
+                    self._sizes[digest] = 0
+                    self._children[digest] = []
+            stack.extend(self._children[digest])
+        return seen
+
+    def _sweep(self, live: set) -> int:
+        deleted = 0
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        for prefix in os.listdir(self.objects_dir):
+            directory = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                # Skip temporary files from writes in progress
+                if filename.startswith('.') or not filename.endswith('.json'):
+                    continue
+                digest = prefix + filename[:-len('.json')]
+                if digest in live:
+                    continue
+                try:
+                    os.remove(os.path.join(directory, filename))
+                    self._children.pop(digest, None)
+                    self._sizes.pop(digest, None)
+                    deleted += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove object {filename}: {str(e)}")
+        return deleted
+
+    def import_legacy_versions(self) -> int:
+        """Add full-copy version files already in the versions directory to the index."""
+        if not os.path.isdir(self.root):
+            return 0
+        imported = 0
+        for filename in sorted(os.listdir(self.root)):
+            if not filename.endswith('.json') or self.get_entry(filename) is not None:
+                continue
+            try:
+                with open(os.path.join(self.root, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Could not import legacy version {filename}: {str(e)}")
+                continue
+            timestamp = filename[len('renovation_data_'):-len('.json')] if filename.startswith('renovation_data_') else None
+            self.commit(data, name=filename, timestamp=timestamp)
+            imported += 1
+        if imported:
+            logger.info(f"Imported {imported} legacy version files into {self.index_file}")
+        return imported